@@ -79,6 +79,8 @@ class StrategyRequest(BaseModel):
     opportunities: List[Opportunity]
     recommended_protocols: List[str]
     chains: List[Chain]
+    optimizer: Optional[str] = None
+    simulate: bool = False
 
 class AllocationItem(BaseModel):
     protocol: str
@@ -88,6 +90,19 @@ class AllocationItem(BaseModel):
     expected_apy: float
     risk_score: float = 5.0
 
+class OutcomeDistribution(BaseModel):
+    paths: int
+    horizon_days: int
+    mean_return: float
+    return_percentiles: Dict[str, float]
+    var_95: float
+    var_99: float
+    cvar_95: float
+    max_drawdown_p50: float
+    max_drawdown_p95: float
+    probability_of_loss: float
+    budget_exhausted: bool = False
+
 class StrategyResponse(BaseModel):
     request_id: str
     allocations: List[AllocationItem]
@@ -96,6 +111,7 @@ class StrategyResponse(BaseModel):
     estimated_gas_cost: float
     reasoning: str
     timestamp: str
+    simulation: Optional[OutcomeDistribution] = None
 
 # ===== CONFIGURATION =====
 COORDINATOR_SEED = process.env.COORDINATOR_SEED
@@ -1,6 +1,11 @@
 """
 YieldSwarm AI - MeTTa Knowledge Agent
-AGENTVERSE DEPLOYMENT VERSION - Self-contained
+AGENTVERSE DEPLOYMENT VERSION - Requires the repository's utils/ package
+
+Not a single-file agent: it imports utils.* from the repository root (see the
+sys.path line below) and reads the compiled protocol registry
+(metta_kb/defi_protocols.{protocols,chains}.npy, rebuilt from
+defi_protocols.metta when stale). Deploy it together with utils/ and metta_kb/.
 """
 from uagents import Agent, Context, Protocol
 from uagents_core.contrib.protocols.chat import chat_protocol_spec
@@ -8,6 +13,14 @@ from datetime import datetime, timezone
 from typing import List, Optional, Dict
 from pydantic import BaseModel
 from enum import Enum
+import os
+import sys
+
+# Shared utils/ package lives one level above agents_agentverse/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.protocol_registry import get_registry
+from utils.scoring import OpportunityArrays, ScoringEngine
+from utils.result_cache import TTLCache, stable_hash
 
 # ===== INLINE MESSAGE MODELS =====
 
@@ -48,201 +61,22 @@ METTA_PORT = 8002
 # ASI:One API Configuration
 ASI_ONE_API_KEY = process.env.ASI_ONE_API_KEY
 
-# ===== METTA KNOWLEDGE BASE (Embedded) =====
-# 22 DeFi protocols with full specifications
-# This replaces the need for external .metta file
-
-PROTOCOL_KNOWLEDGE_BASE = {
-    "Aave-V3": {
-        "chains": ["Ethereum", "Polygon", "Arbitrum"],
-        "type": "Lending",
-        "risk_score": 2.5,
-        "historical_apy": 4.2,
-        "tvl": 5000000000,
-        "security_rating": "High",
-        "impermanent_loss": "None"
-    },
-    "Uniswap-V3": {
-        "chains": ["Ethereum", "Polygon", "Arbitrum"],
-        "type": "DEX",
-        "risk_score": 3.5,
-        "historical_apy": 12.5,
-        "tvl": 3200000000,
-        "security_rating": "High",
-        "impermanent_loss": "High"
-    },
-    "Curve": {
-        "chains": ["Ethereum", "Polygon"],
-        "type": "DEX-Stablecoin",
-        "risk_score": 2.1,
-        "historical_apy": 6.8,
-        "tvl": 2800000000,
-        "security_rating": "High",
-        "impermanent_loss": "Low"
-    },
-    "Compound-V3": {
-        "chains": ["Ethereum", "Polygon", "Arbitrum"],
-        "type": "Lending",
-        "risk_score": 2.8,
-        "historical_apy": 3.9,
-        "tvl": 2100000000,
-        "security_rating": "High",
-        "impermanent_loss": "None"
-    },
-    "Raydium": {
-        "chains": ["Solana"],
-        "type": "DEX",
-        "risk_score": 6.0,
-        "historical_apy": 18.5,
-        "tvl": 450000000,
-        "security_rating": "Medium",
-        "impermanent_loss": "High"
-    },
-    "Solend": {
-        "chains": ["Solana"],
-        "type": "Lending",
-        "risk_score": 5.5,
-        "historical_apy": 8.2,
-        "tvl": 280000000,
-        "security_rating": "Medium",
-        "impermanent_loss": "None"
-    },
-    "PancakeSwap": {
-        "chains": ["BSC"],
-        "type": "DEX",
-        "risk_score": 5.0,
-        "historical_apy": 15.2,
-        "tvl": 1200000000,
-        "security_rating": "Medium",
-        "impermanent_loss": "High"
-    },
-    "Venus": {
-        "chains": ["BSC"],
-        "type": "Lending",
-        "risk_score": 4.8,
-        "historical_apy": 6.5,
-        "tvl": 680000000,
-        "security_rating": "Medium",
-        "impermanent_loss": "None"
-    },
-    "GMX": {
-        "chains": ["Arbitrum"],
-        "type": "Perpetuals",
-        "risk_score": 5.5,
-        "historical_apy": 16.0,
-        "tvl": 420000000,
-        "security_rating": "Medium",
-        "impermanent_loss": "None"
-    },
-    "Balancer": {
-        "chains": ["Ethereum", "Polygon", "Arbitrum"],
-        "type": "DEX-Weighted",
-        "risk_score": 3.8,
-        "historical_apy": 9.5,
-        "tvl": 980000000,
-        "security_rating": "High",
-        "impermanent_loss": "Medium"
-    },
-    "QuickSwap": {
-        "chains": ["Polygon"],
-        "type": "DEX",
-        "risk_score": 4.0,
-        "historical_apy": 9.75,
-        "tvl": 350000000,
-        "security_rating": "Medium",
-        "impermanent_loss": "High"
-    },
-    "Yearn-Finance": {
-        "chains": ["Ethereum", "Polygon", "Arbitrum"],
-        "type": "Yield-Aggregator",
-        "risk_score": 3.2,
-        "historical_apy": 7.8,
-        "tvl": 1500000000,
-        "security_rating": "High",
-        "impermanent_loss": "Low"
-    },
-    "Convex": {
-        "chains": ["Ethereum"],
-        "type": "Yield-Booster",
-        "risk_score": 3.5,
-        "historical_apy": 8.5,
-        "tvl": 2300000000,
-        "security_rating": "High",
-        "impermanent_loss": "Low"
-    },
-    "MakerDAO": {
-        "chains": ["Ethereum"],
-        "type": "Lending-Stablecoin",
-        "risk_score": 2.0,
-        "historical_apy": 3.5,
-        "tvl": 6800000000,
-        "security_rating": "High",
-        "impermanent_loss": "None"
-    },
-    "Lido": {
-        "chains": ["Ethereum", "Polygon", "Solana"],
-        "type": "Liquid-Staking",
-        "risk_score": 2.3,
-        "historical_apy": 4.5,
-        "tvl": 14000000000,
-        "security_rating": "High",
-        "impermanent_loss": "None"
-    },
-    "Rocket-Pool": {
-        "chains": ["Ethereum"],
-        "type": "Liquid-Staking",
-        "risk_score": 2.6,
-        "historical_apy": 4.2,
-        "tvl": 2100000000,
-        "security_rating": "High",
-        "impermanent_loss": "None"
-    },
-    "Stargate": {
-        "chains": ["Ethereum", "Polygon", "Arbitrum", "BSC"],
-        "type": "Bridge-Liquidity",
-        "risk_score": 4.5,
-        "historical_apy": 11.5,
-        "tvl": 680000000,
-        "security_rating": "Medium",
-        "impermanent_loss": "Medium"
-    },
-    "Frax": {
-        "chains": ["Ethereum", "Polygon", "Arbitrum"],
-        "type": "Stablecoin-Lending",
-        "risk_score": 3.0,
-        "historical_apy": 5.5,
-        "tvl": 1100000000,
-        "security_rating": "High",
-        "impermanent_loss": "Low"
-    },
-    "Trader-Joe": {
-        "chains": ["Arbitrum"],
-        "type": "DEX",
-        "risk_score": 4.8,
-        "historical_apy": 13.5,
-        "tvl": 420000000,
-        "security_rating": "Medium",
-        "impermanent_loss": "High"
-    },
-    "Synapse": {
-        "chains": ["Ethereum", "Polygon", "Arbitrum", "BSC"],
-        "type": "Bridge-Yield",
-        "risk_score": 5.2,
-        "historical_apy": 14.0,
-        "tvl": 380000000,
-        "security_rating": "Medium",
-        "impermanent_loss": "Medium"
-    },
-    "Beefy": {
-        "chains": ["Polygon", "BSC", "Arbitrum"],
-        "type": "Yield-Optimizer",
-        "risk_score": 4.2,
-        "historical_apy": 10.5,
-        "tvl": 550000000,
-        "security_rating": "Medium",
-        "impermanent_loss": "Medium"
-    }
-}
+# Recommendation cache (identical opportunity sets arrive from many users)
+RESULT_CACHE_SIZE = 2048
+RESULT_CACHE_TTL_SECONDS = 120.0
+CACHE_STATS_INTERVAL_SECONDS = 300.0
+
+# ===== METTA KNOWLEDGE BASE (Compiled Registry) =====
+# 21 DeFi protocols compiled from metta_kb/defi_protocols.metta into a
+# memory-mapped registry shared read-only by every worker on the host
+
+PROTOCOL_REGISTRY = get_registry()
+PROTOCOL_KNOWLEDGE_BASE = PROTOCOL_REGISTRY.as_dict()
+
+# Declarative risk-level scoring policies with the KB's Chain-Risk multipliers
+SCORING_ENGINE = ScoringEngine(chain_risk=PROTOCOL_REGISTRY.chain_risk_vector)
+
+RESULT_CACHE = TTLCache(maxsize=RESULT_CACHE_SIZE, ttl_seconds=RESULT_CACHE_TTL_SECONDS)
 
 # ===== AGENT INITIALIZATION =====
 try:
@@ -273,8 +107,8 @@ async def handle_metta_query(ctx: Context, sender: str, msg: MeTTaQueryRequest):
     ctx.logger.info("="*60)
 
     try:
-        # Apply MeTTa-inspired reasoning
-        response = _metta_reasoning(msg)
+        # Apply MeTTa-inspired reasoning (served from cache for repeated inputs)
+        response = _cached_metta_reasoning(msg)
 
         # Send response back to coordinator
         await ctx.send(sender, response)
@@ -292,6 +126,46 @@ async def handle_metta_query(ctx: Context, sender: str, msg: MeTTaQueryRequest):
         )
         await ctx.send(sender, error_response)
 
+def _cache_key(msg: MeTTaQueryRequest) -> str:
+    """
+    Stable hash of the inputs that affect the recommendation
+
+    Opportunities and chains are order-normalized; request_id and amount
+    are excluded because they do not change the ranking.
+    """
+    opportunities = sorted(
+        [
+            opp.protocol,
+            opp.chain.value,
+            opp.apy,
+            opp.tvl,
+            opp.risk_score,
+            opp.pool_address or "",
+            opp.token_pair or ""
+        ]
+        for opp in msg.opportunities
+    )
+    return stable_hash({
+        "risk_level": msg.risk_level,
+        "chains": sorted({chain.value for chain in msg.chains}),
+        "opportunities": opportunities
+    })
+
+def _cached_metta_reasoning(msg: MeTTaQueryRequest) -> MeTTaQueryResponse:
+    """Return _metta_reasoning for msg, reusing a cached result for identical inputs"""
+    # Normalize once so the cache key and the scoring policy see the same value
+    msg = msg.model_copy(update={"risk_level": msg.risk_level.strip().lower()})
+    cached = RESULT_CACHE.get_or_compute(_cache_key(msg), lambda: _metta_reasoning(msg))
+
+    # Cached responses are shared, so hand out a copy carrying this request's id
+    return MeTTaQueryResponse(
+        request_id=msg.request_id,
+        recommended_protocols=list(cached.recommended_protocols),
+        reasoning=cached.reasoning,
+        confidence=cached.confidence,
+        risk_assessments=dict(cached.risk_assessments) if cached.risk_assessments else None
+    )
+
 def _metta_reasoning(msg: MeTTaQueryRequest) -> MeTTaQueryResponse:
     """
     MeTTa-inspired symbolic reasoning for DeFi protocol selection
@@ -300,44 +174,16 @@ def _metta_reasoning(msg: MeTTaQueryRequest) -> MeTTaQueryResponse:
     - Risk tolerance levels (conservative/moderate/aggressive)
     - APY optimization
     - Protocol diversification
-    - Chain risk factors
+    - Chain risk factors (Chain-Risk rules from the knowledge base)
+    - TVL safety
     """
 
-    # Sort opportunities by risk-adjusted returns
-    if msg.risk_level == "conservative":
-        # Prioritize low risk, filter high risk protocols
-        filtered_opps = [opp for opp in msg.opportunities if opp.risk_score <= 3.0]
-        sorted_opps = sorted(
-            filtered_opps,
-            key=lambda x: (x.apy / max(x.risk_score, 0.5), -x.risk_score),
-            reverse=True
-        )
-    elif msg.risk_level == "aggressive":
-        # Prioritize high APY, accept higher risk
-        filtered_opps = [opp for opp in msg.opportunities if opp.risk_score <= 8.0]
-        sorted_opps = sorted(
-            filtered_opps,
-            key=lambda x: -x.apy
-        )
-    else:  # moderate
-        # Balance between APY and risk
-        filtered_opps = [opp for opp in msg.opportunities if opp.risk_score <= 5.0]
-        sorted_opps = sorted(
-            filtered_opps,
-            key=lambda x: (x.apy / max(x.risk_score, 1), -x.risk_score),
-            reverse=True
-        )
-
-    # If not enough opportunities, use all available
-    if len(filtered_opps) < 2:
-        sorted_opps = sorted(
-            msg.opportunities,
-            key=lambda x: (x.apy / max(x.risk_score, 1), -x.risk_score),
-            reverse=True
-        )
+    # Score every opportunity in one vectorized pass and take the top 4
+    # (policies live in utils/scoring.py SCORING_POLICIES)
+    arrays = OpportunityArrays.from_opportunities(msg.opportunities)
+    top_idx = SCORING_ENGINE.select(arrays, msg.risk_level, k=4)
 
-    # Select top 4 protocols for diversification
-    top_opps = sorted_opps[:4]
+    top_opps = [msg.opportunities[i] for i in top_idx]
     recommended = [opp.protocol for opp in top_opps]
 
     # Generate explainable reasoning
@@ -394,7 +240,7 @@ def _generate_reasoning(
         f"- Chain Diversification: {chains_used} blockchain(s) for reduced correlation",
         f"- Portfolio Risk Score: {avg_risk:.1f}/10",
         f"- Expected APY: {avg_apy:.1f}%",
-        f"- Knowledge Base: 22 protocols analyzed across 5 chains",
+        f"- Knowledge Base: {len(PROTOCOL_KNOWLEDGE_BASE)} protocols analyzed across 5 chains",
         "",
         "MeTTa Knowledge Base applied:",
         "- Protocol security analysis (smart contract audits, TVL)",
@@ -419,6 +265,16 @@ async def startup(ctx: Context):
     ctx.logger.info("=" * 60)
     ctx.logger.info("✅ Ready to receive MeTTa query requests")
 
+@metta_agent.on_interval(period=CACHE_STATS_INTERVAL_SECONDS)
+async def log_cache_stats(ctx: Context):
+    """Periodically report recommendation cache metrics"""
+    stats = RESULT_CACHE.stats()
+    ctx.logger.info(
+        f"📊 MeTTa cache: {stats['size']}/{stats['maxsize']} entries, "
+        f"hit rate {stats['hit_rate']:.1%} ({stats['hits']} hits / {stats['misses']} misses), "
+        f"{stats['evictions']} evicted, {stats['expirations']} expired"
+    )
+
 if __name__ == "__main__":
     print("\n🐝 YieldSwarm AI - MeTTa Knowledge Agent")
     print(f"Address: {metta_agent.address}")
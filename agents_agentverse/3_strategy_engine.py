@@ -1,13 +1,36 @@
 """
 YieldSwarm AI - Strategy Engine Agent
-AGENTVERSE DEPLOYMENT VERSION - Self-contained
+AGENTVERSE DEPLOYMENT VERSION - Requires the repository's utils/ package
+
+Not a single-file agent: it imports utils.* from the repository root (see the
+sys.path line below) and reads the compiled protocol registry
+(metta_kb/defi_protocols.{protocols,chains}.npy, rebuilt from
+defi_protocols.metta when stale). Deploy it together with utils/ and metta_kb/.
 """
 from uagents import Agent, Context, Protocol
 from uagents_core.contrib.protocols.chat import chat_protocol_spec
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import List, Optional
+import asyncio
+import copy
+from typing import List, Dict, Optional
 from pydantic import BaseModel
 from enum import Enum
+import os
+import sys
+
+import numpy as np
+
+# Shared utils/ package lives one level above agents_agentverse/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.scoring import OpportunityArrays
+from utils.portfolio_optimizer import OPTIMIZER_MODES, OptimizationResult, build_covariance, optimize_portfolio
+from utils.result_cache import stable_hash
+from utils.monte_carlo import SimulationResult, simulate_strategy
+from utils.rebalancer import Rebalancer
+from utils.frontier_cache import FrontierCache
+from utils.gas_sizing import SizingResult, GasSizingSolver
+from utils.gas_oracle import GasOracle, create_rpc_sources, create_stub_sources
 
 # ===== INLINE MESSAGE MODELS =====
 
@@ -35,6 +58,8 @@ class StrategyRequest(BaseModel):
     opportunities: List[Opportunity]
     recommended_protocols: List[str]
     chains: List[Chain]
+    optimizer: Optional[str] = None
+    simulate: bool = False
 
 class AllocationItem(BaseModel):
     protocol: str
@@ -44,6 +69,19 @@ class AllocationItem(BaseModel):
     expected_apy: float
     risk_score: float = 5.0
 
+class OutcomeDistribution(BaseModel):
+    paths: int
+    horizon_days: int
+    mean_return: float
+    return_percentiles: Dict[str, float]
+    var_95: float
+    var_99: float
+    cvar_95: float
+    max_drawdown_p50: float
+    max_drawdown_p95: float
+    probability_of_loss: float
+    budget_exhausted: bool = False
+
 class StrategyResponse(BaseModel):
     request_id: str
     allocations: List[AllocationItem]
@@ -52,6 +90,56 @@ class StrategyResponse(BaseModel):
     estimated_gas_cost: float
     reasoning: str
     timestamp: str
+    simulation: Optional[OutcomeDistribution] = None
+
+class StrategyBatchRequest(BaseModel):
+    request_id: str
+    requests: List[StrategyRequest]
+
+class StrategyBatchResponse(BaseModel):
+    request_id: str
+    responses: List[StrategyResponse]
+    groups: int
+    timestamp: str
+
+class PositionDetail(BaseModel):
+    protocol: str
+    chain: Chain
+    amount: float
+    entry_value: float
+    current_value: float
+    pnl: float
+    pnl_percentage: float
+    current_apy: float
+    days_held: int
+
+class RebalanceRequest(BaseModel):
+    request_id: str
+    user_id: str
+    holdings: List[PositionDetail]
+    target: List[AllocationItem]
+    cash: float = 0.0
+    currency: str = "ETH"
+
+class RebalanceMoveItem(BaseModel):
+    action: str
+    protocol: str
+    chain: str
+    amount: float
+    gas_cost: float
+
+class RebalanceResponse(BaseModel):
+    request_id: str
+    user_id: str
+    moves: List[RebalanceMoveItem]
+    drift_before: float
+    drift_after: float
+    turnover: float
+    estimated_gas_cost: float
+    skipped: int
+    cached: bool
+    reasoning: str
+    timestamp: str
 
 # ===== CONFIGURATION =====
 STRATEGY_SEED = process.env.STRATEGY_SEED
@@ -60,7 +148,8 @@ STRATEGY_PORT = 8003
 # ASI:One API Configuration
 ASI_ONE_API_KEY = process.env.ASI_ONE_API_KEY
 
-# Gas costs per chain (in ETH equivalent)
+# Fallback gas costs per chain (in ETH equivalent), used while the gas
+# oracle has no fresh estimate for a chain
 GAS_COSTS = {
     Chain.ETHEREUM: 0.015,
     Chain.POLYGON: 0.0001,
@@ -76,6 +165,54 @@ ALLOCATION_STRATEGIES = {
     "aggressive": [40, 30, 20, 10]
 }
 
+# Optimizer settings (used when StrategyRequest.optimizer is set to one of
+# mean_variance, risk_parity, max_sharpe, gas_aware)
+MAX_OPTIMIZED_POSITIONS = 6
+MIN_POSITION_SIZE = 0.05  # in request currency
+
+# Gas-aware sizing (StrategyRequest.optimizer = gas_aware): choose how many
+# positions to open, and on which chains, so yield over the horizon beats gas
+GAS_AWARE_MODE = "gas_aware"
+GAS_SIZING_HORIZON_DAYS = 90
+STRATEGY_OPTIMIZERS = OPTIMIZER_MODES + (GAS_AWARE_MODE,)
+
+# Monte Carlo outcome distribution (used when StrategyRequest.simulate is set)
+SIMULATION_PATHS = 20000
+SIMULATION_HORIZON_DAYS = 365
+SIMULATION_BUDGET_SECONDS = 1.0
+
+# Efficient-frontier cache: optimizer allocations are precomputed per
+# (risk level, chain set, optimizer) for each opportunity snapshot at a
+# reference amount, then scaled to each request's amount
+FRONTIER_REFERENCE_AMOUNT = 1000.0
+FRONTIER_REFRESH_SECONDS = 15.0
+FRONTIER_BUDGET_SECONDS = 0.5
+FRONTIER_MAX_SNAPSHOTS = 2
+FRONTIER_STATS_INTERVAL_SECONDS = 300.0
+
+# Gas oracle: live fee estimates refreshed in the background; estimates
+# older than GAS_MAX_AGE_SECONDS fall back to GAS_COSTS
+GAS_REFRESH_SECONDS = 12.0
+GAS_MAX_AGE_SECONDS = 60.0
+
+# Per-chain RPC endpoints the gas oracle reads live fees from
+GAS_RPC_ENDPOINTS = {
+    "ethereum": getattr(process.env, "ETHEREUM_RPC", "") or "https://eth-mainnet.g.alchemy.com/v2/demo",
+    "solana": getattr(process.env, "SOLANA_RPC", "") or "https://api.mainnet-beta.solana.com",
+    "bsc": getattr(process.env, "BSC_RPC", "") or "https://bsc-dataseed.binance.org/",
+    "polygon": getattr(process.env, "POLYGON_RPC", "") or "https://polygon-rpc.com",
+    "arbitrum": getattr(process.env, "ARBITRUM_RPC", "") or "https://arb1.arbitrum.io/rpc"
+}
+
+# Demo only: GAS_ORACLE_DEMO=1 swaps the RPC sources for simulated fee markets
+GAS_ORACLE_DEMO = str(getattr(process.env, "GAS_ORACLE_DEMO", "")).strip().lower() in ("1", "true", "yes")
+
+# Rebalancing: act once holdings drift 5% from target, skip moves under
+# 0.01 or whose gas exceeds 1% of the amount moved
+REBALANCE_DRIFT_THRESHOLD = 0.05
+REBALANCE_MIN_TRADE = 0.01
+REBALANCE_MAX_GAS_FRACTION = 0.01
+
 # ===== AGENT INITIALIZATION =====
 try:
     strategy_agent = agent  # type: ignore
@@ -88,6 +225,60 @@ except NameError:
         # NOTE: No endpoint for Agentverse - auto-configured
     )
 
+GAS_ORACLE = GasOracle(
+    create_stub_sources() if GAS_ORACLE_DEMO else create_rpc_sources(GAS_RPC_ENDPOINTS),
+    fallback_costs=GAS_COSTS,
+    refresh_seconds=GAS_REFRESH_SECONDS,
+    max_age_seconds=GAS_MAX_AGE_SECONDS
+)
+
+def _gas_cost(chain: str) -> float:
+    """Current transaction cost on a chain (ETH equivalent)"""
+    return GAS_ORACLE.gas_cost(chain)
+
+REBALANCER = Rebalancer(
+    drift_threshold=REBALANCE_DRIFT_THRESHOLD,
+    min_trade_size=REBALANCE_MIN_TRADE,
+    max_gas_fraction=REBALANCE_MAX_GAS_FRACTION,
+    gas_cost=lambda chain, action: _gas_cost(chain)
+)
+
+def _compute_frontier_plan(opportunities, risk_level, chains, optimizer):
+    request = StrategyRequest(
+        request_id="frontier",
+        amount=FRONTIER_REFERENCE_AMOUNT,
+        risk_level=risk_level,
+        opportunities=opportunities,
+        recommended_protocols=[],
+        chains=list(chains),
+        optimizer=optimizer
+    )
+    return _plan_optimized_allocation(
+        request,
+        CandidateSet(request.opportunities, request.chains),
+        FRONTIER_REFERENCE_AMOUNT
+    )
+
+GAS_SIZER = GasSizingSolver(
+    horizon_days=GAS_SIZING_HORIZON_DAYS,
+    max_positions=MAX_OPTIMIZED_POSITIONS
+)
+
+FRONTIER_CACHE = FrontierCache(
+    compute=_compute_frontier_plan,
+    default_combinations=[(list(Chain), mode) for mode in OPTIMIZER_MODES],
+    max_snapshots=FRONTIER_MAX_SNAPSHOTS
+)
+
+# Allocation planning (optimizer solves, Monte Carlo simulation) is CPU-bound,
+# so it runs off the event loop. One worker keeps planning serialized, so the
+# frontier and gas-oracle state it reads is never touched by two plans at once.
+PLANNING_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="strategy-planning")
+
+async def _run_planning(fn, *args):
+    """Run a planning function on PLANNING_EXECUTOR without blocking the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(PLANNING_EXECUTOR, fn, *args)
+
 # ===== MESSAGE HANDLER =====
 
 @strategy_agent.on_message(model=StrategyRequest)
@@ -100,7 +291,7 @@ async def handle_strategy_request(ctx: Context, sender: str, msg: StrategyReques
 
     try:
         # Generate optimal allocation strategy
-        response = _generate_strategy(msg)
+        response = await _run_planning(_generate_strategy, msg)
 
         # Send response back to coordinator
         await ctx.send(sender, response)
@@ -111,20 +302,175 @@ async def handle_strategy_request(ctx: Context, sender: str, msg: StrategyReques
 
     except Exception as e:
         ctx.logger.error(f"❌ Error generating strategy: {str(e)}")
-        error_response = StrategyResponse(
+        await ctx.send(sender, _error_response(msg, e))
+
+@strategy_agent.on_message(model=StrategyBatchRequest)
+async def handle_strategy_batch_request(ctx: Context, sender: str, msg: StrategyBatchRequest):
+    """Handle a batch of strategy requests (one response per request, same order)"""
+    ctx.logger.info(f"📨 Received Strategy Batch: {msg.request_id} ({len(msg.requests)} requests)")
+
+    try:
+        response = await _run_planning(_generate_strategy_batch, msg)
+    except Exception as e:
+        ctx.logger.error(f"❌ Error generating strategy batch: {str(e)}")
+        response = StrategyBatchResponse(
             request_id=msg.request_id,
-            allocations=[],
-            expected_apy=0.0,
-            risk_score=0.0,
+            responses=[_error_response(request, e) for request in msg.requests],
+            groups=0,
+            timestamp=datetime.now(timezone.utc).isoformat()
+        )
+    await ctx.send(sender, response)
+
+    failed = sum(1 for r in response.responses if not r.allocations)
+    ctx.logger.info(f"✅ Sent Strategy Batch Response: {msg.request_id}")
+    ctx.logger.info(f"   Groups: {response.groups}, Failed: {failed}")
+
+@strategy_agent.on_message(model=RebalanceRequest)
+async def handle_rebalance_request(ctx: Context, sender: str, msg: RebalanceRequest):
+    """Handle a rebalancing request for existing holdings"""
+    ctx.logger.info(f"📨 Received Rebalance Request: {msg.request_id}")
+    ctx.logger.info(f"   User: {msg.user_id}, Positions: {len(msg.holdings)}, Targets: {len(msg.target)}")
+
+    try:
+        response = await _run_planning(_generate_rebalance, msg)
+    except Exception as e:
+        ctx.logger.error(f"❌ Error generating rebalance: {str(e)}")
+        response = RebalanceResponse(
+            request_id=msg.request_id,
+            user_id=msg.user_id,
+            moves=[],
+            drift_before=0.0,
+            drift_after=0.0,
+            turnover=0.0,
             estimated_gas_cost=0.0,
-            reasoning=f"Error generating strategy: {str(e)}",
+            skipped=0,
+            cached=False,
+            reasoning=f"Error generating rebalance: {str(e)}",
             timestamp=datetime.now(timezone.utc).isoformat()
         )
-        await ctx.send(sender, error_response)
+
+    await ctx.send(sender, response)
+    ctx.logger.info(f"✅ Sent Rebalance Response: {msg.request_id}")
+    ctx.logger.info(f"   Moves: {len(response.moves)}, Cached: {response.cached}")
 
 def _generate_strategy(msg: StrategyRequest) -> StrategyResponse:
     """Generate optimal portfolio allocation strategy"""
 
+    msg = _normalize_request(msg)
+    plan = _plan_allocation(msg)
+    return _build_strategy_response(msg, plan, msg.amount * plan.weights)
+
+class AllocationPlan:
+    """
+    Amount-independent part of a strategy: which opportunities, at what weights
+
+    Everything here depends only on the opportunity set, risk level, chains,
+    recommended protocols and optimizer, so the batch handler computes one plan
+    per group and scales it by each user's amount.
+    """
+
+    def __init__(
+        self,
+        opportunities: List[Opportunity],
+        weights: np.ndarray,
+        gas_cost: float,
+        result: Optional[OptimizationResult] = None,
+        candidates: int = 0
+    ):
+        self.opportunities = opportunities
+        self.weights = weights
+        self.gas_cost = gas_cost
+        self.result = result
+        self.candidates = candidates
+        self.simulation: Optional[SimulationResult] = None
+        self.sizing: Optional[SizingResult] = None
+
+        apy = np.fromiter((opp.apy for opp in opportunities), dtype=np.float64, count=len(opportunities))
+        risk = np.fromiter((opp.risk_score for opp in opportunities), dtype=np.float64, count=len(opportunities))
+        self.expected_apy = float(apy @ weights) if result is None else result.expected_apy
+        self.risk_score = float(risk @ weights) if result is None else result.risk_score
+
+class CandidateSet:
+    """
+    Opportunities on the requested chains plus their arrays and covariance
+
+    Built once per distinct (opportunity set, chains) and shared by every
+    optimizer solve in a batch.
+    """
+
+    def __init__(self, opportunities: List[Opportunity], chains: List[Chain]):
+        # The optimizer weighs correlation and constraints itself, so it sees every
+        # opportunity on the requested chains rather than the top 4
+        self.opportunities = [opp for opp in opportunities if opp.chain in chains] or opportunities
+        self.arrays = OpportunityArrays.from_opportunities(self.opportunities)
+        self._cov = None
+
+    @property
+    def cov(self) -> np.ndarray:
+        if self._cov is None:
+            self._cov = build_covariance(self.arrays.risk, self.arrays.chain_idx, self.arrays.protocols)
+        return self._cov
+
+def _plan_allocation(
+    msg: StrategyRequest,
+    candidates: Optional[CandidateSet] = None,
+    amount: Optional[float] = None
+) -> AllocationPlan:
+    """
+    Choose opportunities and weights for a request
+
+    Args:
+        msg: Strategy request
+        candidates: Shared candidate set (built from msg if omitted)
+        amount: Amount used for the optimizer's minimum position size (defaults to msg.amount)
+
+    Returns:
+        AllocationPlan with weights summing to at most 1
+    """
+    if msg.optimizer == GAS_AWARE_MODE:
+        plan = _plan_gas_aware_allocation(msg, candidates or CandidateSet(msg.opportunities, msg.chains))
+    elif msg.optimizer:
+        amount = msg.amount if amount is None else amount
+        plan = _frontier_plan(msg, amount) or _plan_optimized_allocation(
+            msg,
+            candidates or CandidateSet(msg.opportunities, msg.chains),
+            amount
+        )
+    else:
+        plan = _plan_fixed_allocation(msg)
+
+    if msg.simulate and plan.opportunities:
+        # Plans may be shared through the frontier cache, so attach to a copy
+        plan = copy.copy(plan)
+        plan.simulation = _simulate_plan(plan)
+    return plan
+
+def _frontier_plan(msg: StrategyRequest, amount: float) -> Optional[AllocationPlan]:
+    """
+    Look up a precomputed optimizer plan for the request's snapshot
+
+    The request is recorded so the background stage precomputes its
+    combination. Returns None on a miss, or if a cached position would fall
+    under this amount's minimum size.
+    """
+    if msg.optimizer not in OPTIMIZER_MODES:
+        return None
+
+    version = stable_hash([opp.model_dump() for opp in msg.opportunities])
+    FRONTIER_CACHE.observe(version, msg.opportunities, msg.chains, msg.optimizer)
+
+    plan = FRONTIER_CACHE.lookup(version, msg.risk_level, msg.chains, msg.optimizer)
+    if plan is None or not len(plan.weights) or amount * plan.weights.min() < MIN_POSITION_SIZE:
+        return None
+
+    # Gas moves faster than the snapshot, so price the cached plan now
+    plan = copy.copy(plan)
+    plan.gas_cost = sum(_gas_cost(opp.chain) for opp in plan.opportunities)
+    return plan
+
+def _plan_fixed_allocation(msg: StrategyRequest) -> AllocationPlan:
+    """Choose weights with the fixed allocation model for the risk level"""
+
     # Filter opportunities to recommended protocols
     recommended_opps = [
         opp for opp in msg.opportunities
@@ -141,42 +487,289 @@ def _generate_strategy(msg: StrategyRequest) -> StrategyResponse:
 
     # Get allocation percentages based on risk level
     percentages = ALLOCATION_STRATEGIES.get(msg.risk_level, [35, 30, 20, 15])
+    selected = recommended_opps[:len(percentages)]
+
+    return AllocationPlan(
+        opportunities=selected,
+        weights=np.array(percentages[:len(selected)], dtype=np.float64) / 100,
+        gas_cost=sum(_gas_cost(opp.chain) for opp in selected),
+        candidates=len(msg.opportunities)
+    )
+
+def _simulate_plan(plan: AllocationPlan) -> SimulationResult:
+    """Monte Carlo outcome distribution for a plan (amount-independent, in %)"""
+    arrays = OpportunityArrays.from_opportunities(plan.opportunities)
+    # Seed from the plan itself so identical plans report identical distributions
+    seed = int(stable_hash({
+        "opportunities": [opp.model_dump() for opp in plan.opportunities],
+        "weights": plan.weights.round(8).tolist()
+    })[:16], 16)
+    return simulate_strategy(
+        arrays.apy,
+        arrays.risk,
+        plan.weights,
+        arrays.chain_idx,
+        arrays.protocols,
+        n_paths=SIMULATION_PATHS,
+        horizon_days=SIMULATION_HORIZON_DAYS,
+        latency_budget=SIMULATION_BUDGET_SECONDS,
+        seed=seed
+    )
 
-    # Create allocations
-    allocations = []
-    total_gas = 0.0
-    total_weighted_apy = 0.0
-    total_weighted_risk = 0.0
+def _plan_gas_aware_allocation(msg: StrategyRequest, candidates: CandidateSet) -> AllocationPlan:
+    """Choose positions whose yield over the horizon pays for their gas"""
+    arrays = candidates.arrays
+    gas = np.fromiter(
+        (_gas_cost(opp.chain) for opp in candidates.opportunities),
+        dtype=np.float64,
+        count=len(candidates.opportunities)
+    )
+    sizing = GAS_SIZER.solve(
+        arrays.apy, arrays.risk, arrays.chain_idx, gas, msg.amount, msg.risk_level,
+        protocols=arrays.protocols
+    )
+
+    plan = AllocationPlan(
+        opportunities=[candidates.opportunities[i] for i in sizing.indices],
+        weights=sizing.weights,
+        gas_cost=sizing.gas_cost,
+        candidates=len(candidates.opportunities)
+    )
+    plan.sizing = sizing
+    return plan
+
+def _plan_optimized_allocation(msg: StrategyRequest, candidates: CandidateSet, amount: float) -> AllocationPlan:
+    """Choose weights with the NumPy portfolio optimizer"""
+
+    if msg.optimizer not in OPTIMIZER_MODES:
+        raise ValueError(f"Unknown optimizer '{msg.optimizer}'. Use one of {', '.join(STRATEGY_OPTIMIZERS)}")
+
+    arrays = candidates.arrays
+    result = optimize_portfolio(
+        arrays.apy,
+        arrays.risk,
+        arrays.chain_idx,
+        arrays.protocols,
+        mode=msg.optimizer,
+        risk_level=msg.risk_level,
+        min_weight=MIN_POSITION_SIZE / amount if amount > 0 else 0.0,
+        max_positions=MAX_OPTIMIZED_POSITIONS,
+        cov=candidates.cov
+    )
 
-    for i, opp in enumerate(recommended_opps[:len(percentages)]):
-        percentage = percentages[i]
-        amount = msg.amount * (percentage / 100)
+    selected = [candidates.opportunities[i] for i in result.selected]
+    return AllocationPlan(
+        opportunities=selected,
+        weights=result.weights[result.selected],
+        gas_cost=sum(_gas_cost(opp.chain) for opp in selected),
+        result=result,
+        candidates=len(candidates.opportunities)
+    )
 
-        allocations.append(AllocationItem(
+def _build_strategy_response(
+    msg: StrategyRequest,
+    plan: AllocationPlan,
+    amounts: np.ndarray
+) -> StrategyResponse:
+    """
+    Turn an allocation plan into a StrategyResponse for one user
+
+    Args:
+        msg: The user's strategy request
+        plan: Allocation plan for the request's group
+        amounts: Amount per planned opportunity (msg.amount * plan.weights)
+    """
+    allocations = [
+        AllocationItem(
             protocol=opp.protocol,
             chain=opp.chain.value,
-            amount=amount,
-            percentage=percentage,
+            amount=float(amount),
+            percentage=round(float(weight) * 100, 2),
             expected_apy=opp.apy,
             risk_score=opp.risk_score
-        ))
-
-        # Calculate weighted metrics
-        total_weighted_apy += opp.apy * (percentage / 100)
-        total_weighted_risk += opp.risk_score * (percentage / 100)
-
-        # Add gas cost
-        total_gas += GAS_COSTS.get(opp.chain, 0.01)
+        )
+        for opp, weight, amount in zip(plan.opportunities, plan.weights, amounts)
+    ]
 
     # Generate reasoning
-    reasoning = _generate_strategy_reasoning(allocations, msg.risk_level, msg.amount)
+    if allocations:
+        reasoning = _generate_strategy_reasoning(allocations, msg.risk_level, msg.amount)
+    else:
+        reasoning = (
+            f"No position earns back its gas within {GAS_SIZING_HORIZON_DAYS} days "
+            f"at {msg.amount} {msg.currency}; keeping funds uninvested.\n"
+        )
+    if plan.sizing is not None:
+        sizing = plan.sizing
+        reasoning += (
+            f"Gas-aware sizing over {sizing.configurations} configurations:\n"
+            f"- Net yield over {sizing.horizon_days} days: {sizing.net_yield:.4f} {msg.currency} "
+            f"(gross {sizing.gross_yield:.4f}, gas {sizing.gas_cost:.5f})\n"
+        )
+        if allocations and plan.weights.sum() < 1 - 1e-9:
+            reasoning += f"- Uninvested: {1 - plan.weights.sum():.0%} (position caps reached)\n"
+    if plan.result is not None:
+        reasoning += (
+            f"Optimizer: {msg.optimizer.replace('_', '-')} over {plan.candidates} opportunities\n"
+            f"- Volatility: {plan.result.volatility:.2f}%, Sharpe: {plan.result.sharpe:.2f}\n"
+        )
+
+    simulation = None
+    if plan.simulation is not None:
+        sim = plan.simulation
+        simulation = OutcomeDistribution(**sim.to_dict())
+        reasoning += (
+            f"Outcome Distribution ({sim.paths:,} paths, {sim.horizon_days} days):\n"
+            f"- Median return: {sim.return_percentiles['p50']:.2f}% "
+            f"(5th-95th: {sim.return_percentiles['p5']:.2f}% to {sim.return_percentiles['p95']:.2f}%)\n"
+            f"- VaR 95%: {sim.var_95:.2f}% ({msg.amount * sim.var_95 / 100:.2f} {msg.currency}), "
+            f"CVaR 95%: {sim.cvar_95:.2f}%\n"
+            f"- Max drawdown: {sim.max_drawdown_p50:.2f}% median, {sim.max_drawdown_p95:.2f}% at 95th\n"
+        )
 
     return StrategyResponse(
         request_id=msg.request_id,
         allocations=allocations,
-        expected_apy=total_weighted_apy,
-        risk_score=total_weighted_risk,
-        estimated_gas_cost=total_gas,
+        expected_apy=plan.expected_apy,
+        risk_score=plan.risk_score,
+        estimated_gas_cost=plan.gas_cost,
+        reasoning=reasoning,
+        timestamp=datetime.now(timezone.utc).isoformat(),
+        simulation=simulation
+    )
+
+# ===== BATCH GENERATION =====
+
+def _opportunity_set_key(msg: StrategyRequest) -> str:
+    """Content hash of a request's opportunity set and chain filter"""
+    return stable_hash({
+        "opportunities": [opp.model_dump() for opp in msg.opportunities],
+        "chains": sorted(chain.value for chain in msg.chains)
+    })
+
+def _normalize_request(msg: StrategyRequest) -> StrategyRequest:
+    """Request with its risk level in canonical form ("Moderate " -> "moderate")"""
+    return msg.model_copy(update={"risk_level": msg.risk_level.strip().lower()})
+
+def _plan_key(msg: StrategyRequest, opportunity_set: str) -> str:
+    """Content hash of everything an AllocationPlan depends on"""
+    return stable_hash({
+        "opportunity_set": opportunity_set,
+        "risk_level": msg.risk_level.strip().lower(),
+        "recommended_protocols": sorted(set(msg.recommended_protocols)),
+        "optimizer": msg.optimizer,
+        "simulate": msg.simulate,
+        # Gas-aware sizing depends on the amount itself
+        "amount": msg.amount if msg.optimizer == GAS_AWARE_MODE else None
+    })
+
+def _error_response(msg: StrategyRequest, error: Exception) -> StrategyResponse:
+    return StrategyResponse(
+        request_id=msg.request_id,
+        allocations=[],
+        expected_apy=0.0,
+        risk_score=0.0,
+        estimated_gas_cost=0.0,
+        reasoning=f"Error generating strategy: {str(error)}",
+        timestamp=datetime.now(timezone.utc).isoformat()
+    )
+
+def _generate_strategy_batch(msg: StrategyBatchRequest) -> StrategyBatchResponse:
+    """
+    Generate strategies for many users, sharing work across identical inputs
+
+    Requests are grouped by a content hash of their opportunity set. Filtering,
+    arrays and covariance are built once per opportunity set, ranking and gas
+    lookups once per (risk level, recommended protocols, optimizer) group, and
+    each group's allocation amounts come from one outer product of user
+    amounts and plan weights.
+    """
+    candidate_sets: Dict[str, CandidateSet] = {}
+    groups: Dict[str, List[int]] = {}
+    msg = msg.model_copy(update={"requests": [_normalize_request(request) for request in msg.requests]})
+    for i, request in enumerate(msg.requests):
+        set_key = _opportunity_set_key(request)
+        if set_key not in candidate_sets:
+            candidate_sets[set_key] = CandidateSet(request.opportunities, request.chains)
+        groups.setdefault(_plan_key(request, set_key), []).append(i)
+
+    responses: List[Optional[StrategyResponse]] = [None] * len(msg.requests)
+    for members in groups.values():
+        requests = [msg.requests[i] for i in members]
+        lead = requests[0]
+        candidates = candidate_sets[_opportunity_set_key(lead)]
+
+        try:
+            amounts = np.array([request.amount for request in requests], dtype=np.float64)
+            # Plan at the largest amount in the group: its minimum position
+            # size is the least restrictive
+            plan = _plan_allocation(lead, candidates, amount=float(amounts.max()))
+            allocation_amounts = np.outer(amounts, plan.weights)
+        except Exception as e:
+            for i, request in zip(members, requests):
+                responses[i] = _error_response(request, e)
+            continue
+
+        smallest = plan.weights.min() if len(plan.weights) else 0.0
+        small_account_plans: Dict[float, AllocationPlan] = {}
+        for row, (i, request) in enumerate(zip(members, requests)):
+            try:
+                if plan.result is not None and request.amount * smallest < MIN_POSITION_SIZE:
+                    # Position sizes fall under the minimum for this user
+                    # (small account): re-solve with their own threshold
+                    if request.amount not in small_account_plans:
+                        small_account_plans[request.amount] = _plan_allocation(request, candidates)
+                    own_plan = small_account_plans[request.amount]
+                    responses[i] = _build_strategy_response(request, own_plan, request.amount * own_plan.weights)
+                else:
+                    responses[i] = _build_strategy_response(request, plan, allocation_amounts[row])
+            except Exception as e:
+                responses[i] = _error_response(request, e)
+
+    return StrategyBatchResponse(
+        request_id=msg.request_id,
+        responses=responses,
+        groups=len(groups),
+        timestamp=datetime.now(timezone.utc).isoformat()
+    )
+
+# ===== REBALANCING =====
+
+def _generate_rebalance(msg: RebalanceRequest) -> RebalanceResponse:
+    """Compute the minimal moves from current holdings to the target allocation"""
+
+    plan, cached = REBALANCER.rebalance(msg.user_id, msg.holdings, msg.target, cash=msg.cash)
+
+    if not plan.moves:
+        reasoning = (
+            f"No rebalance needed: drift {plan.drift_before:.1%} is within "
+            f"the {REBALANCER.drift_threshold:.0%} threshold or remaining moves are not worth their gas"
+        )
+    else:
+        lines = [f"Rebalance Plan ({len(plan.moves)} moves):"]
+        for i, move in enumerate(plan.moves, 1):
+            lines.append(
+                f"{i}. {move.action.capitalize()} {move.amount:.4f} {msg.currency} "
+                f"{'from' if move.action == 'withdraw' else 'into'} {move.protocol} ({move.chain})"
+            )
+        lines.extend([
+            "",
+            f"- Drift: {plan.drift_before:.1%} -> {plan.drift_after:.1%}",
+            f"- Turnover: {plan.turnover:.1%} of {plan.total_value:.4f} {msg.currency}",
+            f"- Gas: {plan.gas_cost:.5f} ETH, {plan.skipped} small move(s) skipped"
+        ])
+        reasoning = "\n".join(lines)
+
+    return RebalanceResponse(
+        request_id=msg.request_id,
+        user_id=msg.user_id,
+        moves=[RebalanceMoveItem(**move.to_dict()) for move in plan.moves],
+        drift_before=plan.drift_before,
+        drift_after=plan.drift_after,
+        turnover=plan.turnover,
+        estimated_gas_cost=plan.gas_cost,
+        skipped=plan.skipped,
+        cached=cached,
         reasoning=reasoning,
         timestamp=datetime.now(timezone.utc).isoformat()
     )
@@ -222,6 +815,32 @@ def _generate_strategy_reasoning(
 
     return "\n".join(reasoning_parts)
 
+# ===== FRONTIER PRECOMPUTATION =====
+
+@strategy_agent.on_interval(period=FRONTIER_REFRESH_SECONDS)
+async def precompute_frontier(ctx: Context):
+    """Fill the frontier cache for the newest opportunity snapshots"""
+    # Shares the planning worker with request handling, so lookups never see a half-built snapshot
+    computed = await _run_planning(FRONTIER_CACHE.precompute, FRONTIER_BUDGET_SECONDS)
+    if computed:
+        ctx.logger.info(f"📐 Precomputed {computed} frontier allocation(s)")
+
+@strategy_agent.on_interval(period=FRONTIER_STATS_INTERVAL_SECONDS)
+async def log_frontier_stats(ctx: Context):
+    """Periodically log frontier cache effectiveness"""
+    stats = FRONTIER_CACHE.stats()
+    ctx.logger.info(
+        f"📊 Frontier cache: {stats['size']} entries, {stats['snapshots']} snapshot(s), "
+        f"hit rate {stats['hit_rate']:.1%} ({stats['hits']} hits / {stats['misses']} misses)"
+    )
+
+@strategy_agent.on_interval(period=GAS_REFRESH_SECONDS)
+async def refresh_gas_prices(ctx: Context):
+    """Refresh the gas oracle's fee estimates"""
+    refreshed = await GAS_ORACLE.refresh()
+    if refreshed < len(GAS_ORACLE.sources):
+        ctx.logger.warning(f"⚠️  Gas oracle refreshed {refreshed}/{len(GAS_ORACLE.sources)} chains")
+
 # ===== STARTUP EVENT HANDLER =====
 
 @strategy_agent.on_event("startup")
@@ -234,6 +853,7 @@ async def startup(ctx: Context):
     ctx.logger.info(f"Mailbox: Enabled ✓")
     ctx.logger.info(f"Capabilities: Portfolio Optimization, Risk Management")
     ctx.logger.info("=" * 60)
+    await GAS_ORACLE.refresh()
     ctx.logger.info("✅ Ready to receive strategy requests")
 
 if __name__ == "__main__":
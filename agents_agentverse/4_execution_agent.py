@@ -1,14 +1,31 @@
 """
 YieldSwarm AI - Execution Agent
-AGENTVERSE DEPLOYMENT VERSION - Self-contained
+AGENTVERSE DEPLOYMENT VERSION - Requires the repository's utils/ package
+
+Not a single-file agent: it imports utils.* from the repository root (see the
+sys.path line below) and reads the compiled protocol registry
+(metta_kb/defi_protocols.{protocols,chains}.npy, rebuilt from
+defi_protocols.metta when stale). Deploy it together with utils/ and metta_kb/.
 """
 from uagents import Agent, Context, Protocol
 from uagents_core.contrib.protocols.chat import chat_protocol_spec
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import List, Dict, Optional, Set
 from pydantic import BaseModel
 from enum import Enum
-import random
+import asyncio
+import os
+import sys
+
+# Shared utils/ package lives one level above agents_agentverse/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.chain_executor import ChainExecutor, TxAction, TxResult, receipt_cost
+from utils.chain_simulator import create_local_chains
+from utils.execution_planner import PlannedAction, plan_strategy, run_plan
+from utils.tx_batcher import TxBatcher
+from utils.gas_oracle import GasOracle, create_rpc_sources, create_stub_sources
+from utils.execution_journal import ExecutionJournal, RequestState
+from utils.dry_run import dry_run
 
 # ===== INLINE MESSAGE MODELS =====
 
@@ -27,6 +44,19 @@ class AllocationItem(BaseModel):
     expected_apy: float
     risk_score: float = 5.0
 
+class OutcomeDistribution(BaseModel):
+    paths: int
+    horizon_days: int
+    mean_return: float
+    return_percentiles: Dict[str, float]
+    var_95: float
+    var_99: float
+    cvar_95: float
+    max_drawdown_p50: float
+    max_drawdown_p95: float
+    probability_of_loss: float
+    budget_exhausted: bool = False
+
 class StrategyResponse(BaseModel):
     request_id: str
     allocations: List[AllocationItem]
@@ -35,6 +65,7 @@ class StrategyResponse(BaseModel):
     estimated_gas_cost: float
     reasoning: str
     timestamp: str
+    simulation: Optional[OutcomeDistribution] = None
 
 class ExecutionRequest(BaseModel):
     request_id: str
@@ -42,6 +73,7 @@ class ExecutionRequest(BaseModel):
     strategy: StrategyResponse
     user_wallet: str
     max_slippage: float = 0.5
+    source_chain: Optional[Chain] = None
 
 class TransactionDetail(BaseModel):
     tx_hash: str
@@ -61,6 +93,8 @@ class ExecutionResponse(BaseModel):
     total_gas_cost: float
     execution_time_seconds: float
     errors: List[str] = []
+    critical_path: List[str] = []
+    critical_path_seconds: Optional[float] = None
 
 # ===== CONFIGURATION =====
 EXECUTION_SEED = process.env.EXECUTION_SEED
@@ -69,6 +103,70 @@ EXECUTION_PORT = 8004
 # ASI:One API Configuration
 ASI_ONE_API_KEY = process.env.ASI_ONE_API_KEY
 
+# Performance Tracker: receives a copy of every ExecutionResponse with
+# transactions for its position ledger (empty disables)
+TRACKER_ADDRESS = ""
+
+# Fallback gas costs per chain (in ETH equivalent), used while the gas
+# oracle has no fresh estimate for a chain
+GAS_COSTS = {
+    "ethereum": 0.015,
+    "polygon": 0.0001,
+    "arbitrum": 0.0008,
+    "bsc": 0.0002,
+    "solana": 0.00001
+}
+
+# Gas oracle: live EIP-1559 fee estimates refreshed in the background
+GAS_REFRESH_SECONDS = 12.0
+GAS_MAX_AGE_SECONDS = 60.0
+
+# Per-chain RPC endpoints the gas oracle reads live fees from
+GAS_RPC_ENDPOINTS = {
+    "ethereum": getattr(process.env, "ETHEREUM_RPC", "") or "https://eth-mainnet.g.alchemy.com/v2/demo",
+    "solana": getattr(process.env, "SOLANA_RPC", "") or "https://api.mainnet-beta.solana.com",
+    "bsc": getattr(process.env, "BSC_RPC", "") or "https://bsc-dataseed.binance.org/",
+    "polygon": getattr(process.env, "POLYGON_RPC", "") or "https://polygon-rpc.com",
+    "arbitrum": getattr(process.env, "ARBITRUM_RPC", "") or "https://arb1.arbitrum.io/rpc"
+}
+
+# Demo only: GAS_ORACLE_DEMO=1 swaps the RPC sources for simulated fee markets
+GAS_ORACLE_DEMO = str(getattr(process.env, "GAS_ORACLE_DEMO", "")).strip().lower() in ("1", "true", "yes")
+
+# Simulated block times per chain (1/100 of real time)
+SIMULATED_BLOCK_TIMES = {
+    "ethereum": 0.12,
+    "polygon": 0.02,
+    "arbitrum": 0.0025,
+    "bsc": 0.03,
+    "solana": 0.004
+}
+
+# Unconfirmed transactions allowed per chain before submission waits
+MAX_IN_FLIGHT_PER_CHAIN = 8
+CONFIRMATION_TIMEOUT_SECONDS = 30.0
+
+# Share of a transaction's gas spent on the call itself (rest is batchable overhead)
+SIMULATED_CALL_GAS_SHARES = {"solana": 0.2}
+
+# Actions on the same chain and wallet submitted within this window share a
+# batch transaction (smart-account batch on EVM, multi-instruction on Solana)
+BATCH_WINDOW_SECONDS = 0.01
+MAX_BATCH_CALLS = 16
+BATCH_STATS_INTERVAL_SECONDS = 300.0
+
+# Write-ahead journal of planned/submitted/confirmed actions, replayed on
+# startup to resume in-flight strategies
+EXECUTION_JOURNAL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "execution_journal.jsonl")
+JOURNAL_COMPACT_INTERVAL_SECONDS = 600.0
+
+# Every action is simulated (eth_call / simulateTransaction) before anything
+# is sent; the strategy is rejected if any would revert or exceed max_slippage
+DRY_RUN_TIMEOUT_SECONDS = 2.0
+
+# Bridge transfers are simulated at 1/1000 of their estimated real duration
+SIMULATED_BRIDGE_SCALE = 0.001
+
 # ===== AGENT INITIALIZATION =====
 try:
     execution_agent = agent  # type: ignore
@@ -97,12 +195,52 @@ async def handle_execution_request(ctx: Context, sender: str, msg: ExecutionRequ
     ctx.logger.info(f"   Wallet: {msg.user_wallet}")
     ctx.logger.info(f"   Allocations: {len(msg.strategy.allocations)}")
 
+    journal = _get_journal()
+    finished = journal.finished(msg.request_id)
+    if finished is not None:
+        # Redelivery of a request that already ran: answer, never re-execute
+        ctx.logger.warning(f"⚠️  {msg.request_id} already finished ({finished.get('status')}), re-sending its response")
+        await ctx.send(sender, _recorded_response(msg, finished))
+        return
+
+    # A request is only journaled as planned after its dry run, so claim it
+    # here, before the first await, or a concurrent duplicate would pass too
+    state = journal.state(msg.request_id)
+    if msg.request_id in _accepted or (state is not None and not state.finished):
+        ctx.logger.warning(f"⚠️  {msg.request_id} is already in flight, ignoring duplicate")
+        return
+
+    _accepted.add(msg.request_id)
+    try:
+        await _run_request(ctx, sender, msg)
+    finally:
+        _accepted.discard(msg.request_id)
+
+def _recorded_response(msg: ExecutionRequest, finished: Dict) -> ExecutionResponse:
+    """The response journaled when a request finished (a status-only one for older records)"""
+    if finished.get("response"):
+        return ExecutionResponse(**finished["response"])
+    return ExecutionResponse(
+        request_id=msg.request_id,
+        user_id=msg.user_id,
+        status=finished.get("status", "failed"),
+        transactions=[],
+        total_gas_cost=0.0,
+        execution_time_seconds=0.0,
+        errors=["Request already executed; original response not recorded"]
+    )
+
+async def _run_request(ctx: Context, sender: str, msg: ExecutionRequest, resume: Optional[RequestState] = None):
+    """Execute (or resume) a request, reply, and close it in the journal"""
     try:
         # Simulate transaction execution
-        response = _execute_strategy(msg)
+        response = await _execute_strategy(ctx, msg, sender, resume)
 
         # Send response back to coordinator
         await ctx.send(sender, response)
+        if TRACKER_ADDRESS and response.transactions:
+            # The tracker derives positions from confirmed transactions
+            await ctx.send(TRACKER_ADDRESS, response)
 
         ctx.logger.info(f"✅ Sent Execution Response: {msg.request_id}")
         ctx.logger.info(f"   Status: {response.status}")
@@ -110,7 +248,7 @@ async def handle_execution_request(ctx: Context, sender: str, msg: ExecutionRequ
 
     except Exception as e:
         ctx.logger.error(f"❌ Error executing strategy: {str(e)}")
-        error_response = ExecutionResponse(
+        response = ExecutionResponse(
             request_id=msg.request_id,
             user_id=msg.user_id,
             status="failed",
@@ -119,80 +257,256 @@ async def handle_execution_request(ctx: Context, sender: str, msg: ExecutionRequ
             execution_time_seconds=0.0,
             errors=[f"Execution error: {str(e)}"]
         )
-        await ctx.send(sender, error_response)
+        await ctx.send(sender, response)
 
-def _execute_strategy(msg: ExecutionRequest) -> ExecutionResponse:
+    # Closed only after replying, so a crash in between re-sends the response.
+    # The response is kept with the tombstone to answer redeliveries.
+    _get_journal().append(
+        msg.request_id, "finished", status=response.status, response=response.model_dump(mode="json")
+    )
+
+GAS_ORACLE = GasOracle(
+    create_stub_sources() if GAS_ORACLE_DEMO else create_rpc_sources(GAS_RPC_ENDPOINTS),
+    fallback_costs=GAS_COSTS,
+    refresh_seconds=GAS_REFRESH_SECONDS,
+    max_age_seconds=GAS_MAX_AGE_SECONDS
+)
+
+_executor: Optional[ChainExecutor] = None
+_batcher: Optional[TxBatcher] = None
+_journal: Optional[ExecutionJournal] = None
+# Request ids being handled in this process (covers the dry run, which runs
+# before the request is journaled)
+_accepted: Set[str] = set()
+
+def _get_journal() -> ExecutionJournal:
+    """Execution journal, replayed and opened on first use"""
+    global _journal
+    if _journal is None:
+        _journal = ExecutionJournal(EXECUTION_JOURNAL_PATH)
+        _journal.open()
+    return _journal
+
+def _journal_submitted(result: TxResult):
+    """Record hash and nonce of a submitted transaction for every step it carries"""
+    calls = result.action.data.get("calls") or [result.action.data]
+    for call in calls:
+        if "journal_ref" in call:
+            request_id, action_id = call["journal_ref"]
+            _get_journal().append(
+                request_id, "submitted",
+                action_id=action_id, chain=result.action.chain, tx_hash=result.tx_hash, nonce=result.nonce
+            )
+
+def _get_executor() -> ChainExecutor:
+    """Executor over simulated chains, created on first use"""
+    global _executor
+    if _executor is None:
+        gas_costs = {chain.value: _estimate_gas(chain.value) for chain in Chain}
+        _executor = ChainExecutor(
+            create_local_chains(gas_costs, SIMULATED_BLOCK_TIMES, SIMULATED_CALL_GAS_SHARES),
+            max_in_flight=MAX_IN_FLIGHT_PER_CHAIN,
+            confirmation_timeout=CONFIRMATION_TIMEOUT_SECONDS,
+            block_times=SIMULATED_BLOCK_TIMES,
+            fee_params=GAS_ORACLE.fee_params,
+            on_submitted=_journal_submitted
+        )
+    return _executor
+
+def _get_batcher() -> TxBatcher:
+    """Batching stage in front of the executor, created on first use"""
+    global _batcher
+    if _batcher is None:
+        executor = _get_executor()
+        _batcher = TxBatcher(
+            executor,
+            lambda chain: executor.clients[chain].gas_cost,
+            max_batch_calls=MAX_BATCH_CALLS,
+            window_seconds=BATCH_WINDOW_SECONDS
+        )
+    return _batcher
+
+async def _execute_strategy(
+    ctx: Context,
+    msg: ExecutionRequest,
+    sender: str = "",
+    resume: Optional[RequestState] = None
+) -> ExecutionResponse:
     """
     Execute portfolio strategy (SIMULATED)
 
+    The allocations are planned as a dependency graph (bridge before deposit
+    on the destination chain, approve before deposit, swap before providing
+    liquidity). Each action starts as soon as its dependencies confirm, so
+    independent branches and chains run concurrently. Actions that become
+    ready together on one chain are batched into a single transaction, and
+    on each chain transactions are pipelined with locally managed nonces.
+
+    Before anything is sent, every action is dry-run concurrently across
+    chains; if any would revert or exceed max_slippage (or the simulations
+    do not finish within DRY_RUN_TIMEOUT_SECONDS) the request is rejected.
+
+    Every step is journaled (planned, submitted, confirmed). When resuming
+    after a restart, confirmed steps are not sent again and steps that were
+    submitted but never confirmed are only awaited, never resubmitted.
+
     In production, this would:
     - Connect to Web3 providers
     - Execute real transactions
     - Monitor for MEV protection
     - Handle slippage and errors
 
-    For demo: Simulates successful execution
+    For demo: Executes against in-process chain simulators
     """
+    start_time = datetime.now(timezone.utc)
+
+    source_chain = msg.source_chain.value if msg.source_chain else None
+    plan = plan_strategy(msg.strategy.allocations, source_chain=source_chain)
+    batcher = _get_batcher()
+    journal = _get_journal()
+    tx_results = {}
+
+    if resume is None:
+        report = await dry_run(
+            plan, _get_executor().clients, msg.user_wallet, msg.max_slippage,
+            timeout=DRY_RUN_TIMEOUT_SECONDS, fee_params=GAS_ORACLE.fee_params
+        )
+        ctx.logger.info(
+            f"   Dry run: {len(plan)} actions in {report.elapsed * 1000:.0f} ms, "
+            f"{'GO' if report.go else 'NO-GO'}"
+        )
+        if not report.go:
+            return ExecutionResponse(
+                request_id=msg.request_id,
+                user_id=msg.user_id,
+                status="rejected",
+                transactions=[],
+                total_gas_cost=0.0,
+                execution_time_seconds=(datetime.now(timezone.utc) - start_time).total_seconds(),
+                errors=[f"Dry run: {reason}" for reason in report.reasons]
+            )
+
+        await journal.log(
+            msg.request_id, "planned",
+            request=msg.model_dump(mode="json"), sender=sender, actions=list(plan.actions)
+        )
+
+    async def run_action(step: PlannedAction):
+        journaled = resume.actions.get(step.action_id, {}) if resume is not None else {}
+        if journaled.get("tx_hash"):
+            result = await _recover_result(step, journaled)
+        else:
+            action = TxAction(step.chain, step.protocol, step.action, step.amount, {
+                **step.data, "journal_ref": [msg.request_id, step.action_id]
+            })
+            result = await batcher.submit(msg.user_wallet, action)
+        tx_results[step.action_id] = result
+        journal.append(
+            msg.request_id, result.status if result.status in ("confirmed", "reverted") else "failed",
+            action_id=step.action_id, chain=step.chain, tx_hash=result.tx_hash, nonce=result.nonce,
+            gas_used=result.gas_used, block_number=result.block_number, error=result.error
+        )
+        if result.status != "confirmed":
+            raise RuntimeError(result.error or f"transaction {result.status}")
+        if step.action == "bridge":
+            # Funds arrive on the destination chain after the bridge delay
+            await asyncio.sleep(step.data["bridge_seconds"] * SIMULATED_BRIDGE_SCALE)
+
+    schedule = await run_plan(plan, run_action)
+    for action_id, outcome in schedule.outcomes.items():
+        if outcome.status == "skipped":
+            journal.append(msg.request_id, "skipped", action_id=action_id, error=outcome.error)
 
     transactions = []
+    errors = []
     total_gas = 0.0
-    start_time = datetime.now(timezone.utc)
-
-    # Simulate transaction for each allocation
-    for alloc in msg.strategy.allocations:
-        # Generate simulated transaction hash
-        tx_hash = _generate_tx_hash()
-
-        # Estimate gas based on chain
-        gas_used = _estimate_gas(alloc.chain)
-        total_gas += gas_used
-
-        # Create transaction detail
-        tx = TransactionDetail(
-            tx_hash=tx_hash,
-            chain=Chain(alloc.chain.lower()) if isinstance(alloc.chain, str) else alloc.chain,
-            protocol=alloc.protocol,
-            action="deposit",
-            amount=alloc.amount,
-            status="confirmed",
+    for action_id, outcome in schedule.outcomes.items():
+        step = outcome.action
+        result = tx_results.get(action_id)
+        gas_used = result.gas_used if result else None
+        total_gas += gas_used or 0.0
+        if outcome.error:
+            errors.append(f"{step.action} {step.protocol} ({step.chain}): {outcome.error}")
+
+        transactions.append(TransactionDetail(
+            tx_hash=(result.tx_hash if result else None) or "",
+            chain=Chain(step.chain),
+            protocol=step.protocol,
+            action=step.action,
+            amount=step.amount,
+            status=result.status if result else outcome.status,
             gas_used=gas_used,
             timestamp=datetime.now(timezone.utc).isoformat()
-        )
+        ))
 
-        transactions.append(tx)
+        icon = "✅" if outcome.status == "completed" else "❌"
+        nonce = result.nonce if result else "-"
+        ctx.logger.info(f"   {icon} {step.chain} nonce {nonce}: {step.action} {step.protocol} - {step.amount:.2f} ETH ({outcome.status})")
 
-        ctx.logger.info(f"   ✅ Simulated TX: {alloc.protocol} - {alloc.amount:.2f} ETH")
+    tx_count = len({result.tx_hash for result in tx_results.values() if result.tx_hash})
+    ctx.logger.info(f"   {len(tx_results)} actions sent in {tx_count} transactions")
+    ctx.logger.info(
+        f"   Critical path: {len(schedule.estimated_critical_path)} steps, "
+        f"~{schedule.estimated_seconds:.0f}s on mainnet ({schedule.makespan:.2f}s simulated)"
+    )
 
     # Calculate execution time
     end_time = datetime.now(timezone.utc)
     execution_time = (end_time - start_time).total_seconds()
 
+    completed = schedule.completed
+    if completed == len(plan):
+        status = "success"
+    elif completed:
+        status = "partial"
+    else:
+        status = "failed"
+
     return ExecutionResponse(
         request_id=msg.request_id,
         user_id=msg.user_id,
-        status="success",
+        status=status,
         transactions=transactions,
         total_gas_cost=total_gas,
         execution_time_seconds=execution_time,
-        errors=[]
+        errors=errors,
+        critical_path=schedule.estimated_critical_path,
+        critical_path_seconds=schedule.estimated_seconds
     )
 
-def _generate_tx_hash() -> str:
-    """Generate simulated transaction hash"""
-    import hashlib
-    random_data = f"{random.random()}{datetime.now(timezone.utc).isoformat()}"
-    return "0x" + hashlib.sha256(random_data.encode()).hexdigest()
+async def _recover_result(step: PlannedAction, journaled: Dict) -> TxResult:
+    """
+    Result of a step journaled before a restart
+
+    Confirmed and reverted steps are returned as recorded. A step that was
+    submitted but not confirmed is looked up on chain; it is never sent
+    again, since the original transaction may still be mined.
+    """
+    result = TxResult(TxAction(step.chain, step.protocol, step.action, step.amount))
+    result.tx_hash = journaled["tx_hash"]
+    result.nonce = journaled.get("nonce")
+    result.gas_used = journaled.get("gas_used")
+    result.block_number = journaled.get("block_number")
+    if journaled["status"] in ("confirmed", "reverted"):
+        result.status = journaled["status"]
+        return result
+
+    executor = _get_executor()
+    if step.chain in executor.clients:
+        receipt = await executor.tracker.wait(step.chain, result.tx_hash)
+        if receipt is not None:
+            result.status = "confirmed" if receipt.get("status") == 1 else "reverted"
+            result.gas_used = receipt_cost(receipt)
+            result.block_number = receipt.get("blockNumber")
+            return result
+
+    result.status = "failed"
+    result.error = "Submitted before restart, receipt not found (not resubmitted)"
+    return result
 
 def _estimate_gas(chain: str) -> float:
-    """Estimate gas cost based on chain"""
-    gas_costs = {
-        "ethereum": 0.015,
-        "polygon": 0.0001,
-        "arbitrum": 0.0008,
-        "bsc": 0.0002,
-        "solana": 0.00001
-    }
-    return gas_costs.get(chain.lower(), 0.01)
+    """Estimate gas cost based on chain (live oracle estimate, static fallback)"""
+    return GAS_ORACLE.gas_cost(chain.lower())
 
 # ===== STARTUP EVENT HANDLER =====
 
@@ -207,8 +521,44 @@ async def startup(ctx: Context):
     ctx.logger.info(f"Mode: SIMULATION (Safe for demo)")
     ctx.logger.info(f"Capabilities: Transaction Execution, MEV Protection")
     ctx.logger.info("=" * 60)
+    await GAS_ORACLE.refresh()
+
+    # Resume strategies that were in flight when the agent stopped
+    for state in _get_journal().pending():
+        ctx.logger.info(f"🔁 Resuming {state.request_id} from journal")
+        asyncio.ensure_future(_run_request(ctx, state.sender, ExecutionRequest(**state.request), resume=state))
     ctx.logger.info("✅ Ready to receive execution requests")
 
+@execution_agent.on_interval(period=GAS_REFRESH_SECONDS)
+async def refresh_gas_prices(ctx: Context):
+    """Refresh the gas oracle's fee estimates"""
+    refreshed = await GAS_ORACLE.refresh()
+    if refreshed < len(GAS_ORACLE.sources):
+        ctx.logger.warning(f"⚠️  Gas oracle refreshed {refreshed}/{len(GAS_ORACLE.sources)} chains")
+
+@execution_agent.on_interval(period=JOURNAL_COMPACT_INTERVAL_SECONDS)
+async def compact_journal(ctx: Context):
+    """Drop finished requests from the execution journal"""
+    dropped = await _get_journal().compact()
+    if dropped:
+        ctx.logger.info(f"📒 Journal compacted: {dropped} finished record(s) dropped")
+
+@execution_agent.on_interval(period=BATCH_STATS_INTERVAL_SECONDS)
+async def log_batch_stats(ctx: Context):
+    """Log transaction batching savings and confirmation polling"""
+    if _batcher is None or not _batcher.calls:
+        return
+    stats = _batcher.stats()
+    ctx.logger.info(
+        f"📦 Batching: {stats['calls']} actions in {stats['transactions']} txs, "
+        f"saved {stats['round_trips_saved']} round trips and {stats['gas_saved']:.5f} gas"
+    )
+    tracking = _executor.tracker.stats()
+    ctx.logger.info(
+        f"🔔 Confirmations: {tracking['confirmed']} receipts with {tracking['polls']} head polls "
+        f"and {tracking['receipt_requests']} receipt requests, {tracking['timed_out']} timed out"
+    )
+
 if __name__ == "__main__":
     print("\n🐝 YieldSwarm AI - Execution Agent")
     print(f"Address: {execution_agent.address}")
@@ -1,13 +1,33 @@
 """
 YieldSwarm AI - Performance Tracker Agent
-AGENTVERSE DEPLOYMENT VERSION - Self-contained
+AGENTVERSE DEPLOYMENT VERSION - Requires the repository's utils/ package
+
+Not a single-file agent: it imports utils.* from the repository root (see the
+sys.path line below) and reads the compiled protocol registry
+(metta_kb/defi_protocols.{protocols,chains}.npy, rebuilt from
+defi_protocols.metta when stale). Deploy it together with utils/ and metta_kb/.
 """
 from uagents import Agent, Context, Protocol
 from uagents_core.contrib.protocols.chat import chat_protocol_spec
 from datetime import datetime, timezone
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator, Iterator
 from pydantic import BaseModel, Field
 from enum import Enum
+from functools import partial
+import os
+import sys
+import time
+
+# Shared utils/ package lives one level above agents_agentverse/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.tracker_store import TrackerStore
+from utils.timeseries_store import TimeSeriesStore
+from utils.position_ledger import DECREASE_ACTIONS, INCREASE_ACTIONS, PositionLedger
+from utils.protocol_registry import get_registry
+from utils.result_cache import VersionedCache, stable_hash
+from utils.revaluation import RevaluationEngine
+from utils.tracker_shards import ShardRouter, shard_for
+from utils.tax_lots import DEFAULT_METHOD, TaxTotals, chunked, in_period, match_lots
 
 # ===== INLINE MESSAGE MODELS =====
 
@@ -35,6 +55,33 @@ class PositionDetail(BaseModel):
     current_apy: float
     days_held: int
 
+class TransactionDetail(BaseModel):
+    tx_hash: str
+    chain: Chain
+    protocol: str
+    action: str
+    amount: float
+    status: str
+    gas_used: Optional[float] = None
+    timestamp: str
+
+class ExecutionResponse(BaseModel):
+    request_id: str
+    user_id: str
+    status: str
+    transactions: List[TransactionDetail]
+    total_gas_cost: float
+    execution_time_seconds: float
+    errors: List[str] = []
+    critical_path: List[str] = []
+    critical_path_seconds: Optional[float] = None
+
+class HistoryPoint(BaseModel):
+    timestamp: str
+    value: float
+    min_value: float
+    max_value: float
+
 class PerformanceResponse(BaseModel):
     request_id: str
     user_id: str
@@ -45,6 +92,28 @@ class PerformanceResponse(BaseModel):
     realized_apy: float
     total_gas_spent: float
     timestamp: str
+    history: List[HistoryPoint] = []
+    history_resolution: Optional[str] = None
+
+class TaxLotRow(BaseModel):
+    protocol: str
+    chain: str
+    quantity: float
+    acquired_at: Optional[str] = None
+    disposed_at: str
+    cost_basis: float
+    proceeds: float
+    gain: float
+    term: str
+
+class TaxReportChunk(BaseModel):
+    request_id: str
+    user_id: str
+    method: str
+    chunk_index: int
+    rows: List[TaxLotRow]
+    final: bool = False
+    totals: Optional[Dict[str, float]] = None
 
 # ===== CONFIGURATION =====
 TRACKER_SEED = process.env.TRACKER_SEED
@@ -53,8 +122,56 @@ TRACKER_PORT = 8005
 # ASI:One API Configuration
 ASI_ONE_API_KEY = process.env.ASI_ONE_API_KEY
 
-# Simulated portfolio data storage
-portfolio_data: Dict[str, List[PositionDetail]] = {}
+# Positions, lots and valuations persist in SQLite (WAL) across restarts
+TRACKER_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "tracker.db")
+TRACKER_FLUSH_INTERVAL_SECONDS = 1.0
+
+# Value history (columnar segments with minute/hour/day rollups)
+TIMESERIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "timeseries")
+HISTORY_DEFAULT_DAYS = 30
+HISTORY_MAX_POINTS = 500
+# Spacing of the demo history generated for sample positions
+SAMPLE_HISTORY_STEP_SECONDS = 3600
+
+# Every confirmed transaction from an ExecutionResponse is appended to the
+# position ledger; positions are derived from it (snapshot every N events per user)
+# Only ExecutionResponses sent by this agent are recorded (empty records none)
+EXECUTION_ADDRESS = ""
+LEDGER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "ledger.db")
+LEDGER_SNAPSHOT_EVERY = 100
+# USD per unit of an executed amount for markets without a price yet (SIMULATED)
+DEFAULT_TOKEN_PRICE_USD = 2000.0
+
+# Tax reports stream as TaxReportChunk messages of this many rows
+TAX_REPORT_CHUNK_ROWS = 500
+
+# Users are hashed across this many worker processes, each with its own
+# store under TRACKER_SHARD_PATH (0 serves every user in the agent process).
+# Going from 0 to N imports each user's ledger events from LEDGER_PATH into
+# their shard on its first start; value history and demo sample positions
+# start over. Changing N afterwards re-hashes users and is not migrated.
+TRACKER_SHARDS = 0
+TRACKER_SHARD_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "shards")
+# Written in a shard's directory once its legacy ledger import has finished
+LEDGER_MIGRATED_MARKER = "ledger.migrated"
+
+# Market ticks: every open position is revalued at new prices / APYs
+MARKET_TICK_INTERVAL_SECONDS = 60.0
+# Simulated per-tick moves (relative price stdev, absolute APY stdev)
+SIMULATED_PRICE_VOLATILITY = 0.002
+SIMULATED_APY_DRIFT = 0.05
+
+# Responses to these query types are cached per user until one of the
+# user's positions changes or a market tick revalues them (no time expiry)
+CACHED_QUERY_TYPES = ("portfolio_status",)
+RESPONSE_CACHE_SIZE = 10000
+CACHE_STATS_INTERVAL_SECONDS = 300.0
+
+SECONDS_PER_DAY = 86400
+# Simulated gas spent opening a position (ETH)
+GAS_PER_POSITION = 0.015
+
+RESPONSE_CACHE = VersionedCache(maxsize=RESPONSE_CACHE_SIZE)
 
 # ===== AGENT INITIALIZATION =====
 try:
@@ -84,11 +201,14 @@ async def handle_performance_query(ctx: Context, sender: str, msg: PerformanceQu
     ctx.logger.info(f"   Query Type: {msg.query_type}")
 
     try:
-        # Generate performance response
-        response = _generate_performance_report(msg)
-
-        # Send response back to coordinator
-        await ctx.send(sender, response)
+        # Generate and send replies (tax report chunks, then the performance response)
+        replies = _shard_replies(msg) if _router is not None else _local_replies(msg)
+        async for response in replies:
+            await ctx.send(sender, response)
+            if isinstance(response, TaxReportChunk) and response.final:
+                ctx.logger.info(
+                    f"🧾 Tax report: {response.totals['rows']:.0f} rows in {response.chunk_index + 1} chunks ({response.method})"
+                )
 
         ctx.logger.info(f"✅ Sent Performance Response: {msg.request_id}")
         ctx.logger.info(f"   Portfolio Value: ${response.total_portfolio_value:,.2f}")
@@ -109,43 +229,202 @@ async def handle_performance_query(ctx: Context, sender: str, msg: PerformanceQu
         )
         await ctx.send(sender, error_response)
 
+@tracker_agent.on_message(model=ExecutionResponse)
+async def handle_execution_response(ctx: Context, sender: str, msg: ExecutionResponse):
+    """Record an execution's confirmed transactions in the position ledger"""
+    ctx.logger.info(f"📨 Received Execution Response: {msg.request_id}")
+    ctx.logger.info(f"   User: {msg.user_id}")
+    ctx.logger.info(f"   Transactions: {len(msg.transactions)}")
+
+    if sender != EXECUTION_ADDRESS:
+        ctx.logger.warning(f"⚠️  Ignoring Execution Response {msg.request_id} from {sender}: not the execution agent")
+        return
+
+    try:
+        if _router is not None:
+            payload = {"model": "ExecutionResponse", "data": msg.model_dump(mode="json")}
+            recorded = [reply["recorded"] async for reply in _router.request(msg.user_id, payload)][0]
+        else:
+            recorded = _record_execution(msg)
+        ctx.logger.info(f"📒 Recorded {recorded} ledger events for {msg.request_id}")
+    except Exception as e:
+        ctx.logger.error(f"❌ Error recording execution: {str(e)}")
+
+def _record_execution(msg: ExecutionResponse) -> int:
+    """
+    Append confirmed transactions to the ledger and update derived positions
+
+    Event ids are request_id/index, so a re-sent response is recorded once.
+
+    Returns:
+        Events appended
+    """
+    events = []
+    for index, tx in enumerate(msg.transactions):
+        if tx.status != "confirmed":
+            continue
+        events.append({
+            "event_id": f"{msg.request_id}/{index}",
+            "ts": datetime.fromisoformat(tx.timestamp).timestamp(),
+            "action": tx.action,
+            "protocol": tx.protocol,
+            "chain": tx.chain.value,
+            "amount": tx.amount,
+            "value": tx.amount * _market_price(tx.protocol, tx.chain.value),
+            "gas_used": tx.gas_used or 0.0,
+            "tx_hash": tx.tx_hash
+        })
+    appended = _get_ledger().append(msg.user_id, events)
+    if appended:
+        _project_positions(msg.user_id, appended)
+    return len(appended)
+
+def _project_positions(user_id: str, appended: List[Dict[str, Any]]):
+    """
+    Bring the store's positions for the markets just touched in line with the ledger
+
+    The store (and the revaluation arrays) are a projection of the ledger:
+    each touched market is opened, resized or closed to match the ledger
+    state, and the events become tax lots and disposals. A user's first
+    ledger events replace any demo sample positions.
+    """
+    if appended[0]["seq"] == 1:
+        _discard_sample_positions(user_id)
+    store = _get_store()
+    state = _get_ledger().state(user_id)
+    rows = {(row["protocol"], row["chain"]): row for row in store.positions(user_id)}
+    position_ids = {key: row["id"] for key, row in rows.items()}
+
+    moved = [event for event in appended if event["action"] in INCREASE_ACTIONS + DECREASE_ACTIONS]
+    if moved:
+        RESPONSE_CACHE.invalidate(user_id)
+    last_ts = {(event["protocol"], event["chain"]): event["ts"] for event in moved}
+    for key in last_ts:
+        position, row = state["positions"].get(key), rows.get(key)
+        if position is None:
+            if row is not None:
+                store.close_position(row["id"], last_ts[key])
+                if _revaluation is not None:
+                    _revaluation.remove_position(row["id"])
+            continue
+
+        value, apy = position["amount"] * _market_price(*key), _market_apy(*key)
+        if row is None:
+            position_ids[key] = store.open_position(
+                user_id, *key, position["amount"], position["cost"], apy, position["opened_at"]
+            )
+        else:
+            store.resize_position(row["id"], position["amount"], position["cost"])
+        store.record_valuation(position_ids[key], value, apy)
+        if _revaluation is not None:
+            _revaluation.add_position(position_ids[key], user_id, *key, position["amount"], position["cost"], value, apy)
+
+    for event in moved:
+        key = (event["protocol"], event["chain"])
+        if event["action"] in INCREASE_ACTIONS:
+            store.add_lot(user_id, position_ids[key], *key, event["amount"], event["value"], event["ts"])
+        elif key in position_ids:
+            store.add_disposal(user_id, position_ids[key], *key, event["amount"], event["value"], event["ts"])
+
+def _discard_sample_positions(user_id: str):
+    """Drop a user's demo sample positions with their lots, valuations and value history"""
+    position_ids = _get_store().delete_user(user_id)
+    if not position_ids:
+        return
+    series = _get_timeseries()
+    for position_id in position_ids:
+        if _revaluation is not None:
+            _revaluation.remove_position(position_id)
+        series.delete(f"position/{position_id}")
+    series.delete(f"portfolio/{user_id}")
+    RESPONSE_CACHE.invalidate(user_id)
+
+def _market_price(protocol: str, chain: str) -> float:
+    """Unit price of a market from the revaluation arrays (SIMULATED default otherwise)"""
+    market = _get_revaluation().markets().get((protocol, chain))
+    return market["price"] if market is not None else DEFAULT_TOKEN_PRICE_USD
+
+def _market_apy(protocol: str, chain: str) -> float:
+    """APY of a market from the revaluation arrays (the protocol's historical APY otherwise)"""
+    market = _get_revaluation().markets().get((protocol, chain))
+    if market is not None:
+        return market["apy"]
+    known = get_registry().get(protocol)
+    return known["historical_apy"] if known is not None else 0.0
+
+def _query_replies(msg: PerformanceQuery) -> Iterator[BaseModel]:
+    """Messages answering a query, in send order"""
+    if msg.query_type == "tax_report":
+        yield from _tax_report_chunks(msg)
+    yield _cached_report(msg)
+
+async def _local_replies(msg: PerformanceQuery) -> AsyncIterator[BaseModel]:
+    for reply in _query_replies(msg):
+        yield reply
+
+async def _shard_replies(msg: PerformanceQuery) -> AsyncIterator[BaseModel]:
+    """Replies computed by the worker that owns msg.user_id"""
+    async for reply in _router.request(msg.user_id, {"model": "PerformanceQuery", "data": msg.model_dump(mode="json")}):
+        yield SHARD_REPLY_MODELS[reply["model"]](**reply["data"])
+
+def _cached_report(msg: PerformanceQuery) -> PerformanceResponse:
+    """
+    Performance report, served from RESPONSE_CACHE while nothing of the user's changed
+
+    Entries are dropped by the user's position events and by market ticks
+    that revalue the user's positions (RESPONSE_CACHE.invalidate), not by
+    time. The key includes the day so days_held stays current. A report
+    whose user changed while it was built is not cached, and served
+    reports carry the time they were sent.
+    """
+    if msg.query_type not in CACHED_QUERY_TYPES:
+        return _generate_performance_report(msg)
+    key = (msg.query_type, stable_hash(msg.parameters or {}), int(time.time() // SECONDS_PER_DAY))
+    version = RESPONSE_CACHE.version()
+    response = RESPONSE_CACHE.get(msg.user_id, key)
+    if response is None:
+        response = _generate_performance_report(msg)
+        RESPONSE_CACHE.set(msg.user_id, key, response, version)
+    return response.model_copy(update={"request_id": msg.request_id, "timestamp": datetime.now(timezone.utc).isoformat()})
+
 def _generate_performance_report(msg: PerformanceQuery) -> PerformanceResponse:
     """
-    Generate performance report (SIMULATED)
+    Generate performance report
 
-    In production, this would:
-    - Track real on-chain positions
-    - Calculate actual P&L
-    - Monitor APY changes
-    - Generate tax reports
+    Positions are derived from the position ledger, which records every
+    confirmed transaction of the user's ExecutionResponses, and are valued
+    at the (SIMULATED) market ticks.
 
-    For demo: Returns simulated performance data
+    For demo: users with no executions get sample positions, until their
+    first ledger events replace them
     """
 
-    # Check if user has portfolio data
-    if msg.user_id not in portfolio_data:
-        # Generate sample positions for demo
-        positions = _generate_sample_positions()
-        portfolio_data[msg.user_id] = positions
-    else:
-        positions = portfolio_data[msg.user_id]
-
-    # Calculate portfolio metrics
-    total_value = sum(pos.current_value for pos in positions)
-    total_pnl = sum(pos.pnl for pos in positions)
-    total_pnl_percentage = (total_pnl / sum(pos.entry_value for pos in positions)) * 100 if positions else 0.0
-
-    # Calculate realized APY (weighted by position size)
-    if positions:
-        weighted_apy = sum(
-            pos.current_apy * (pos.current_value / total_value)
-            for pos in positions
-        )
-    else:
-        weighted_apy = 0.0
+    store = _get_store()
+    totals = store.aggregate(msg.user_id)
+    if totals is None and next(_get_ledger().events(msg.user_id), None) is None:
+        # No executions recorded: generate sample positions for demo
+        _store_positions(msg.user_id, _generate_sample_positions())
+        totals = store.aggregate(msg.user_id)
+    if totals is None:
+        # Only executions that moved no position (e.g. approvals)
+        totals = {"positions": 0, "current_value": 0.0, "pnl": 0.0, "pnl_percentage": 0.0, "apy": 0.0}
+
+    # Portfolio metrics come from running aggregates (no pass over positions);
+    # positions are only loaded when the caller wants them listed
+    total_value = totals["current_value"]
+    total_pnl = totals["pnl"]
+    total_pnl_percentage = totals["pnl_percentage"]
+    weighted_apy = totals["apy"]
+    positions = []
+    if (msg.parameters or {}).get("include_positions", True):
+        positions = [_position_detail(row) for row in store.positions(msg.user_id)]
 
     # Estimate total gas spent (simulated)
-    total_gas = len(positions) * 0.015  # ~0.015 ETH per position
+    total_gas = totals["positions"] * GAS_PER_POSITION
+
+    history, resolution = [], None
+    if msg.query_type == "performance_history":
+        history, resolution = _performance_history(msg.user_id, msg.parameters or {})
 
     return PerformanceResponse(
         request_id=msg.request_id,
@@ -156,7 +435,187 @@ def _generate_performance_report(msg: PerformanceQuery) -> PerformanceResponse:
         positions=positions,
         realized_apy=weighted_apy,
         total_gas_spent=total_gas,
-        timestamp=datetime.now(timezone.utc).isoformat()
+        timestamp=datetime.now(timezone.utc).isoformat(),
+        history=history,
+        history_resolution=resolution
+    )
+
+def _performance_history(user_id: str, parameters: Dict[str, Any]) -> tuple:
+    """
+    Portfolio (or one position's) value history
+
+    Parameters: days (default 30), max_points (default 500), and optionally
+    protocol and chain to select a single position.
+
+    Returns:
+        (HistoryPoints, resolution)
+    """
+    key = f"portfolio/{user_id}"
+    if "protocol" in parameters:
+        matches = [
+            row for row in _get_store().positions(user_id)
+            if row["protocol"] == parameters["protocol"] and row["chain"] == parameters.get("chain", row["chain"])
+        ]
+        if not matches:
+            return [], None
+        key = f"position/{matches[0]['id']}"
+
+    end = time.time()
+    days = float(parameters.get("days", HISTORY_DEFAULT_DAYS))
+    series = _get_timeseries().history(
+        key, end - days * SECONDS_PER_DAY, end, max_points=int(parameters.get("max_points", HISTORY_MAX_POINTS))
+    )
+    points = [
+        HistoryPoint(
+            timestamp=datetime.fromtimestamp(ts, timezone.utc).isoformat(),
+            value=value,
+            min_value=low,
+            max_value=high
+        )
+        for ts, value, low, high in zip(series["ts"], series["value"], series["min"], series["max"])
+    ]
+    return points, series["resolution"]
+
+def _tax_report_chunks(msg: PerformanceQuery) -> Iterator[TaxReportChunk]:
+    """
+    A tax report as a stream of TaxReportChunk messages
+
+    Acquisitions and disposals are read from the store in time order,
+    matched to lots (parameters.method: FIFO, LIFO or HIFO) and yielded
+    TAX_REPORT_CHUNK_ROWS rows at a time, so only the open lots and one
+    chunk are in memory. parameters.year limits the rows to disposals in
+    that calendar year. The last chunk is marked final and carries totals.
+    """
+    parameters = msg.parameters or {}
+    method = str(parameters.get("method", DEFAULT_METHOD)).upper()
+    start = end = None
+    if "year" in parameters:
+        year = int(parameters["year"])
+        start = datetime(year, 1, 1, tzinfo=timezone.utc).timestamp()
+        end = datetime(year + 1, 1, 1, tzinfo=timezone.utc).timestamp()
+
+    totals = TaxTotals()
+    rows = totals.track(in_period(match_lots(_get_store().iter_tax_events(msg.user_id), method), start, end))
+    chunk_size = int(parameters.get("chunk_size", TAX_REPORT_CHUNK_ROWS))
+    chunk_index = 0
+    for chunk in chunked(rows, chunk_size):
+        yield TaxReportChunk(
+            request_id=msg.request_id, user_id=msg.user_id, method=method,
+            chunk_index=chunk_index, rows=[_tax_lot_row(row) for row in chunk]
+        )
+        chunk_index += 1
+
+    yield TaxReportChunk(
+        request_id=msg.request_id, user_id=msg.user_id, method=method,
+        chunk_index=chunk_index, rows=[], final=True, totals=totals.to_dict()
+    )
+
+def _tax_lot_row(row: Dict[str, Any]) -> TaxLotRow:
+    as_iso = lambda ts: datetime.fromtimestamp(ts, timezone.utc).isoformat()
+    return TaxLotRow(
+        protocol=row["protocol"],
+        chain=row["chain"],
+        quantity=row["quantity"],
+        acquired_at=as_iso(row["acquired_at"]) if row["acquired_at"] is not None else None,
+        disposed_at=as_iso(row["disposed_at"]),
+        cost_basis=row["cost_basis"],
+        proceeds=row["proceeds"],
+        gain=row["gain"],
+        term=row["term"]
+    )
+
+_store: Optional[TrackerStore] = None
+_timeseries: Optional[TimeSeriesStore] = None
+_revaluation: Optional[RevaluationEngine] = None
+_ledger: Optional[PositionLedger] = None
+_router: Optional[ShardRouter] = None
+# Market prices / APYs the agent process broadcasts to every shard worker,
+# so all users are revalued against the same market
+_market_feed: Dict[tuple, Dict[str, float]] = {}
+
+# Reply models a shard worker may return (sent across the pipe as dicts)
+SHARD_REPLY_MODELS = {"PerformanceResponse": PerformanceResponse, "TaxReportChunk": TaxReportChunk}
+
+def _get_store() -> TrackerStore:
+    """Tracker database, opened on first use"""
+    global _store
+    if _store is None:
+        _store = TrackerStore(TRACKER_DB_PATH)
+    return _store
+
+def _get_timeseries() -> TimeSeriesStore:
+    """Value history store, opened on first use"""
+    global _timeseries
+    if _timeseries is None:
+        _timeseries = TimeSeriesStore(TIMESERIES_PATH)
+    return _timeseries
+
+def _get_ledger() -> PositionLedger:
+    """Position ledger, opened on first use"""
+    global _ledger
+    if _ledger is None:
+        _ledger = PositionLedger(LEDGER_PATH, snapshot_every=LEDGER_SNAPSHOT_EVERY)
+    return _ledger
+
+def _get_revaluation() -> RevaluationEngine:
+    """Revaluation arrays, loaded from the store's open positions on first use"""
+    global _revaluation
+    if _revaluation is None:
+        _revaluation = RevaluationEngine()
+        _revaluation.load(_get_store().iter_open_positions())
+    return _revaluation
+
+def _store_positions(user_id: str, positions: List[PositionDetail]):
+    """Persist positions with one acquisition lot each"""
+    store = _get_store()
+    now = time.time()
+    seeded = []
+    for pos in positions:
+        opened_at = now - pos.days_held * SECONDS_PER_DAY
+        position_id = store.open_position(
+            user_id, pos.protocol, pos.chain.value, pos.amount, pos.entry_value, pos.current_apy, opened_at
+        )
+        store.add_lot(user_id, position_id, pos.protocol, pos.chain.value, pos.amount, pos.entry_value, opened_at)
+        store.record_valuation(position_id, pos.current_value, pos.current_apy, now)
+        if _revaluation is not None:
+            _revaluation.add_position(
+                position_id, user_id, pos.protocol, pos.chain.value, pos.amount,
+                pos.entry_value, pos.current_value, pos.current_apy
+            )
+        seeded.append((position_id, pos, opened_at))
+    RESPONSE_CACHE.invalidate(user_id)
+    _backfill_sample_history(user_id, seeded, now)
+
+def _backfill_sample_history(user_id: str, seeded: List[tuple], now: float):
+    """Demo history: each position moves linearly from entry to current value"""
+    series = _get_timeseries()
+    start = min(opened_at for _, _, opened_at in seeded)
+    steps = int((now - start) // SAMPLE_HISTORY_STEP_SECONDS)
+    timestamps = [start + i * SAMPLE_HISTORY_STEP_SECONDS for i in range(steps + 1) if start + i * SAMPLE_HISTORY_STEP_SECONDS < now]
+    for ts in timestamps + [now]:
+        total = 0.0
+        for position_id, pos, opened_at in seeded:
+            if ts < opened_at:
+                continue
+            progress = (ts - opened_at) / (now - opened_at) if now > opened_at else 1.0
+            value = pos.entry_value + (pos.current_value - pos.entry_value) * progress
+            series.append(f"position/{position_id}", value, ts)
+            total += value
+        series.append(f"portfolio/{user_id}", total, ts)
+
+def _position_detail(row: Dict[str, Any]) -> PositionDetail:
+    """PositionDetail from a stored position row"""
+    pnl = row["current_value"] - row["entry_value"]
+    return PositionDetail(
+        protocol=row["protocol"],
+        chain=Chain(row["chain"]),
+        amount=row["amount"],
+        entry_value=row["entry_value"],
+        current_value=row["current_value"],
+        pnl=pnl,
+        pnl_percentage=(pnl / row["entry_value"]) * 100 if row["entry_value"] else 0.0,
+        current_apy=row["current_apy"],
+        days_held=int((time.time() - row["opened_at"]) / SECONDS_PER_DAY)
     )
 
 def _generate_sample_positions() -> List[PositionDetail]:
@@ -213,9 +672,213 @@ async def startup(ctx: Context):
     ctx.logger.info(f"Mailbox: Enabled ✓")
     ctx.logger.info(f"Mode: SIMULATION (Demo data)")
     ctx.logger.info(f"Capabilities: P&L Tracking, APY Monitoring, Tax Reports")
+    ctx.logger.info(f"Revaluation: every {MARKET_TICK_INTERVAL_SECONDS:.0f}s (vectorized)")
+    if not EXECUTION_ADDRESS:
+        ctx.logger.warning("⚠️  EXECUTION_ADDRESS not set: execution responses will not be recorded")
+    if TRACKER_SHARDS > 0:
+        await _start_shards(ctx)
+    if _router is None:
+        ctx.logger.info(f"Storage: {TRACKER_DB_PATH} (SQLite WAL)")
+        _get_store()
     ctx.logger.info("=" * 60)
     ctx.logger.info("✅ Ready to receive performance queries")
 
+async def _start_shards(ctx: Context):
+    """Start the shard workers (falls back to serving in-process if processes are unavailable)"""
+    global _router
+    router = ShardRouter(
+        _serve_shard,
+        TRACKER_SHARDS,
+        initializer=partial(_init_shard, shards=TRACKER_SHARDS, legacy_ledger_path=LEDGER_PATH),
+        maintenance=_shard_maintenance,
+        maintenance_interval=TRACKER_FLUSH_INTERVAL_SECONDS
+    )
+    try:
+        await router.start()
+    except (OSError, NotImplementedError, ValueError) as e:
+        ctx.logger.warning(f"⚠️  Shard workers unavailable, serving in-process: {e}")
+        return
+    _router = router
+    ctx.logger.info(f"Storage: {TRACKER_SHARDS} shard workers under {TRACKER_SHARD_PATH} (SQLite WAL)")
+
+@tracker_agent.on_event("shutdown")
+async def shutdown(ctx: Context):
+    """Stop shard workers (each flushes its stores) or flush the local stores"""
+    if _router is not None:
+        await _router.stop()
+    else:
+        _flush_stores()
+
+@tracker_agent.on_interval(period=TRACKER_FLUSH_INTERVAL_SECONDS)
+async def flush_store(ctx: Context):
+    """Write buffered position updates and value history to disk"""
+    # Shard workers flush their own stores
+    if _router is None:
+        _flush_stores()
+
+@tracker_agent.on_interval(period=MARKET_TICK_INTERVAL_SECONDS)
+async def revalue_portfolios(ctx: Context):
+    """Revalue every open position on a market tick and record what changed"""
+    if _router is not None:
+        await _broadcast_market_tick(ctx)
+        return
+    changed, dirty = _apply_market_tick()
+    if changed:
+        ctx.logger.info(
+            f"💹 Market tick: {changed} positions of {dirty} users revalued in {_revaluation.last_tick_seconds * 1000:.1f} ms"
+        )
+
+async def _broadcast_market_tick(ctx: Context):
+    """
+    Move the shared market feed one tick and apply it in every shard
+
+    Each shard replies with the markets it prices; ones the feed has not
+    seen yet (first positions in a market) join the feed for the next tick.
+    """
+    prices, apys = _simulate_market_tick(_market_feed)
+    for key in prices:
+        _market_feed[key] = {"price": prices[key], "apy": apys[key]}
+    markets = [[*key, market["price"], market["apy"]] for key, market in _market_feed.items()]
+    replies = await _router.broadcast({"model": "MarketTick", "data": {"markets": markets}})
+
+    changed = dirty = 0
+    for reply in replies:
+        if reply is None:
+            continue
+        changed += reply[0]["changed"]
+        dirty += reply[0]["dirty"]
+        for protocol, chain, price, apy in reply[0]["markets"]:
+            _market_feed.setdefault((protocol, chain), {"price": price, "apy": apy})
+    if changed:
+        ctx.logger.info(f"💹 Market tick: {changed} positions of {dirty} users revalued across {len(replies)} shards")
+
+@tracker_agent.on_interval(period=CACHE_STATS_INTERVAL_SECONDS)
+async def log_cache_stats(ctx: Context):
+    """Periodically report response cache metrics (shard workers keep their own caches)"""
+    if _router is not None:
+        return
+    stats = RESPONSE_CACHE.stats()
+    ctx.logger.info(
+        f"📊 Response cache: {stats['size']}/{stats['maxsize']} entries, "
+        f"hit rate {stats['hit_rate']:.1%} ({stats['hits']} hits / {stats['misses']} misses), "
+        f"{stats['invalidations']} invalidations, served age mean {stats['mean_served_age_seconds']:.1f}s / "
+        f"max {stats['max_served_age_seconds']:.1f}s"
+    )
+
+def _flush_stores():
+    if _store is not None:
+        _store.flush()
+    if _timeseries is not None:
+        _timeseries.flush()
+
+def _apply_market_tick(prices: Optional[Dict[tuple, float]] = None, apys: Optional[Dict[tuple, float]] = None) -> tuple:
+    """
+    Revalue every open position and write only what changed
+
+    Args:
+        prices: (protocol, chain) -> unit price (default: simulated from the current markets)
+        apys: (protocol, chain) -> APY
+
+    Returns:
+        (positions revalued, users affected)
+    """
+    engine = _get_revaluation()
+    if prices is None:
+        prices, apys = _simulate_market_tick(engine.markets())
+    if not engine.tick(prices, apys):
+        return 0, 0
+
+    now = time.time()
+    series = _get_timeseries()
+    position_ids, values, position_apys = engine.take_changes()
+    _get_store().record_valuations(position_ids, values, position_apys, now)
+    for position_id, value in zip(position_ids, values):
+        series.append(f"position/{position_id}", value, now)
+    dirty = engine.take_dirty()
+    for user_id, totals in dirty.items():
+        series.append(f"portfolio/{user_id}", totals["current_value"], now)
+        RESPONSE_CACHE.invalidate(user_id)
+    return len(position_ids), len(dirty)
+
+def _simulate_market_tick(markets: Dict[tuple, Dict[str, float]]) -> tuple:
+    """
+    Random-walk market prices and APYs (SIMULATED)
+
+    In production, prices and APYs come from price feeds and the
+    protocols' rate endpoints.
+    """
+    import random
+
+    prices = {key: market["price"] * (1 + random.gauss(0, SIMULATED_PRICE_VOLATILITY)) for key, market in markets.items()}
+    apys = {key: max(0.0, market["apy"] + random.gauss(0, SIMULATED_APY_DRIFT)) for key, market in markets.items()}
+    return prices, apys
+
+# ===== SHARD WORKERS =====
+
+def _init_shard(shard: int, shards: int, legacy_ledger_path: Optional[str] = None):
+    """
+    Point a worker process at its own store and value history
+
+    Args:
+        shard: This worker's shard
+        shards: Shard count (decides which users the shard owns)
+        legacy_ledger_path: Unsharded ledger to import this shard's users from on first start
+    """
+    global TRACKER_DB_PATH, TIMESERIES_PATH, LEDGER_PATH, _store, _timeseries, _revaluation, _ledger
+    TRACKER_DB_PATH = os.path.join(TRACKER_SHARD_PATH, str(shard), "tracker.db")
+    TIMESERIES_PATH = os.path.join(TRACKER_SHARD_PATH, str(shard), "timeseries")
+    LEDGER_PATH = os.path.join(TRACKER_SHARD_PATH, str(shard), "ledger.db")
+    _store = _timeseries = _revaluation = _ledger = None
+    if legacy_ledger_path is not None:
+        _migrate_legacy_ledger(shard, shards, legacy_ledger_path)
+
+def _migrate_legacy_ledger(shard: int, shards: int, legacy_ledger_path: str):
+    """
+    Import the events of this shard's users from the unsharded ledger and project their positions
+
+    Runs until the shard's marker file exists; an interrupted import is
+    simply repeated, since re-appended event_ids are skipped.
+    """
+    marker = os.path.join(TRACKER_SHARD_PATH, str(shard), LEDGER_MIGRATED_MARKER)
+    if os.path.exists(marker) or not os.path.exists(legacy_ledger_path):
+        return
+    legacy = PositionLedger(legacy_ledger_path)
+    migrated = 0
+    try:
+        for user_id in legacy.users():
+            if shard_for(user_id, shards) != shard:
+                continue
+            appended = _get_ledger().append(user_id, list(legacy.events(user_id)))
+            if appended:
+                _project_positions(user_id, appended)
+            migrated += len(appended)
+    finally:
+        legacy.close()
+    _flush_stores()
+    with open(marker, "w") as f:
+        f.write(f"{migrated}\n")
+
+def _serve_shard(shard: int, payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Handle one PerformanceQuery, ExecutionResponse or MarketTick in a worker (replies cross the pipe as dicts)"""
+    if payload["model"] == "ExecutionResponse":
+        yield {"recorded": _record_execution(ExecutionResponse(**payload["data"]))}
+        return
+    if payload["model"] == "MarketTick":
+        markets = payload["data"]["markets"]
+        changed, dirty = _apply_market_tick(
+            {(protocol, chain): price for protocol, chain, price, _ in markets},
+            {(protocol, chain): apy for protocol, chain, _, apy in markets}
+        )
+        priced = [[*key, market["price"], market["apy"]] for key, market in _get_revaluation().markets().items()]
+        yield {"changed": changed, "dirty": dirty, "markets": priced}
+        return
+    for reply in _query_replies(PerformanceQuery(**payload["data"])):
+        yield {"model": type(reply).__name__, "data": reply.model_dump(mode="json")}
+
+def _shard_maintenance(shard: int):
+    """Between requests in a worker: flush (market ticks arrive from the agent process)"""
+    _flush_stores()
+
 if __name__ == "__main__":
     print("\n🐝 YieldSwarm AI - Performance Tracker Agent")
     print(f"Address: {tracker_agent.address}")
@@ -87,6 +87,11 @@ class StrategyRequest(BaseModel):
     opportunities: List[Opportunity] = Field(..., description="Available opportunities from scanner")
     recommended_protocols: List[str] = Field(..., description="Recommended protocols from MeTTa")
     chains: List[Chain] = Field(..., description="Preferred blockchain networks")
+    optimizer: Optional[str] = Field(
+        default=None,
+        description="Optimizer mode: mean_variance, risk_parity, max_sharpe, gas_aware (default: fixed allocation model)"
+    )
+    simulate: bool = Field(default=False, description="Attach a Monte Carlo outcome distribution")
 
 
 class AllocationItem(BaseModel):
@@ -99,6 +104,21 @@ class AllocationItem(BaseModel):
     risk_score: float = Field(default=5.0, description="Risk score (0-10)")
 
 
+class OutcomeDistribution(BaseModel):
+    """Monte Carlo distribution of strategy outcomes (returns and losses in %)"""
+    paths: int = Field(..., description="Simulated paths")
+    horizon_days: int = Field(..., description="Simulation horizon in days")
+    mean_return: float = Field(..., description="Mean return over the horizon (%)")
+    return_percentiles: Dict[str, float] = Field(..., description="Return percentiles p5..p95 (%)")
+    var_95: float = Field(..., description="95% Value at Risk (% loss)")
+    var_99: float = Field(..., description="99% Value at Risk (% loss)")
+    cvar_95: float = Field(..., description="95% Conditional VaR / expected shortfall (% loss)")
+    max_drawdown_p50: float = Field(..., description="Median maximum drawdown (%)")
+    max_drawdown_p95: float = Field(..., description="95th percentile maximum drawdown (%)")
+    probability_of_loss: float = Field(..., description="Probability of a negative return (0-1)")
+    budget_exhausted: bool = Field(default=False, description="True if the latency budget cut the run short")
+
+
 class StrategyResponse(BaseModel):
     """Response from Strategy Engine to Portfolio Coordinator"""
     request_id: str = Field(..., description="Matches request ID")
@@ -108,6 +128,21 @@ class StrategyResponse(BaseModel):
     estimated_gas_cost: float = Field(..., description="Estimated gas cost in ETH")
     reasoning: str = Field(..., description="Strategy reasoning and justification")
     timestamp: str = Field(..., description="ISO timestamp")
+    simulation: Optional[OutcomeDistribution] = Field(default=None, description="Outcome distribution if requested")
+
+
+class StrategyBatchRequest(BaseModel):
+    """Batch of strategy requests, e.g. many users sharing one scanner snapshot"""
+    request_id: str = Field(..., description="Unique batch identifier")
+    requests: List[StrategyRequest] = Field(..., description="Individual strategy requests")
+
+
+class StrategyBatchResponse(BaseModel):
+    """Strategies for a StrategyBatchRequest, in request order"""
+    request_id: str = Field(..., description="Matches batch ID")
+    responses: List[StrategyResponse] = Field(..., description="One response per request, same order")
+    groups: int = Field(..., description="Distinct allocation plans computed for the batch")
+    timestamp: str = Field(..., description="ISO timestamp")
 
 
 # ===== PORTFOLIO COORDINATOR <-> EXECUTION AGENT =====
@@ -119,6 +154,7 @@ class ExecutionRequest(BaseModel):
     strategy: StrategyResponse = Field(..., description="Approved strategy to execute")
     user_wallet: str = Field(..., description="User wallet address")
     max_slippage: float = Field(default=0.5, description="Maximum slippage tolerance (%)")
+    source_chain: Optional[Chain] = Field(default=None, description="Chain holding the funds, bridged to the other chains; None (default) if funds are already in place")
 
 
 class TransactionDetail(BaseModel):
@@ -126,22 +162,24 @@ class TransactionDetail(BaseModel):
     tx_hash: str = Field(..., description="Transaction hash")
     chain: Chain = Field(..., description="Blockchain network")
     protocol: str = Field(..., description="Protocol name")
-    action: str = Field(..., description="Action type: deposit, swap, bridge, etc.")
+    action: str = Field(..., description="Action type: approve, bridge, swap, deposit, stake, provide_liquidity")
     amount: float = Field(..., description="Transaction amount")
-    status: str = Field(..., description="Status: pending, confirmed, failed")
+    status: str = Field(..., description="Status: pending, confirmed, reverted, failed, skipped")
     gas_used: Optional[float] = Field(None, description="Gas used (in native token)")
     timestamp: str = Field(..., description="ISO timestamp")
 
 
 class ExecutionResponse(BaseModel):
-    """Response from Execution Agent to Portfolio Coordinator"""
+    """Response from Execution Agent to Portfolio Coordinator (copied to the Performance Tracker's position ledger)"""
     request_id: str = Field(..., description="Matches request ID")
     user_id: str = Field(..., description="User identifier")
-    status: str = Field(..., description="Overall status: success, partial, failed")
+    status: str = Field(..., description="Overall status: success, partial, failed, rejected (dry run no-go)")
     transactions: List[TransactionDetail] = Field(..., description="List of executed transactions")
     total_gas_cost: float = Field(..., description="Total gas cost (USD)")
     execution_time_seconds: float = Field(..., description="Total execution time")
     errors: List[str] = Field(default_factory=list, description="List of errors if any")
+    critical_path: List[str] = Field(default_factory=list, description="Action ids on the longest dependency chain")
+    critical_path_seconds: Optional[float] = Field(None, description="Estimated mainnet duration of the critical path")
 
 
 # ===== PORTFOLIO COORDINATOR <-> PERFORMANCE TRACKER =====
@@ -151,7 +189,7 @@ class PerformanceQuery(BaseModel):
     request_id: str = Field(..., description="Unique request identifier")
     user_id: str = Field(..., description="User identifier")
     query_type: str = Field(..., description="Query type: portfolio_status, performance_history, tax_report")
-    parameters: Optional[Dict[str, Any]] = Field(default_factory=dict, description="Additional parameters")
+    parameters: Optional[Dict[str, Any]] = Field(default_factory=dict, description="Additional parameters (portfolio_status: include_positions, default true; performance_history: days, max_points, protocol, chain; tax_report: method, year, chunk_size)")
 
 
 class PositionDetail(BaseModel):
@@ -167,6 +205,14 @@ class PositionDetail(BaseModel):
     days_held: int = Field(..., description="Number of days position held")
 
 
+class HistoryPoint(BaseModel):
+    """One point of a value history"""
+    timestamp: str = Field(..., description="ISO timestamp (bucket start for rollups)")
+    value: float = Field(..., description="Value at the end of the bucket (USD)")
+    min_value: float = Field(..., description="Lowest value in the bucket (USD)")
+    max_value: float = Field(..., description="Highest value in the bucket (USD)")
+
+
 class PerformanceResponse(BaseModel):
     """Response from Performance Tracker Agent"""
     request_id: str = Field(..., description="Matches request ID")
@@ -178,6 +224,68 @@ class PerformanceResponse(BaseModel):
     realized_apy: float = Field(..., description="Realized APY (%)")
     total_gas_spent: float = Field(..., description="Total gas spent (USD)")
     timestamp: str = Field(..., description="ISO timestamp")
+    history: List[HistoryPoint] = Field(default_factory=list, description="Value history (performance_history)")
+    history_resolution: Optional[str] = Field(None, description="History resolution: raw, minute, hour or day")
+
+
+class TaxLotRow(BaseModel):
+    """One disposal matched against one acquisition lot"""
+    protocol: str = Field(..., description="Protocol name")
+    chain: str = Field(..., description="Blockchain network")
+    quantity: float = Field(..., description="Quantity disposed from the lot")
+    acquired_at: Optional[str] = Field(None, description="ISO acquisition time (None if no lot covered the disposal)")
+    disposed_at: str = Field(..., description="ISO disposal time")
+    cost_basis: float = Field(..., description="Cost basis of the quantity (USD)")
+    proceeds: float = Field(..., description="Proceeds of the quantity (USD)")
+    gain: float = Field(..., description="Proceeds minus cost basis (USD)")
+    term: str = Field(..., description="Holding period: short or long (one year or more)")
+
+
+class TaxReportChunk(BaseModel):
+    """Part of a streamed tax report, sent before the PerformanceResponse for a tax_report query"""
+    request_id: str = Field(..., description="Matches request ID")
+    user_id: str = Field(..., description="User identifier")
+    method: str = Field(..., description="Lot matching method: FIFO, LIFO or HIFO")
+    chunk_index: int = Field(..., description="Position of this chunk in the report (from 0)")
+    rows: List[TaxLotRow] = Field(..., description="Report rows in disposal order")
+    final: bool = Field(default=False, description="Last chunk of the report")
+    totals: Optional[Dict[str, float]] = Field(None, description="Report totals (final chunk only)")
+
+
+# ===== PORTFOLIO COORDINATOR <-> STRATEGY ENGINE (REBALANCING) =====
+
+class RebalanceRequest(BaseModel):
+    """Request to move existing holdings towards a target allocation"""
+    request_id: str = Field(..., description="Unique request identifier")
+    user_id: str = Field(..., description="User identifier (rebalance plans are cached per user)")
+    holdings: List[PositionDetail] = Field(..., description="Current positions (current_value is used as the holding value)")
+    target: List[AllocationItem] = Field(..., description="Target allocation (percentages are used)")
+    cash: float = Field(default=0.0, description="Uninvested funds available for deposits (same unit as current_value)")
+    currency: str = Field(default="ETH", description="Currency of amounts")
+
+
+class RebalanceMoveItem(BaseModel):
+    """Single rebalancing leg"""
+    action: str = Field(..., description="withdraw or deposit")
+    protocol: str = Field(..., description="Protocol name")
+    chain: str = Field(..., description="Blockchain network")
+    amount: float = Field(..., description="Amount to move")
+    gas_cost: float = Field(..., description="Estimated gas cost in ETH")
+
+
+class RebalanceResponse(BaseModel):
+    """Minimal set of moves from holdings to target"""
+    request_id: str = Field(..., description="Matches request ID")
+    user_id: str = Field(..., description="User identifier")
+    moves: List[RebalanceMoveItem] = Field(..., description="Withdrawals first, then deposits")
+    drift_before: float = Field(..., description="Drift from target before moves (0-1)")
+    drift_after: float = Field(..., description="Drift from target after moves (0-1)")
+    turnover: float = Field(..., description="Amount deposited as a fraction of portfolio value")
+    estimated_gas_cost: float = Field(..., description="Estimated gas cost in ETH")
+    skipped: int = Field(..., description="Moves skipped as too small or not worth their gas")
+    cached: bool = Field(..., description="True if the plan was reused because inputs did not change")
+    reasoning: str = Field(..., description="Rebalance explanation")
+    timestamp: str = Field(..., description="ISO timestamp")
 
 
 # ===== ERROR HANDLING =====
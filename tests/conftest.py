@@ -0,0 +1,9 @@
+"""
+YieldSwarm AI - Test configuration
+Makes utils/ and protocols/ importable and loads agent scripts in isolation
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
@@ -0,0 +1,105 @@
+"""Failure-mode tests for utils/chain_executor.py on simulated chains"""
+import asyncio
+
+from utils.chain_executor import GAP_FILL_ACTION, ChainExecutor, NonceManager, TxAction
+from utils.chain_simulator import LocalChain, RpcError
+
+WALLET = "0xwallet"
+
+
+class _FlakyChain(LocalChain):
+    """LocalChain whose next `failures` send_transaction calls raise RpcError"""
+
+    def __init__(self, *args, failures=0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failures = failures
+
+    async def send_transaction(self, tx):
+        if self.failures:
+            self.failures -= 1
+            raise RpcError("upstream node unavailable")
+        return await super().send_transaction(tx)
+
+
+def _chain(**kwargs):
+    return LocalChain("polygon", block_time=0.01, gas_cost=0.0001, rpc_latency=0.001, seed=1, **kwargs)
+
+
+def test_rpc_errors_retry_with_the_same_nonce():
+    chain = _FlakyChain("polygon", block_time=0.01, gas_cost=0.0001, rpc_latency=0.001, seed=1, failures=2)
+    executor = ChainExecutor({"polygon": chain}, confirmation_timeout=5.0)
+
+    results = asyncio.run(executor.execute(WALLET, [
+        TxAction("polygon", "Aave-V3", "deposit", 1.0),
+        TxAction("polygon", "Curve", "deposit", 1.0)
+    ]))
+    assert [r.status for r in results] == ["confirmed", "confirmed"]
+    assert [r.nonce for r in results] == [0, 1]
+
+
+def test_failed_last_nonce_is_rewound():
+    chain = _chain(accounts={WALLET: 10.0})
+    executor = ChainExecutor({"polygon": chain}, confirmation_timeout=5.0)
+
+    async def run():
+        failed = await executor.execute(WALLET, [TxAction("polygon", "Aave-V3", "deposit", 1000.0)])
+        ok = await executor.execute(WALLET, [TxAction("polygon", "Aave-V3", "deposit", 1.0)])
+        return failed + ok
+
+    failed, ok = asyncio.run(run())
+    assert failed.status == "failed" and "insufficient funds" in failed.error
+    assert ok.status == "confirmed" and ok.nonce == 0
+    assert chain.pending_count() == 0
+
+
+def test_gap_behind_in_flight_nonce_is_filled():
+    # Two requests share the wallet: the first reserves nonce 0 and fails
+    # permanently after the second already submitted nonce 1
+    chain = _chain(accounts={WALLET: 10.0})
+    executor = ChainExecutor({"polygon": chain}, confirmation_timeout=5.0)
+
+    async def run():
+        return await asyncio.gather(
+            executor.execute(WALLET, [TxAction("polygon", "Aave-V3", "deposit", 1000.0)]),
+            executor.execute(WALLET, [TxAction("polygon", "Curve", "deposit", 1.0)])
+        )
+
+    (failed,), (ok,) = asyncio.run(run())
+    assert failed.status == "failed"
+    assert ok.status == "confirmed" and ok.nonce == 1
+
+    fills = [
+        tx for block in chain._blocks.values() for tx in block["txs"]
+        if tx["data"].get("action") == GAP_FILL_ACTION
+    ]
+    assert [(tx["nonce"], tx["to"], tx["value"]) for tx in fills] == [(0, WALLET, 0.0)]
+
+
+def test_callback_error_does_not_fail_an_accepted_transaction():
+    chain = _chain()
+
+    def broken_journal(result):
+        raise OSError("disk full")
+
+    executor = ChainExecutor({"polygon": chain}, confirmation_timeout=5.0, on_submitted=broken_journal)
+    results = asyncio.run(executor.execute(WALLET, [
+        TxAction("polygon", "Aave-V3", "deposit", 1.0),
+        TxAction("polygon", "Curve", "deposit", 1.0)
+    ]))
+    assert [r.status for r in results] == ["confirmed", "confirmed"]
+    assert [r.nonce for r in results] == [0, 1]
+
+
+def test_abandon_rewinds_only_the_tail():
+    class Client:
+        async def get_transaction_count(self, address, block):
+            return 5
+
+    async def run():
+        nonces = NonceManager(Client(), WALLET)
+        first, second = await nonces.reserve(), await nonces.reserve()
+        gap = await nonces.abandon(first)
+        tail = await nonces.abandon(second)
+        return first, second, gap, tail, await nonces.reserve()
+
+    assert asyncio.run(run()) == (5, 6, True, False, 6)
@@ -0,0 +1,86 @@
+"""Duplicate-delivery tests for agents_agentverse/4_execution_agent.py"""
+import asyncio
+import builtins
+import importlib.util
+import logging
+import os
+import types
+
+import pytest
+
+pytest.importorskip("uagents")
+
+from conftest import ROOT
+
+AGENT_PATH = os.path.join(ROOT, "agents_agentverse", "4_execution_agent.py")
+
+
+class _Context:
+    """Minimal stand-in for the uAgents Context passed to handlers"""
+
+    def __init__(self):
+        self.logger = logging.getLogger("execution-agent-test")
+        self.sent = []
+
+    async def send(self, destination, message):
+        self.sent.append((destination, message))
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    # Agentverse injects `process.env`; supply it the same way
+    monkeypatch.setattr(builtins, "process", types.SimpleNamespace(env=types.SimpleNamespace(
+        EXECUTION_SEED="execution-agent-test-seed", ASI_ONE_API_KEY=""
+    )), raising=False)
+    spec = importlib.util.spec_from_file_location("execution_agent_under_test", AGENT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.EXECUTION_JOURNAL_PATH = str(tmp_path / "execution_journal.jsonl")
+    return module
+
+
+def _request(module, request_id):
+    allocations = [
+        module.AllocationItem(protocol="Aave-V3", chain="polygon", amount=1.0, percentage=50, expected_apy=5.0),
+        module.AllocationItem(protocol="Curve", chain="polygon", amount=1.0, percentage=50, expected_apy=4.0)
+    ]
+    strategy = module.StrategyResponse(
+        request_id=request_id, allocations=allocations, expected_apy=4.5, risk_score=3.0,
+        estimated_gas_cost=0.001, reasoning="", timestamp="2026-01-01T00:00:00+00:00"
+    )
+    return module.ExecutionRequest(
+        request_id=request_id, user_id="user-1", strategy=strategy, user_wallet="0xwallet", source_chain="polygon"
+    )
+
+
+def test_concurrent_duplicates_execute_once(agent):
+    ctx = _Context()
+
+    async def run():
+        request = _request(agent, "req-1")
+        await asyncio.gather(
+            agent.handle_execution_request(ctx, "coordinator", request),
+            agent.handle_execution_request(ctx, "coordinator", request)
+        )
+
+    asyncio.run(run())
+    responses = [message for _, message in ctx.sent]
+    assert [r.request_id for r in responses] == ["req-1"]
+    assert responses[0].status == "success"
+
+
+def test_redelivery_after_finish_resends_recorded_response(agent):
+    ctx = _Context()
+
+    async def run():
+        request = _request(agent, "req-2")
+        await agent.handle_execution_request(ctx, "coordinator", request)
+        calls = agent._get_executor().clients["polygon"].rpc_calls
+        await agent._get_journal().compact(force=True)
+        await agent.handle_execution_request(ctx, "coordinator", request)
+        return calls, agent._get_executor().clients["polygon"].rpc_calls
+
+    calls_before, calls_after = asyncio.run(run())
+    first, second = (message for _, message in ctx.sent)
+    assert second == first
+    assert calls_after == calls_before, "A finished request must not touch the chain again"
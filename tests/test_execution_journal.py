@@ -0,0 +1,106 @@
+"""Crash-recovery and redelivery tests for utils/execution_journal.py"""
+import asyncio
+import os
+
+from utils.execution_journal import ExecutionJournal
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_resume_after_torn_write(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+
+    async def write():
+        journal = ExecutionJournal(path)
+        journal.open()
+        await journal.log("req-1", "planned", request={"amount": 1}, sender="coordinator", actions=["a", "b"])
+        journal.append("req-1", "submitted", action_id="a", tx_hash="0xa", nonce=7)
+        journal.append("req-1", "confirmed", action_id="a", tx_hash="0xa")
+        journal.append("req-1", "submitted", action_id="b", tx_hash="0xb", nonce=8)
+        await journal.sync()
+        journal._file.write('{"seq": 99, "request_id": "req-1", "ev')  # crash mid-record
+        journal._file.flush()
+
+    _run(write())
+    pending = ExecutionJournal(path).open()
+    assert [state.request_id for state in pending] == ["req-1"]
+    state = pending[0]
+    assert state.sender == "coordinator"
+    assert state.done("a") and not state.done("b")
+    assert state.actions["b"]["tx_hash"] == "0xb"  # awaited on resume, never resubmitted
+
+
+def test_finished_request_survives_compaction_and_restart(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    response = {"request_id": "req-1", "status": "success", "transactions": []}
+
+    async def write():
+        journal = ExecutionJournal(path)
+        journal.open()
+        await journal.log("req-1", "planned", request={}, sender="coordinator", actions=["a"])
+        journal.append("req-1", "confirmed", action_id="a", tx_hash="0xa")
+        journal.append("req-1", "finished", status="success", response=response)
+        dropped = await journal.compact(force=True)
+        await journal.close()
+        return dropped
+
+    assert _run(write()) == 2
+    reopened = ExecutionJournal(path)
+    assert reopened.open() == []
+    assert reopened.state("req-1") is None
+    finished = reopened.finished("req-1")
+    assert finished["status"] == "success" and finished["response"] == response
+
+
+def test_tombstones_expire_at_compaction(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+
+    async def write():
+        journal = ExecutionJournal(path, tombstone_ttl=0.0)
+        journal.open()
+        journal.append("req-1", "planned", request={}, actions=[])
+        journal.append("req-1", "finished", status="success")
+        await journal.compact(force=True)
+        await journal.close()
+        return journal
+
+    journal = _run(write())
+    assert journal.finished("req-1") is None
+    assert os.path.getsize(path) == 0
+
+
+def test_tombstones_are_capped_oldest_first(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+
+    async def write():
+        journal = ExecutionJournal(path, max_tombstones=2)
+        journal.open()
+        for i in range(3):
+            journal.append(f"req-{i}", "planned", request={}, actions=[])
+            journal.append(f"req-{i}", "finished", status="success")
+        assert journal.stats()["tombstones"] == 2
+        assert journal.finished("req-0") is None
+        assert await journal.compact(force=True) == 4  # three "planned" records and req-0's tombstone
+        await journal.close()
+
+    _run(write())
+    reopened = ExecutionJournal(path, max_tombstones=2)
+    reopened.open()
+    assert reopened.finished("req-0") is None
+    assert reopened.finished("req-1") is not None and reopened.finished("req-2") is not None
+
+
+def test_expired_tombstones_leave_memory_before_compaction(tmp_path):
+    journal = ExecutionJournal(str(tmp_path / "journal.jsonl"), tombstone_ttl=60.0)
+    journal.open()
+    journal.append("req-old", "planned", request={}, actions=[])
+    journal.append("req-old", "finished", status="success")
+    journal._tombstones["req-old"][0]["ts"] -= 120.0  # finished two minutes ago
+
+    journal.append("req-new", "planned", request={}, actions=[])
+    journal.append("req-new", "finished", status="success")
+    assert journal.finished("req-old") is None
+    assert journal.finished("req-new") is not None
+    _run(journal.close())
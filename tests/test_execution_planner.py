@@ -0,0 +1,21 @@
+"""Bridging tests for utils/execution_planner.py"""
+from types import SimpleNamespace
+
+from utils.execution_planner import plan_strategy
+
+ALLOCATIONS = [
+    SimpleNamespace(protocol="Aave-V3", chain="ethereum", amount=1.0),
+    SimpleNamespace(protocol="Aave-V3", chain="polygon", amount=1.0),
+]
+
+
+def _bridges(plan):
+    return [action_id for action_id in plan.actions if action_id.startswith("bridge:")]
+
+
+def test_funds_are_assumed_in_place_by_default():
+    assert _bridges(plan_strategy(ALLOCATIONS)) == []
+
+
+def test_source_chain_opts_in_to_bridging():
+    assert _bridges(plan_strategy(ALLOCATIONS, source_chain="ethereum")) == ["bridge:ethereum->polygon"]
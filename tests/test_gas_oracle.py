@@ -0,0 +1,22 @@
+"""Fee source construction tests for utils/gas_oracle.py"""
+import asyncio
+
+from utils.gas_oracle import GasOracle, JsonRpcFeeSource, SolanaFeeSource, create_rpc_sources
+
+
+def test_rpc_sources_match_chain_type():
+    sources = create_rpc_sources({
+        "ethereum": "https://eth.example", "solana": "https://sol.example", "polygon": "https://polygon.example"
+    }, timeout=2.0)
+    assert isinstance(sources["ethereum"], JsonRpcFeeSource)
+    assert isinstance(sources["polygon"], JsonRpcFeeSource)
+    assert isinstance(sources["solana"], SolanaFeeSource)
+    assert sources["solana"].url == "https://sol.example" and sources["solana"].timeout == 2.0
+
+
+def test_chains_without_endpoint_are_skipped_and_use_fallback():
+    sources = create_rpc_sources({"ethereum": "", "bsc": "https://bsc.example"})
+    assert list(sources) == ["bsc"]
+
+    oracle = GasOracle(sources, fallback_costs={"ethereum": 0.015})
+    assert oracle.gas_cost("ethereum") == 0.015
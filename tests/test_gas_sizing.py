@@ -0,0 +1,23 @@
+"""Constraint tests for utils/gas_sizing.py"""
+import numpy as np
+
+from utils.gas_sizing import GasSizingSolver
+from utils.portfolio_optimizer import RISK_LEVEL_CONSTRAINTS
+
+
+def test_protocol_cap_spans_chains():
+    # One protocol dominates APY on every chain; without the protocol cap it
+    # would take most of the allocation
+    chain_idx = np.array([0, 1, 2, 3, 0, 1, 2, 3])
+    protocols = ["Aave-V3"] * 4 + ["Curve", "Lido", "Compound", "Raydium"]
+    apy = np.array([20.0, 19.0, 18.0, 17.0, 5.0, 4.5, 4.0, 3.5])
+    risk = np.full(8, 2.0)
+    gas = np.full(8, 1e-6)
+
+    result = GasSizingSolver(max_positions=6).solve(
+        apy, risk, chain_idx, gas, amount=100.0, risk_level="moderate", protocols=protocols
+    )
+    held = [protocols[i] for i in result.indices]
+    aave = sum(w for p, w in zip(held, result.weights) if p == "Aave-V3")
+    assert aave <= RISK_LEVEL_CONSTRAINTS["moderate"]["max_protocol_weight"] + 1e-9
+    assert result.weights.sum() <= 1.0 + 1e-9
@@ -0,0 +1,32 @@
+"""Latency-budget tests for utils/monte_carlo.py"""
+import numpy as np
+
+import utils.monte_carlo as monte_carlo
+from utils.monte_carlo import simulate_strategy
+
+ALLOCATION = dict(
+    apy=[4.5, 6.2, 12.0, 25.0],
+    risk=[2.0, 2.5, 5.0, 7.5],
+    weights=[0.35, 0.30, 0.20, 0.15],
+    chain_idx=[0, 0, 3, 1],
+    protocols=["Aave-V3", "Lido", "Uniswap-V3", "Raydium"]
+)
+
+
+def test_results_do_not_depend_on_batch_size(monkeypatch):
+    small = simulate_strategy(**ALLOCATION, n_paths=5000, seed=3, max_workers=1, latency_budget=100)
+    # A pessimistic cost estimate shrinks batches to single blocks
+    monkeypatch.setattr(monte_carlo, "_SECONDS_PER_UNIT", 1.0)
+    large = simulate_strategy(**ALLOCATION, n_paths=5000, seed=3, max_workers=1, latency_budget=100)
+    assert small.paths == large.paths == 5000
+    assert np.isclose(small.var_95, large.var_95)
+    assert np.isclose(small.return_percentiles["p50"], large.return_percentiles["p50"])
+
+
+def test_inline_run_stays_inside_budget():
+    simulate_strategy(**ALLOCATION, n_paths=5000, seed=1, max_workers=1)  # calibrate the cost estimate
+    budget = 0.1
+    result = simulate_strategy(**ALLOCATION, n_paths=500000, seed=1, max_workers=1, latency_budget=budget)
+    assert result.budget_exhausted
+    assert 0 < result.paths < 500000
+    assert result.elapsed < budget * (1 + monte_carlo.BATCH_BUDGET_FRACTION) + 0.05
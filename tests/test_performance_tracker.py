@@ -0,0 +1,91 @@
+"""Ledger intake tests for agents_agentverse/5_performance_tracker.py"""
+import asyncio
+import builtins
+import importlib.util
+import logging
+import os
+import types
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip("uagents")
+
+from conftest import ROOT
+
+AGENT_PATH = os.path.join(ROOT, "agents_agentverse", "5_performance_tracker.py")
+EXECUTION = "agent1-execution-under-test"
+
+
+class _Context:
+    """Minimal stand-in for the uAgents Context passed to handlers"""
+
+    def __init__(self):
+        self.logger = logging.getLogger("performance-tracker-test")
+        self.sent = []
+
+    async def send(self, destination, message):
+        self.sent.append((destination, message))
+
+
+@pytest.fixture
+def tracker(tmp_path, monkeypatch):
+    # Agentverse injects `process.env`; supply it the same way
+    monkeypatch.setattr(builtins, "process", types.SimpleNamespace(env=types.SimpleNamespace(
+        TRACKER_SEED="performance-tracker-test-seed", ASI_ONE_API_KEY=""
+    )), raising=False)
+    spec = importlib.util.spec_from_file_location("performance_tracker_under_test", AGENT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.TRACKER_DB_PATH = str(tmp_path / "tracker.db")
+    module.TIMESERIES_PATH = str(tmp_path / "timeseries")
+    module.LEDGER_PATH = str(tmp_path / "ledger.db")
+    module.EXECUTION_ADDRESS = EXECUTION
+    return module
+
+
+def _response(module, request_id, user_id, action="deposit"):
+    now = datetime.now(timezone.utc).isoformat()
+    return module.ExecutionResponse(
+        request_id=request_id, user_id=user_id, status="success", total_gas_cost=0.0, execution_time_seconds=1.0,
+        transactions=[module.TransactionDetail(
+            tx_hash="0x1", chain="ethereum", protocol="Curve", action=action, amount=2.0,
+            status="confirmed", timestamp=now
+        )]
+    )
+
+
+def _report(module, user_id):
+    return module._cached_report(module.PerformanceQuery(request_id="q", user_id=user_id, query_type="portfolio_status"))
+
+
+def test_execution_response_from_other_sender_is_ignored(tracker):
+    asyncio.run(tracker.handle_execution_response(_Context(), "agent1-someone-else", _response(tracker, "r1", "alice")))
+    assert tracker._get_ledger().state("alice")["seq"] == 0
+
+    asyncio.run(tracker.handle_execution_response(_Context(), EXECUTION, _response(tracker, "r1", "alice")))
+    assert tracker._get_ledger().state("alice")["seq"] == 1
+
+
+def test_first_ledger_events_replace_sample_positions(tracker):
+    assert len(_report(tracker, "alice").positions) > 1  # demo samples
+
+    asyncio.run(tracker.handle_execution_response(_Context(), EXECUTION, _response(tracker, "r1", "alice")))
+    report = _report(tracker, "alice")
+    assert [position.protocol for position in report.positions] == ["Curve"]
+    assert report.positions[0].current_apy > 0  # registry APY until the market is priced
+    assert len(tracker._get_store().lots("alice")) == 1
+
+
+def test_users_with_ledger_events_get_no_samples(tracker):
+    asyncio.run(tracker.handle_execution_response(_Context(), EXECUTION, _response(tracker, "r1", "bob", "approve")))
+    report = _report(tracker, "bob")
+    assert report.positions == [] and report.total_portfolio_value == 0.0
+
+
+def test_cached_report_is_restamped(tracker):
+    _report(tracker, "alice")  # seeds the samples, which invalidates the report being built
+    first = _report(tracker, "alice")
+    second = _report(tracker, "alice")
+    assert tracker.RESPONSE_CACHE.stats()["hits"] == 1
+    assert second.timestamp > first.timestamp
@@ -0,0 +1,52 @@
+"""Constraint tests for utils/portfolio_optimizer.py"""
+import numpy as np
+import pytest
+
+from utils.portfolio_optimizer import OPTIMIZER_MODES, RISK_LEVEL_CONSTRAINTS, optimize_portfolio
+
+
+def _check_caps(result, chain_idx, protocols, risk_level):
+    caps = RISK_LEVEL_CONSTRAINTS[risk_level]
+    _, protocol_ids = np.unique(protocols, return_inverse=True)
+    w = result.weights
+    assert w.sum() == pytest.approx(1.0)
+    assert w.max() <= caps["max_weight"] + 1e-6
+    assert np.bincount(protocol_ids, weights=w).max() <= caps["max_protocol_weight"] + 1e-6
+    assert np.bincount(chain_idx, weights=w).max() <= caps["max_chain_weight"] + 1e-6
+    assert result.risk_score <= caps["max_risk"] + 1e-6
+
+
+@pytest.mark.parametrize("mode", OPTIMIZER_MODES)
+@pytest.mark.parametrize("risk_level", sorted(RISK_LEVEL_CONSTRAINTS))
+def test_caps_hold_after_pruning(mode, risk_level):
+    # Small support on a skewed universe: the best-ratio positions sit on one
+    # chain, so pruning to max_positions must still leave a cap-feasible set
+    rng = np.random.default_rng(3)
+    n = 300
+    risk = rng.uniform(1.5, 9.0, n)
+    apy = risk * rng.uniform(1.0, 3.0, n)
+    chain_idx = rng.integers(0, 5, n)
+    apy[chain_idx == 0] *= 1.5
+    protocols = np.array([f"P{i % 50}" for i in range(n)])
+
+    result = optimize_portfolio(
+        apy, risk, chain_idx, protocols,
+        mode=mode, risk_level=risk_level, min_weight=0.05, max_positions=8
+    )
+    _check_caps(result, chain_idx, protocols, risk_level)
+
+
+@pytest.mark.parametrize("seed", [3, 33])
+def test_risk_parity_chain_cap(seed):
+    rng = np.random.default_rng(seed)
+    n = 300
+    risk = rng.uniform(1.5, 9.0, n)
+    apy = risk * rng.uniform(1.0, 3.0, n)
+    chain_idx = rng.integers(0, 2, n)
+    protocols = np.array([f"P{i % 3}" for i in range(n)])
+
+    result = optimize_portfolio(
+        apy, risk, chain_idx, protocols,
+        mode="risk_parity", risk_level="aggressive", min_weight=0.05, max_positions=8
+    )
+    _check_caps(result, chain_idx, protocols, "aggressive")
@@ -0,0 +1,117 @@
+"""Expiry, eviction and invalidation tests for utils/result_cache.py"""
+from utils.result_cache import TTLCache, VersionedCache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = _Clock()
+    cache = TTLCache(maxsize=4, ttl_seconds=10.0, clock=clock)
+    cache.set("a", 1)
+    clock.now = 9.9
+    assert cache.get("a") == 1
+    clock.now = 10.0
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1 and len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl_seconds=None)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # "b" is now the least recently used
+    cache.set("c", 3)
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert cache.stats()["evictions"] == 1
+
+
+def test_hit_rate_counts_hits_and_misses():
+    cache = TTLCache(maxsize=4)
+    assert cache.hit_rate == 0.0
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("a")
+    cache.get("missing")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+    assert stats["hit_rate"] == 2 / 3
+
+
+def test_membership_does_not_touch_order_or_metrics():
+    clock = _Clock()
+    cache = TTLCache(maxsize=2, ttl_seconds=10.0, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert "a" in cache  # must not make "a" most recently used
+    cache.set("c", 3)
+    assert "a" not in cache and "b" in cache
+
+    clock.now = 20.0
+    assert "b" not in cache
+    assert len(cache) == 2  # expired entries are left for get() to reclaim
+    assert cache.stats()["hits"] == cache.stats()["misses"] == cache.stats()["expirations"] == 0
+
+
+def test_get_or_compute_caches_none():
+    cache = TTLCache(maxsize=4)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return None
+
+    assert cache.get_or_compute("a", compute) is None
+    assert cache.get_or_compute("a", compute) is None
+    assert len(calls) == 1
+
+
+def test_value_computed_across_an_invalidation_is_not_stored():
+    cache = VersionedCache(maxsize=8)
+    version = cache.version()
+    assert cache.get("alice", "summary") is None
+    cache.invalidate("alice")  # alice's data changes while the report is built
+    assert not cache.set("alice", "summary", "stale report", version)
+    assert cache.get("alice", "summary") is None
+
+    # Other scopes are unaffected
+    assert cache.set("bob", "summary", "bob report", version)
+    assert cache.get("bob", "summary") == "bob report"
+
+
+def test_invalidate_drops_entries_and_scope_bookkeeping():
+    cache = VersionedCache(maxsize=8)
+    cache.set("alice", "summary", 1, cache.version())
+    cache.set("alice", "history", 2, cache.version())
+    cache.invalidate("alice")
+    assert cache.get("alice", "summary") is None and cache.get("alice", "history") is None
+    assert len(cache._cache) == 0 and "alice" not in cache._keys
+
+
+def test_bookkeeping_stays_bounded_with_many_scopes():
+    cache = VersionedCache(maxsize=16, max_invalidations=32)
+    for i in range(10_000):
+        user = f"user-{i}"
+        cache.set(user, "summary", i, cache.version())
+        cache.invalidate(user)
+        cache.set(user, "summary", i, cache.version())
+    assert len(cache._cache) == 16
+    assert len(cache._keys) == 16  # LRU evictions drop their scopes
+    assert len(cache._invalidated) == 32
+    assert cache.get("user-9999", "summary") == 9999
+
+
+def test_version_older_than_remembered_invalidations_is_refused():
+    cache = VersionedCache(maxsize=8, max_invalidations=2)
+    version = cache.version()
+    for user in ("a", "b", "c"):
+        cache.invalidate(user)
+    # "a" is forgotten, so whether it changed after version is unknown
+    assert not cache.set("a", "summary", "report", version)
+    assert cache.set("a", "summary", "report", cache.version())
+    assert cache.stats()["refused_sets"] == 1
@@ -0,0 +1,71 @@
+"""Top-K selection tests for utils/scoring.py"""
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from utils.scoring import OpportunityArrays, ScoringEngine
+
+# ethereum, solana, bsc, polygon, arbitrum
+CHAIN_RISK = [1.0, 1.2, 1.5, 1.1, 1.0]
+POLICIES = {
+    "yield": {"max_risk": 5.0, "use_chain_risk": False, "weights": {"apy": 1.0}},
+    "chain_aware": {"max_risk": 5.0, "use_chain_risk": True, "weights": {"apy": 1.0}},
+}
+
+
+def _arrays(rows):
+    return OpportunityArrays.from_opportunities([
+        SimpleNamespace(protocol=protocol, chain=chain, apy=apy, risk_score=risk, tvl=1e9)
+        for protocol, chain, apy, risk in rows
+    ])
+
+
+def _engine():
+    return ScoringEngine(policies=POLICIES, chain_risk=CHAIN_RISK, default_policy="yield")
+
+
+def test_select_returns_top_k_best_first():
+    arrays = _arrays([
+        ("a", "ethereum", 3.0, 1.0),
+        ("b", "ethereum", 9.0, 1.0),
+        ("c", "ethereum", 6.0, 1.0),
+        ("d", "ethereum", 1.0, 1.0),
+        ("e", "ethereum", 7.0, 1.0),
+    ])
+    assert _engine().select(arrays, "yield", k=3).tolist() == [1, 4, 2]
+
+
+def test_ties_go_to_lower_risk():
+    arrays = _arrays([
+        ("a", "ethereum", 5.0, 4.0),
+        ("b", "ethereum", 5.0, 2.0),
+        ("c", "ethereum", 5.0, 3.0),
+    ])
+    assert _engine().select(arrays, "yield", k=3).tolist() == [1, 2, 0]
+
+
+def test_cap_filters_on_chain_adjusted_risk():
+    # Raw risk 4.0 passes a 5.0 cap, but 4.0 * 1.5 (bsc) does not
+    arrays = _arrays([
+        ("a", "bsc", 20.0, 4.0),
+        ("b", "ethereum", 8.0, 4.0),
+        ("c", "arbitrum", 6.0, 4.0),
+    ])
+    engine = _engine()
+    assert engine.select(arrays, "chain_aware", k=3).tolist() == [1, 2]
+    assert engine.select(arrays, "yield", k=3).tolist() == [0, 1, 2]
+    np.testing.assert_allclose(engine.adjusted_risk(arrays, "chain_aware"), [6.0, 4.0, 4.0])
+
+
+def test_cap_is_relaxed_below_min_candidates():
+    arrays = _arrays([
+        ("a", "ethereum", 9.0, 7.0),
+        ("b", "ethereum", 4.0, 2.0),
+    ])
+    assert _engine().select(arrays, "yield", k=2, min_candidates=2).tolist() == [0, 1]
+
+
+def test_unknown_chain_is_rejected():
+    with pytest.raises(ValueError, match="fantom"):
+        _arrays([("a", "fantom", 5.0, 1.0)])
@@ -0,0 +1,58 @@
+"""Start method and broadcast tests for utils/tracker_shards.py"""
+import asyncio
+import multiprocessing
+
+import pytest
+
+from utils.position_ledger import PositionLedger
+from utils.tracker_shards import ShardRouter, _test_handler
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_importable_handler_spawns_and_broadcast_reaches_every_shard():
+    async def go():
+        router = ShardRouter(_test_handler, 3)
+        await router.start()
+        try:
+            replies = await router.broadcast({"user_id": "*", "work": 10})
+            return router.start_method, replies
+        finally:
+            await router.stop()
+
+    start_method, replies = _run(go())
+    assert start_method == "spawn"
+    assert sorted(reply[0]["shard"] for reply in replies) == [0, 1, 2]
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="fork unavailable")
+def test_unpicklable_handler_falls_back_to_fork():
+    def handler(shard, payload):
+        yield {"shard": shard}
+
+    router = ShardRouter(handler, 1)
+    assert router.start_method == "fork"
+
+
+def test_broadcast_reports_failed_shard_as_none():
+    async def go():
+        router = ShardRouter(_test_handler, 2)
+        await router.start()
+        try:
+            return await router.broadcast({"user_id": "*", "work": 1, "fail": True})
+        finally:
+            await router.stop()
+
+    assert _run(go()) == [None, None]
+
+
+def test_ledger_lists_users_for_migration(tmp_path):
+    ledger = PositionLedger(str(tmp_path / "ledger.db"))
+    for i, user_id in enumerate(("b", "a", "b")):
+        ledger.append(user_id, [{
+            "event_id": f"req-{i}/0", "ts": 1.0, "action": "deposit", "protocol": "Aave-V3",
+            "chain": "ethereum", "amount": 1.0, "value": 2000.0
+        }])
+    assert ledger.users() == ["a", "b"]
@@ -0,0 +1,380 @@
+"""
+YieldSwarm AI - Multi-Chain Executor
+Concurrent per-chain submission with pipelined nonce management
+"""
+import asyncio
+import heapq
+import time
+from typing import List, Dict, Any, Callable, Optional, Tuple
+import logging
+
+from utils.chain_simulator import NonceTooLowError, RpcError
+from utils.confirmation_tracker import ConfirmationTracker
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_MAX_IN_FLIGHT = 8
+DEFAULT_CONFIRMATION_TIMEOUT = 30.0
+DEFAULT_CONFIRMATIONS = 1
+SUBMIT_ATTEMPTS = 3
+
+# data.action of the zero-value self-transfer that fills an abandoned nonce
+GAP_FILL_ACTION = "nonce_gap_fill"
+
+
+class NonceManager:
+    """
+    Hands out nonces for one (chain, wallet) without waiting for receipts
+
+    The first reservation syncs from the node's pending nonce; later ones
+    increment locally so several transactions can be in flight at once.
+    A nonce whose transaction is never accepted is abandoned: if nothing
+    was reserved after it the counter is rewound, otherwise the caller must
+    fill the gap (see ChainExecutor) or release it for reuse.
+    """
+
+    def __init__(self, client: Any, address: str):
+        """
+        Args:
+            client: Chain client with get_transaction_count(address, block)
+            address: Wallet address
+        """
+        self.client = client
+        self.address = address
+        self._next: Optional[int] = None
+        self._released: List[int] = []
+        self._lock = asyncio.Lock()
+
+    async def reserve(self) -> int:
+        """Return the next nonce to use"""
+        async with self._lock:
+            if self._released:
+                return heapq.heappop(self._released)
+            if self._next is None:
+                self._next = await self.client.get_transaction_count(self.address, "pending")
+            nonce = self._next
+            self._next += 1
+            return nonce
+
+    async def release(self, nonce: int):
+        """Return an unused nonce so the next reservation takes it"""
+        async with self._lock:
+            heapq.heappush(self._released, nonce)
+
+    async def abandon(self, nonce: int) -> bool:
+        """
+        Give up a reserved nonce whose transaction the node never accepted
+
+        Returns:
+            False if the nonce was the last one handed out (the counter is
+            rewound, so no gap remains); True if later nonces are outstanding
+            and the gap must be filled
+        """
+        async with self._lock:
+            if self._next is None or nonce != self._next - 1:
+                return True
+            self._next -= 1
+            # Released nonces directly below are now the tail as well
+            while self._released and self._next - 1 in self._released:
+                self._released.remove(self._next - 1)
+                self._next -= 1
+            heapq.heapify(self._released)
+            return False
+
+    async def resync(self):
+        """Forget local state and re-read the pending nonce on next reserve"""
+        async with self._lock:
+            self._next = None
+            self._released.clear()
+
+
+class TxAction:
+    """One transaction to submit"""
+
+    def __init__(self, chain: str, protocol: str, action: str, amount: float, data: Optional[Dict[str, Any]] = None):
+        self.chain = chain
+        self.protocol = protocol
+        self.action = action
+        self.amount = amount
+        self.data = data or {}
+
+
+class TxResult:
+    """Outcome of one submitted transaction"""
+
+    def __init__(self, action: TxAction):
+        self.action = action
+        self.tx_hash: Optional[str] = None
+        self.nonce: Optional[int] = None
+        self.status = "pending"
+        self.gas_used: Optional[float] = None
+        self.block_number: Optional[int] = None
+        self.error: Optional[str] = None
+        self.submitted_at: Optional[float] = None
+        self.confirmed_at: Optional[float] = None
+
+    @property
+    def latency(self) -> Optional[float]:
+        """Seconds from submission to receipt"""
+        if self.submitted_at is None or self.confirmed_at is None:
+            return None
+        return self.confirmed_at - self.submitted_at
+
+
+class ChainExecutor:
+    """
+    Executes transactions on all chains at once
+
+    Each chain runs in its own task. Within a chain, transactions are
+    submitted back to back with locally reserved nonces (up to
+    max_in_flight unconfirmed); receipts are awaited through a shared
+    ConfirmationTracker, which polls each chain in batches once per block.
+    A transaction counts as confirmed once its receipt is `confirmations`
+    blocks deep, so a reorg that drops the receipt earlier is waited out.
+    Transient RPC errors are retried with the same nonce; a transaction
+    that still cannot be submitted gives its nonce back, and if later
+    nonces are already in flight the gap is filled with a zero-value
+    self-transfer so they are not stuck behind it.
+    """
+
+    def __init__(
+        self,
+        clients: Dict[str, Any],
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        confirmation_timeout: float = DEFAULT_CONFIRMATION_TIMEOUT,
+        block_times: Optional[Dict[str, float]] = None,
+        confirmations: int = DEFAULT_CONFIRMATIONS,
+        fee_params: Optional[Callable[[str], Dict[str, float]]] = None,
+        on_submitted: Optional[Callable[[TxResult], None]] = None
+    ):
+        """
+        Args:
+            clients: Chain name -> client (send_transaction, get_transaction_receipt,
+                get_transaction_count)
+            max_in_flight: Unconfirmed transactions allowed per chain
+            confirmation_timeout: Seconds to wait for a receipt
+            block_times: Expected seconds per block by chain (paces receipt polling)
+            confirmations: Blocks (including the receipt's) before a transaction counts as final
+            fee_params: Chain -> fee fields added to each transaction
+                (e.g. maxFeePerGas / maxPriorityFeePerGas from a GasOracle)
+            on_submitted: Called with each TxResult once the node accepts it
+                (before confirmation), e.g. to journal the hash and nonce
+        """
+        self.clients = clients
+        self.max_in_flight = max_in_flight
+        self.confirmation_timeout = confirmation_timeout
+        self.confirmations = confirmations
+        self.tracker = ConfirmationTracker(
+            clients, confirmations=confirmations, block_times=block_times, timeout=confirmation_timeout
+        )
+        self.fee_params = fee_params
+        self.on_submitted = on_submitted
+        self._nonce_managers: Dict[Tuple[str, str], NonceManager] = {}
+        self._in_flight: Dict[str, asyncio.Semaphore] = {}
+
+    def nonce_manager(self, chain: str, address: str) -> NonceManager:
+        key = (chain, address)
+        if key not in self._nonce_managers:
+            self._nonce_managers[key] = NonceManager(self.clients[chain], address)
+        return self._nonce_managers[key]
+
+    def _semaphore(self, chain: str) -> asyncio.Semaphore:
+        if chain not in self._in_flight:
+            self._in_flight[chain] = asyncio.Semaphore(self.max_in_flight)
+        return self._in_flight[chain]
+
+    async def execute(self, wallet: str, actions: List[TxAction]) -> List[TxResult]:
+        """
+        Submit and confirm actions, all chains concurrently
+
+        Args:
+            wallet: Sending wallet address
+            actions: Transactions to execute
+
+        Returns:
+            One TxResult per action, in input order
+        """
+        results = [TxResult(action) for action in actions]
+        by_chain: Dict[str, List[TxResult]] = {}
+        for result in results:
+            by_chain.setdefault(result.action.chain, []).append(result)
+
+        await asyncio.gather(*(
+            self._execute_chain(chain, wallet, chain_results)
+            for chain, chain_results in by_chain.items()
+        ))
+        return results
+
+    async def _execute_chain(self, chain: str, wallet: str, results: List[TxResult]):
+        client = self.clients.get(chain)
+        if client is None:
+            for result in results:
+                result.status = "failed"
+                result.error = f"No client configured for chain {chain}"
+            return
+
+        nonces = self.nonce_manager(chain, wallet)
+        semaphore = self._semaphore(chain)
+        confirmations = []
+        for result in results:
+            await semaphore.acquire()
+            if await self._submit(client, nonces, wallet, result):
+                confirmations.append(asyncio.ensure_future(self._confirm(result, semaphore)))
+            else:
+                semaphore.release()
+
+        await asyncio.gather(*confirmations)
+
+    async def _submit(self, client: Any, nonces: NonceManager, wallet: str, result: TxResult) -> bool:
+        """Submit with a reserved nonce, resyncing if the node rejects it and retrying RPC errors"""
+        action = result.action
+        nonce: Optional[int] = None
+        for attempt in range(SUBMIT_ATTEMPTS):
+            if nonce is None:
+                try:
+                    nonce = await nonces.reserve()
+                except RpcError as e:
+                    result.error = f"Nonce lookup failed: {e}"
+                    continue
+
+            tx = {
+                "from": wallet,
+                "nonce": nonce,
+                "to": action.protocol,
+                "value": action.amount,
+                "data": {"action": action.action, **action.data}
+            }
+            if self.fee_params is not None:
+                tx.update(self.fee_params(action.chain))
+            try:
+                result.submitted_at = time.monotonic()
+                result.tx_hash = await client.send_transaction(tx)
+            except NonceTooLowError as e:
+                # Another sender used this wallet; re-read the pending nonce
+                logger.warning(f"⚠️  {action.chain}: {e}, resyncing nonce")
+                await nonces.resync()
+                nonce = None
+                result.error = str(e)
+                continue
+            except RpcError as e:
+                # The node did not accept the call; retry with the same nonce
+                result.error = f"Submission failed: {e}"
+                continue
+            except Exception as e:
+                result.error = f"Submission failed: {e}"
+                break
+
+            result.nonce = nonce
+            result.error = None
+            self._notify_submitted(result)
+            return True
+
+        if nonce is not None:
+            await self._abandon_nonce(client, nonces, wallet, action.chain, nonce)
+        result.status = "failed"
+        return False
+
+    def _notify_submitted(self, result: TxResult):
+        """Run on_submitted; the node already has the transaction, so a failure here must not fail it"""
+        if self.on_submitted is None:
+            return
+        try:
+            self.on_submitted(result)
+        except Exception as e:
+            logger.error(
+                f"❌ {result.action.chain}: on_submitted failed for {result.tx_hash} "
+                f"(nonce {result.nonce}): {e}"
+            )
+
+    async def _abandon_nonce(self, client: Any, nonces: NonceManager, wallet: str, chain: str, nonce: int):
+        """Hand back a nonce that was never used, filling the gap if later nonces are in flight"""
+        if not await nonces.abandon(nonce):
+            return
+
+        filler = {"from": wallet, "nonce": nonce, "to": wallet, "value": 0.0, "data": {"action": GAP_FILL_ACTION}}
+        if self.fee_params is not None:
+            filler.update(self.fee_params(chain))
+        error: Optional[Exception] = None
+        for attempt in range(SUBMIT_ATTEMPTS):
+            try:
+                tx_hash = await client.send_transaction(filler)
+                logger.warning(f"⚠️  {chain}: filled nonce gap {nonce} with self-transfer {tx_hash}")
+                return
+            except NonceTooLowError:
+                # The nonce is used after all (e.g. the failed call did reach the node)
+                return
+            except Exception as e:
+                error = e
+
+        # Last resort: the next transaction on this wallet takes the nonce
+        logger.error(f"❌ {chain}: could not fill nonce gap {nonce}: {error}; reusing it for the next transaction")
+        await nonces.release(nonce)
+
+    async def _confirm(self, result: TxResult, semaphore: asyncio.Semaphore):
+        """Wait until the receipt is deep enough, then free the in-flight slot"""
+        try:
+            receipt = await self.tracker.wait(result.action.chain, result.tx_hash)
+            if receipt is None:
+                result.error = f"No receipt after {self.confirmation_timeout:.0f}s"
+                return
+            result.confirmed_at = time.monotonic()
+            result.block_number = receipt.get("blockNumber")
+            result.gas_used = receipt_cost(receipt)
+            result.status = "confirmed" if receipt.get("status") == 1 else "reverted"
+        finally:
+            semaphore.release()
+
+
+def receipt_cost(receipt: Dict[str, Any]) -> Optional[float]:
+    """Transaction cost from a receipt (the simulator reports it in ETH equivalent)"""
+    if "gasCost" in receipt:
+        return receipt["gasCost"]
+    if "effectiveGasPrice" in receipt and "gasUsed" in receipt:
+        return receipt["gasUsed"] * receipt["effectiveGasPrice"] * 1e-9
+    return receipt.get("gasUsed")
+
+
+def test_chain_executor():
+    """Smoke test: sequential vs concurrent execution on simulated chains"""
+    from utils.chain_simulator import create_local_chains
+
+    gas_costs = {"ethereum": 0.015, "polygon": 0.0001, "arbitrum": 0.0008, "bsc": 0.0002, "solana": 0.00001}
+    block_times = {"ethereum": 0.12, "polygon": 0.02, "arbitrum": 0.01, "bsc": 0.03, "solana": 0.005}
+    actions = [
+        TxAction(chain, f"Protocol-{i}", "deposit", 1.0)
+        for chain in gas_costs
+        for i in range(3)
+    ]
+
+    async def run():
+        sequential = ChainExecutor(create_local_chains(gas_costs, block_times, seed=1), max_in_flight=1)
+        start = time.perf_counter()
+        for action in actions:
+            await sequential.execute("0xwallet", [action])
+        sequential_time = time.perf_counter() - start
+
+        concurrent = ChainExecutor(create_local_chains(gas_costs, block_times, seed=1), block_times=block_times)
+        start = time.perf_counter()
+        results = await concurrent.execute("0xwallet", actions)
+        concurrent_time = time.perf_counter() - start
+        return results, sequential_time, concurrent_time
+
+    print("=" * 60)
+    print("⛓️  Testing Multi-Chain Executor")
+    print("=" * 60)
+
+    results, sequential_time, concurrent_time = asyncio.run(run())
+    for result in results:
+        print(f"   {result.action.chain:9s} nonce {result.nonce}  {result.status}  block {result.block_number}")
+    print(f"   Sequential: {sequential_time * 1000:.0f} ms, concurrent: {concurrent_time * 1000:.0f} ms")
+
+    assert all(result.status == "confirmed" for result in results)
+    for chain in gas_costs:
+        assert [r.nonce for r in results if r.action.chain == chain] == [0, 1, 2]
+
+    print("\n✅ All tests passed!")
+
+
+if __name__ == "__main__":
+    test_chain_executor()
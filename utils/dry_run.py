@@ -0,0 +1,238 @@
+"""
+YieldSwarm AI - Pre-Execution Dry Run
+Simulates every action of a plan concurrently and decides go / no-go
+"""
+import asyncio
+import time
+from typing import List, Dict, Any, Callable, Optional
+import logging
+
+from utils.chain_simulator import RpcError
+from utils.execution_planner import ExecutionPlan, PlannedAction
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_TIMEOUT = 2.0
+# Transactions per simulation request (eth_callMany bundle / Solana
+# simulateTransaction batch)
+DEFAULT_MAX_BATCH = 50
+SIMULATION_ATTEMPTS = 2
+
+
+class SimulationResult:
+    """Dry-run outcome of one planned action"""
+
+    def __init__(self, action: PlannedAction):
+        self.action = action
+        self.simulated = False
+        self.success = False
+        self.error: Optional[str] = None
+        self.gas_cost: Optional[float] = None
+        self.slippage: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "action_id": self.action.action_id,
+            "chain": self.action.chain,
+            "simulated": self.simulated,
+            "success": self.success,
+            "error": self.error,
+            "gas_cost": self.gas_cost,
+            "slippage": self.slippage
+        }
+
+
+class DryRunReport:
+    """Per-action simulation results and the go / no-go decision"""
+
+    def __init__(self, results: Dict[str, SimulationResult], reasons: List[str], elapsed: float, timed_out: bool):
+        self.results = results
+        self.reasons = reasons
+        self.elapsed = elapsed
+        self.timed_out = timed_out
+
+    @property
+    def go(self) -> bool:
+        return not self.reasons
+
+    @property
+    def gas_cost(self) -> float:
+        return sum(result.gas_cost or 0.0 for result in self.results.values())
+
+
+def _transaction(action: PlannedAction, wallet: str, fee_params: Optional[Callable[[str], Dict[str, float]]]) -> Dict[str, Any]:
+    """Same transaction shape ChainExecutor submits, without a nonce"""
+    tx = {
+        "from": wallet,
+        "to": action.protocol,
+        "value": action.amount,
+        "data": {"action": action.action, **action.data}
+    }
+    if fee_params is not None:
+        tx.update(fee_params(action.chain))
+    return tx
+
+
+async def _simulate_chunk(
+    client: Any,
+    chunk: List[SimulationResult],
+    wallet: str,
+    credits: Dict[str, float],
+    fee_params: Optional[Callable[[str], Dict[str, float]]]
+):
+    txs = [_transaction(result.action, wallet, fee_params) for result in chunk]
+    for attempt in range(SIMULATION_ATTEMPTS):
+        try:
+            simulated = await client.simulate_transactions(txs, credits=credits)
+            break
+        except RpcError as e:
+            if attempt == SIMULATION_ATTEMPTS - 1:
+                raise
+            logger.debug(f"Simulation request failed ({e}), retrying")
+
+    for result, outcome in zip(chunk, simulated):
+        result.simulated = True
+        result.success = outcome["success"]
+        result.error = outcome.get("error")
+        result.gas_cost = outcome.get("gasCost")
+        result.slippage = outcome.get("slippage")
+
+
+async def dry_run(
+    plan: ExecutionPlan,
+    clients: Dict[str, Any],
+    wallet: str,
+    max_slippage: float,
+    timeout: float = DEFAULT_TIMEOUT,
+    max_batch: int = DEFAULT_MAX_BATCH,
+    fee_params: Optional[Callable[[str], Dict[str, float]]] = None
+) -> DryRunReport:
+    """
+    Simulate every action of a plan before anything is sent
+
+    Actions are grouped per chain into batched simulation requests and all
+    requests run concurrently, so the dry run takes about one round trip per
+    chain. Funds a plan bridges to a chain are credited to the wallet there
+    for the simulation. The run is bounded by timeout: actions whose
+    simulation has not returned by then count as failed, so the decision
+    fails closed.
+
+    Args:
+        plan: Execution DAG to check
+        clients: Chain name -> client with simulate_transactions(txs, credits)
+        wallet: Sending wallet address
+        max_slippage: Largest acceptable price impact (percent)
+        timeout: Seconds the whole dry run may take
+        max_batch: Transactions per simulation request
+        fee_params: Chain -> fee fields added to each transaction
+
+    Returns:
+        DryRunReport (go when every action succeeds within max_slippage)
+    """
+    start = time.monotonic()
+    results = {action_id: SimulationResult(action) for action_id, action in plan.actions.items()}
+
+    credits: Dict[str, float] = {}
+    for action in plan.actions.values():
+        if action.action == "bridge":
+            destination = action.data["destination"]
+            credits[destination] = credits.get(destination, 0.0) + action.amount
+
+    by_chain: Dict[str, List[SimulationResult]] = {}
+    for result in results.values():
+        by_chain.setdefault(result.action.chain, []).append(result)
+
+    tasks: Dict[asyncio.Future, List[SimulationResult]] = {}
+    for chain, chain_results in by_chain.items():
+        client = clients.get(chain)
+        if client is None:
+            for result in chain_results:
+                result.error = f"No client configured for chain {chain}"
+            continue
+        for i in range(0, len(chain_results), max_batch):
+            chunk = chain_results[i:i + max_batch]
+            task = asyncio.ensure_future(_simulate_chunk(client, chunk, wallet, {wallet: credits.get(chain, 0.0)}, fee_params))
+            tasks[task] = chunk
+
+    timed_out = False
+    if tasks:
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+            timed_out = True
+            for result in tasks[task]:
+                result.error = f"Simulation did not finish within {timeout:.1f}s"
+        for task in done:
+            if task.exception() is not None:
+                for result in tasks[task]:
+                    result.error = f"Simulation failed: {task.exception()}"
+
+    reasons = []
+    for action_id, result in results.items():
+        if not result.success:
+            reasons.append(f"{action_id}: {result.error or 'simulation reverted'}")
+        elif result.slippage is not None and result.slippage > max_slippage:
+            reasons.append(f"{action_id}: slippage {result.slippage:.2f}% exceeds {max_slippage:.2f}%")
+
+    return DryRunReport(results, reasons, time.monotonic() - start, timed_out)
+
+
+def test_dry_run():
+    """Smoke test: go, no-go on slippage and paused protocols, and the latency bound"""
+    from utils.chain_simulator import LocalChain, create_local_chains
+    from utils.execution_planner import plan_strategy
+
+    class Alloc:
+        def __init__(self, protocol, chain, amount):
+            self.protocol = protocol
+            self.chain = chain
+            self.amount = amount
+
+    gas_costs = {"ethereum": 0.015, "arbitrum": 0.0008, "solana": 0.00001}
+    block_times = {"ethereum": 0.12, "arbitrum": 0.0025, "solana": 0.004}
+    allocations = [
+        Alloc("Aave-V3", "ethereum", 3.0),
+        Alloc("Uniswap-V3", "arbitrum", 20.0),
+        Alloc("Raydium", "solana", 1.5),
+    ]
+    plan = plan_strategy(allocations, source_chain="ethereum")
+
+    async def run(**chain_kwargs):
+        chains = create_local_chains(gas_costs, block_times, rpc_latency=0.02, default_balance=40.0, **chain_kwargs)
+        return await dry_run(plan, chains, "0xwallet", max_slippage=0.5), chains
+
+    async def slow():
+        chains = create_local_chains(gas_costs, block_times)
+        chains["solana"] = LocalChain("solana", rpc_latency=1.0)
+        return await dry_run(plan, chains, "0xwallet", max_slippage=0.5, timeout=0.1)
+
+    print("=" * 60)
+    print("🧪 Testing Pre-Execution Dry Run")
+    print("=" * 60)
+
+    report, chains = asyncio.run(run())
+    rpc_calls = sum(chain.rpc_calls for chain in chains.values())
+    print(f"   {len(plan)} actions simulated in {report.elapsed * 1000:.0f} ms with {rpc_calls} RPC calls: "
+          f"{'GO' if report.go else 'NO-GO'}, gas {report.gas_cost:.5f}")
+    assert report.go and rpc_calls == len(gas_costs)
+    # The arbitrum actions (50 ETH of value) only fit with the 20 ETH bridged in
+    assert report.results["1:Uniswap-V3:arbitrum:provide_liquidity"].success
+
+    shallow, _ = asyncio.run(run(pool_liquidity={"Uniswap-V3": 1000.0}))
+    paused, _ = asyncio.run(run(paused_protocols={"Raydium"}))
+    for name, rejected in (("Shallow pool", shallow), ("Paused protocol", paused)):
+        print(f"   {name}: {'GO' if rejected.go else 'NO-GO'} - {rejected.reasons[0]}")
+        assert not rejected.go
+
+    bounded = asyncio.run(slow())
+    print(f"   Slow chain: {'GO' if bounded.go else 'NO-GO'} after {bounded.elapsed * 1000:.0f} ms "
+          f"(timed out: {bounded.timed_out})")
+    assert not bounded.go and bounded.timed_out and bounded.elapsed < 0.5
+    assert bounded.results["bridge:ethereum->arbitrum"].success
+
+    print("\n✅ All tests passed!")
+
+
+if __name__ == "__main__":
+    test_dry_run()
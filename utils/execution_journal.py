@@ -0,0 +1,401 @@
+"""
+YieldSwarm AI - Execution Journal
+Append-only write-ahead log of planned, submitted and confirmed actions
+"""
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_FSYNC_INTERVAL = 0.01
+DEFAULT_COMPACT_MIN_RECORDS = 1000
+
+# Finished requests keep their "finished" record (a tombstone) through
+# compaction for this long, so a redelivered request is answered, not re-run
+DEFAULT_TOMBSTONE_TTL_SECONDS = 7 * 86400.0
+# Most tombstones held at once; the oldest are dropped beyond this
+DEFAULT_MAX_TOMBSTONES = 10_000
+
+# Terminal action states (anything else is resumed after a restart)
+ACTION_DONE = ("confirmed", "reverted", "failed", "skipped")
+
+
+class RequestState:
+    """Everything the journal knows about one request"""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.request: Optional[Dict[str, Any]] = None
+        self.sender: Optional[str] = None
+        self.actions: Dict[str, Dict[str, Any]] = {}
+        self.finished = False
+        self.records = 0
+
+    def apply(self, record: Dict[str, Any]):
+        event = record["event"]
+        self.records += 1
+        if event == "planned":
+            self.request = record.get("request")
+            self.sender = record.get("sender")
+            for action_id in record.get("actions", []):
+                self.actions.setdefault(action_id, {"status": "planned"})
+        elif event == "finished":
+            self.finished = True
+        else:
+            action = self.actions.setdefault(record["action_id"], {})
+            action.update({key: value for key, value in record.items() if key not in ("seq", "ts", "request_id", "event", "action_id")})
+            action["status"] = event
+
+    def done(self, action_id: str) -> bool:
+        return self.actions.get(action_id, {}).get("status") in ACTION_DONE
+
+
+class ExecutionJournal:
+    """
+    Write-ahead journal keyed by request_id
+
+    Records are JSON lines appended to one file. Appends are buffered and
+    fsynced in groups: every append schedules a single fsync fsync_interval
+    later, and sync() waits for the group covering everything appended so
+    far. Requests are replayed into RequestState on open(); finished
+    requests are dropped by compact(), which rewrites the file atomically.
+
+    A finished request keeps only its "finished" record as a tombstone
+    (with whatever the caller stored in it, e.g. the response sent), so
+    finished() still answers for it after compaction and restarts until
+    tombstone_ttl expires or max_tombstones newer ones push it out.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fsync_interval: float = DEFAULT_FSYNC_INTERVAL,
+        compact_min_records: int = DEFAULT_COMPACT_MIN_RECORDS,
+        tombstone_ttl: Optional[float] = DEFAULT_TOMBSTONE_TTL_SECONDS,
+        max_tombstones: Optional[int] = DEFAULT_MAX_TOMBSTONES
+    ):
+        """
+        Args:
+            path: Journal file
+            fsync_interval: Seconds appends wait to share an fsync
+            compact_min_records: Dead records before compact() rewrites the file
+            tombstone_ttl: Seconds a finished request's tombstone survives
+                compaction (None keeps tombstones forever)
+            max_tombstones: Most tombstones kept (None for no bound)
+        """
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.compact_min_records = compact_min_records
+        self.tombstone_ttl = tombstone_ttl
+        self.max_tombstones = max_tombstones
+
+        self.states: Dict[str, RequestState] = {}
+        self._records: Dict[str, List[str]] = {}
+        # request_id -> (finished record, its journal line), oldest first
+        self._tombstones: "OrderedDict[str, Tuple[Dict[str, Any], str]]" = OrderedDict()
+        self._file = None
+        self._seq = 0
+        self._synced = 0
+        self._sync_task: Optional[asyncio.Task] = None
+        self.dead_records = 0
+        self.fsyncs = 0
+
+    # ===== OPEN / REPLAY =====
+
+    def open(self) -> List[RequestState]:
+        """
+        Replay the journal and open it for appending
+
+        A torn final record (crash mid-write) is truncated away.
+
+        Returns:
+            States of requests that had not finished
+        """
+        start = time.perf_counter()
+        valid_bytes = 0
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                for raw in f:
+                    try:
+                        record = json.loads(raw)
+                    except ValueError:
+                        logger.warning(f"⚠️  Truncating torn journal record at byte {valid_bytes}")
+                        break
+                    valid_bytes += len(raw)
+                    self._replay(record, raw.decode().rstrip("\n"))
+            if valid_bytes < os.path.getsize(self.path):
+                with open(self.path, "r+b") as f:
+                    f.truncate(valid_bytes)
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._synced = self._seq
+
+        pending = self.pending()
+        logger.info(
+            f"📒 Journal replayed {self._seq} records in {(time.perf_counter() - start) * 1000:.1f} ms, "
+            f"{len(pending)} request(s) in flight"
+        )
+        return pending
+
+    def _replay(self, record: Dict[str, Any], line: str):
+        self._seq = max(self._seq, record.get("seq", 0))
+        request_id = record["request_id"]
+        state = self.states.get(request_id)
+        if state is None:
+            state = self.states[request_id] = RequestState(request_id)
+            self._records[request_id] = []
+        state.apply(record)
+        self._records[request_id].append(line)
+        if state.finished:
+            self._retire(request_id, record, line)
+
+    def _retire(self, request_id: str, record: Dict[str, Any], line: str):
+        # Everything but the finished record itself is dead
+        self.dead_records += len(self._records.pop(request_id, [])) - 1
+        self.states.pop(request_id, None)
+        self._tombstones.pop(request_id, None)
+        self._tombstones[request_id] = (record, line)
+        self._expire_tombstones()
+
+    def _expire_tombstones(self) -> int:
+        # Tombstones are kept in finish order, so the expired and the
+        # over-cap ones are all at the front
+        cutoff = None if self.tombstone_ttl is None else time.time() - self.tombstone_ttl
+        expired = 0
+        while self._tombstones:
+            record, _ = next(iter(self._tombstones.values()))
+            over_cap = self.max_tombstones is not None and len(self._tombstones) > self.max_tombstones
+            if not over_cap and (cutoff is None or record.get("ts", 0) >= cutoff):
+                break
+            self._tombstones.popitem(last=False)
+            expired += 1
+        # Their lines are still in the file until the next compaction
+        self.dead_records += expired
+        return expired
+
+    # ===== APPEND =====
+
+    def append(self, request_id: str, event: str, **fields: Any) -> int:
+        """
+        Append a record; it becomes durable with the next group fsync
+
+        Args:
+            request_id: Request the record belongs to
+            event: planned, submitted, confirmed, reverted, failed, skipped or finished
+            **fields: Event data (action_id, tx_hash, nonce, ...)
+
+        Returns:
+            Sequence number of the record
+        """
+        self._seq += 1
+        record = {"seq": self._seq, "ts": time.time(), "request_id": request_id, "event": event, **fields}
+        line = json.dumps(record, separators=(",", ":"), default=str)
+        self._file.write(line + "\n")
+
+        state = self.states.get(request_id)
+        if state is None:
+            state = self.states[request_id] = RequestState(request_id)
+            self._records[request_id] = []
+        state.apply(record)
+        self._records[request_id].append(line)
+        if state.finished:
+            self._retire(request_id, record, line)
+
+        self._schedule_sync()
+        return self._seq
+
+    async def log(self, request_id: str, event: str, **fields: Any) -> int:
+        """Append a record and wait until it is on disk"""
+        seq = self.append(request_id, event, **fields)
+        await self.sync()
+        return seq
+
+    def _schedule_sync(self):
+        if self._sync_task is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._fsync_now()
+            return
+        self._sync_task = loop.create_task(self._sync_after(self.fsync_interval))
+
+    async def _sync_after(self, delay: float):
+        try:
+            await asyncio.sleep(delay)
+            target = self._seq
+            self._file.flush()
+            await asyncio.to_thread(os.fsync, self._file.fileno())
+            self._synced = max(self._synced, target)
+            self.fsyncs += 1
+        finally:
+            self._sync_task = None
+        # Records appended during the fsync need another group
+        if self._synced < self._seq:
+            self._schedule_sync()
+
+    def _fsync_now(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._synced = self._seq
+        self.fsyncs += 1
+
+    async def sync(self):
+        """Wait until every record appended so far is durable"""
+        target = self._seq
+        while self._synced < target:
+            self._schedule_sync()
+            task = self._sync_task
+            if task is None:
+                break
+            await asyncio.shield(task)
+
+    # ===== QUERIES =====
+
+    def state(self, request_id: str) -> Optional[RequestState]:
+        return self.states.get(request_id)
+
+    def pending(self) -> List[RequestState]:
+        """Requests that were planned but never finished"""
+        return [state for state in self.states.values() if not state.finished and state.request is not None]
+
+    def finished(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """The "finished" record of a completed request (None if it has not finished)"""
+        tombstone = self._tombstones.get(request_id)
+        return tombstone[0] if tombstone is not None else None
+
+    # ===== COMPACTION =====
+
+    async def compact(self, force: bool = False) -> int:
+        """
+        Rewrite the journal with only unfinished requests and live tombstones
+
+        Args:
+            force: Compact even below compact_min_records dead records
+
+        Returns:
+            Number of records dropped
+        """
+        if not force and self.dead_records < self.compact_min_records:
+            return 0
+        await self.sync()
+
+        self._expire_tombstones()
+        dropped = self.dead_records
+
+        tmp_path = self.path + ".compact"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for _, line in self._tombstones.values():
+                f.write(line + "\n")
+            for lines in self._records.values():
+                for line in lines:
+                    f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._file.close()
+        os.replace(tmp_path, self.path)
+        _fsync_directory(os.path.dirname(os.path.abspath(self.path)))
+        self._file = open(self.path, "a", encoding="utf-8")
+        self.dead_records = 0
+        return dropped
+
+    async def close(self):
+        if self._file is not None:
+            await self.sync()
+            self._file.close()
+            self._file = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Journal metrics for logging"""
+        return {
+            "records": self._seq,
+            "in_flight": len(self.pending()),
+            "live_records": sum(len(lines) for lines in self._records.values()),
+            "tombstones": len(self._tombstones),
+            "dead_records": self.dead_records,
+            "fsyncs": self.fsyncs
+        }
+
+
+def _fsync_directory(directory: str):
+    """Persist a rename (not supported on every platform)"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def test_execution_journal():
+    """Smoke test: group commit, crash replay with a torn record, and compaction"""
+    import tempfile
+
+    path = os.path.join(tempfile.mkdtemp(), "journal.jsonl")
+
+    async def write():
+        journal = ExecutionJournal(path, compact_min_records=10)
+        journal.open()
+        for i in range(50):
+            request_id = f"req-{i}"
+            await journal.log(request_id, "planned", request={"i": i}, sender="coordinator", actions=["a", "b"])
+            journal.append(request_id, "submitted", action_id="a", tx_hash=f"0x{i}", nonce=i)
+            journal.append(request_id, "confirmed", action_id="a", tx_hash=f"0x{i}")
+            if i < 48:
+                journal.append(request_id, "confirmed", action_id="b", tx_hash=f"0x{i}b")
+                journal.append(request_id, "finished", status="success")
+        await journal.sync()
+        # Simulate a crash mid-write
+        journal._file.write('{"seq": 999, "request_')
+        journal._file.flush()
+        return journal.fsyncs
+
+    print("=" * 60)
+    print("📒 Testing Execution Journal")
+    print("=" * 60)
+
+    fsyncs = asyncio.run(write())
+    print(f"   250 records written with {fsyncs} fsyncs")
+
+    async def recover():
+        journal = ExecutionJournal(path, compact_min_records=10)
+        start = time.perf_counter()
+        pending = journal.open()
+        elapsed = time.perf_counter() - start
+        size_before = os.path.getsize(path)
+        dropped = await journal.compact()
+        size_after = os.path.getsize(path)
+        await journal.close()
+        return pending, elapsed, dropped, size_before, size_after
+
+    pending, elapsed, dropped, size_before, size_after = asyncio.run(recover())
+    print(f"   Recovered {len(pending)} in-flight request(s) in {elapsed * 1000:.1f} ms")
+    print(f"   Compaction dropped {dropped} records ({size_before} -> {size_after} bytes)")
+
+    assert sorted(state.request_id for state in pending) == ["req-48", "req-49"]
+    assert pending[0].done("a") and not pending[0].done("b")
+    assert fsyncs < 250
+
+    reopened = ExecutionJournal(path)
+    assert len(reopened.open()) == 2
+    assert reopened.finished("req-0")["status"] == "success", "Tombstones survive compaction"
+    assert reopened.finished("req-48") is None
+
+    print("\n✅ All tests passed!")
+
+
+if __name__ == "__main__":
+    test_execution_journal()
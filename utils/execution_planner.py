@@ -0,0 +1,348 @@
+"""
+YieldSwarm AI - Execution Planner
+Turns a strategy into a dependency DAG of chain actions and schedules it
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Awaitable, Callable, Iterable, Optional, Sequence, Tuple
+import logging
+
+from utils.protocol_registry import get_registry
+
+logger = logging.getLogger(__name__)
+
+
+# ===== TIMING ESTIMATES (seconds, real networks) =====
+
+CONFIRMATION_SECONDS = {
+    "ethereum": 12.0,
+    "polygon": 2.0,
+    "arbitrum": 0.25,
+    "bsc": 3.0,
+    "solana": 0.4
+}
+
+# Bridge transfer time from the source chain, keyed by destination
+BRIDGE_SECONDS = {
+    "ethereum": 900.0,
+    "polygon": 1800.0,
+    "arbitrum": 600.0,
+    "bsc": 300.0,
+    "solana": 900.0
+}
+
+BRIDGE_PROTOCOLS = {"solana": "Wormhole"}
+DEFAULT_BRIDGE_PROTOCOL = "Stargate"
+
+# Chains without ERC-20 style approvals
+NO_APPROVAL_CHAINS = {"solana"}
+
+# Protocol types entered by swapping into the pair and providing liquidity
+LIQUIDITY_TYPES = {"DEX", "DEX-Stablecoin", "DEX-Weighted"}
+# Protocol types entered by staking the native asset
+STAKING_TYPES = {"Liquid-Staking"}
+
+
+class PlannedAction:
+    """One chain action in an execution plan"""
+
+    def __init__(
+        self,
+        action_id: str,
+        chain: str,
+        protocol: str,
+        action: str,
+        amount: float,
+        depends_on: Iterable[str] = (),
+        estimated_seconds: float = 0.0,
+        data: Optional[Dict[str, Any]] = None
+    ):
+        self.action_id = action_id
+        self.chain = chain
+        self.protocol = protocol
+        self.action = action
+        self.amount = amount
+        self.depends_on = list(depends_on)
+        self.estimated_seconds = estimated_seconds
+        self.data = data or {}
+
+
+class ExecutionPlan:
+    """DAG of PlannedActions keyed by action_id (insertion order is a valid topological order)"""
+
+    def __init__(self):
+        self.actions: "OrderedDict[str, PlannedAction]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+    def add(self, action: PlannedAction) -> PlannedAction:
+        """Add an action whose dependencies are already in the plan"""
+        if action.action_id in self.actions:
+            raise ValueError(f"Duplicate action id {action.action_id}")
+        missing = [dep for dep in action.depends_on if dep not in self.actions]
+        if missing:
+            raise ValueError(f"{action.action_id} depends on unknown actions {missing}")
+        self.actions[action.action_id] = action
+        return action
+
+    def dependents(self) -> Dict[str, List[str]]:
+        children: Dict[str, List[str]] = {action_id: [] for action_id in self.actions}
+        for action in self.actions.values():
+            for dep in action.depends_on:
+                children[dep].append(action.action_id)
+        return children
+
+    def critical_path(self, durations: Optional[Dict[str, float]] = None) -> Tuple[List[str], float]:
+        """
+        Longest dependency chain
+
+        Args:
+            durations: Seconds per action_id (defaults to estimated_seconds)
+
+        Returns:
+            (action ids along the path, total seconds)
+        """
+        finish: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+        for action_id, action in self.actions.items():
+            duration = durations.get(action_id, 0.0) if durations is not None else action.estimated_seconds
+            start, parent = 0.0, None
+            for dep in action.depends_on:
+                if finish[dep] > start:
+                    start, parent = finish[dep], dep
+            finish[action_id] = start + duration
+            previous[action_id] = parent
+
+        if not finish:
+            return [], 0.0
+        node: Optional[str] = max(finish, key=finish.get)
+        total = finish[node]
+        path = []
+        while node is not None:
+            path.append(node)
+            node = previous[node]
+        return path[::-1], total
+
+
+def _protocol_type(protocol: str) -> str:
+    record = get_registry().get(protocol)
+    return record["type"] if record else "Lending"
+
+
+def plan_strategy(allocations: Sequence[Any], source_chain: Optional[str] = None) -> ExecutionPlan:
+    """
+    Build the execution DAG for a strategy's allocations
+
+    - One bridge per destination chain when funds start on source_chain
+    - Approve before any token transfer into a protocol (EVM chains)
+    - DEX pools: swap half into the pair asset, then provide liquidity
+    - Liquid staking: stake the native asset directly
+    - Everything else: deposit
+
+    Approvals do not need the bridged funds, so they run alongside the bridge.
+
+    Args:
+        allocations: Objects with protocol, chain and amount (AllocationItem shape)
+        source_chain: Chain holding the funds, bridged to the others (None, the
+            default: funds are already on each chain)
+
+    Returns:
+        ExecutionPlan
+    """
+    plan = ExecutionPlan()
+
+    bridges: Dict[str, str] = {}
+    if source_chain:
+        bridged: "OrderedDict[str, float]" = OrderedDict()
+        for alloc in allocations:
+            chain = alloc.chain.lower()
+            if chain != source_chain:
+                bridged[chain] = bridged.get(chain, 0.0) + alloc.amount
+        for chain, amount in bridged.items():
+            bridges[chain] = plan.add(PlannedAction(
+                f"bridge:{source_chain}->{chain}",
+                source_chain,
+                BRIDGE_PROTOCOLS.get(chain, DEFAULT_BRIDGE_PROTOCOL),
+                "bridge",
+                amount,
+                estimated_seconds=CONFIRMATION_SECONDS.get(source_chain, 12.0) + BRIDGE_SECONDS.get(chain, 900.0),
+                data={"destination": chain, "bridge_seconds": BRIDGE_SECONDS.get(chain, 900.0)}
+            )).action_id
+
+    for i, alloc in enumerate(allocations):
+        chain = alloc.chain.lower()
+        confirm = CONFIRMATION_SECONDS.get(chain, 12.0)
+        prefix = f"{i}:{alloc.protocol}:{chain}"
+        funded = [bridges[chain]] if chain in bridges else []
+        protocol_type = _protocol_type(alloc.protocol)
+
+        if protocol_type in STAKING_TYPES:
+            plan.add(PlannedAction(f"{prefix}:stake", chain, alloc.protocol, "stake", alloc.amount, funded, confirm))
+            continue
+
+        approved = []
+        if chain not in NO_APPROVAL_CHAINS:
+            approved = [plan.add(PlannedAction(
+                f"{prefix}:approve", chain, alloc.protocol, "approve", alloc.amount, (), confirm
+            )).action_id]
+
+        if protocol_type in LIQUIDITY_TYPES:
+            swap = plan.add(PlannedAction(
+                f"{prefix}:swap", chain, alloc.protocol, "swap", alloc.amount / 2, funded + approved, confirm
+            ))
+            plan.add(PlannedAction(
+                f"{prefix}:provide_liquidity", chain, alloc.protocol, "provide_liquidity",
+                alloc.amount, [swap.action_id], confirm
+            ))
+        else:
+            plan.add(PlannedAction(
+                f"{prefix}:deposit", chain, alloc.protocol, "deposit", alloc.amount, funded + approved, confirm
+            ))
+
+    return plan
+
+
+# ===== SCHEDULER =====
+
+class ActionOutcome:
+    """Result of running one planned action"""
+
+    def __init__(self, action: PlannedAction):
+        self.action = action
+        self.status = "pending"
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def duration(self) -> float:
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+
+class ScheduleResult:
+    """Outcomes plus estimated and measured critical paths"""
+
+    def __init__(self, plan: ExecutionPlan, outcomes: Dict[str, ActionOutcome], makespan: float):
+        self.plan = plan
+        self.outcomes = outcomes
+        self.makespan = makespan
+        self.estimated_critical_path, self.estimated_seconds = plan.critical_path()
+        self.measured_critical_path, self.measured_seconds = plan.critical_path(
+            {action_id: outcome.duration for action_id, outcome in outcomes.items()}
+        )
+
+    @property
+    def completed(self) -> int:
+        return sum(1 for outcome in self.outcomes.values() if outcome.status == "completed")
+
+
+async def run_plan(
+    plan: ExecutionPlan,
+    run_action: Callable[[PlannedAction], Awaitable[Any]],
+    max_concurrency: Optional[int] = None
+) -> ScheduleResult:
+    """
+    Run a plan, starting each action as soon as its dependencies complete
+
+    Args:
+        plan: Execution DAG
+        run_action: Coroutine executing one action; raising marks it failed
+            and every action depending on it (transitively) as skipped
+        max_concurrency: Cap on simultaneously running actions
+
+    Returns:
+        ScheduleResult
+    """
+    outcomes = {action_id: ActionOutcome(action) for action_id, action in plan.actions.items()}
+    children = plan.dependents()
+    waiting = {action_id: set(action.depends_on) for action_id, action in plan.actions.items()}
+    semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    async def run(outcome: ActionOutcome):
+        if semaphore is not None:
+            await semaphore.acquire()
+        outcome.started_at = time.monotonic()
+        try:
+            outcome.result = await run_action(outcome.action)
+            outcome.status = "completed"
+        except Exception as e:
+            outcome.status = "failed"
+            outcome.error = str(e)
+        finally:
+            outcome.finished_at = time.monotonic()
+            if semaphore is not None:
+                semaphore.release()
+
+    def skip_descendants(action_id: str):
+        for child in children[action_id]:
+            if outcomes[child].status == "pending":
+                outcomes[child].status = "skipped"
+                outcomes[child].error = f"Dependency {action_id} did not complete"
+                skip_descendants(child)
+
+    start = time.monotonic()
+    running: Dict[asyncio.Future, str] = {}
+    ready = [action_id for action_id, deps in waiting.items() if not deps]
+    while ready or running:
+        for action_id in ready:
+            running[asyncio.ensure_future(run(outcomes[action_id]))] = action_id
+        ready = []
+
+        done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            action_id = running.pop(task)
+            if outcomes[action_id].status != "completed":
+                skip_descendants(action_id)
+                continue
+            for child in children[action_id]:
+                waiting[child].discard(action_id)
+                if not waiting[child] and outcomes[child].status == "pending":
+                    ready.append(child)
+
+    return ScheduleResult(plan, outcomes, time.monotonic() - start)
+
+
+def test_execution_planner():
+    """Smoke test: plan a cross-chain strategy and run it with simulated delays"""
+    class Alloc:
+        def __init__(self, protocol, chain, amount):
+            self.protocol = protocol
+            self.chain = chain
+            self.amount = amount
+
+    allocations = [
+        Alloc("Aave-V3", "ethereum", 3.5),
+        Alloc("Lido", "ethereum", 3.0),
+        Alloc("Uniswap-V3", "arbitrum", 2.0),
+        Alloc("Raydium", "solana", 1.5),
+    ]
+    plan = plan_strategy(allocations, source_chain="ethereum")
+
+    async def simulate(action: PlannedAction):
+        await asyncio.sleep(action.estimated_seconds / 10000)
+        if action.protocol == "Raydium" and action.action == "swap":
+            raise RuntimeError("slippage exceeded")
+
+    print("=" * 60)
+    print("🗺️  Testing Execution Planner")
+    print("=" * 60)
+
+    result = asyncio.run(run_plan(plan, simulate))
+    for action_id, outcome in result.outcomes.items():
+        deps = ", ".join(plan.actions[action_id].depends_on) or "-"
+        print(f"   {outcome.status:9s} {action_id:40s} after {deps}")
+    print(f"   Critical path ({result.estimated_seconds:.0f}s est.): {' -> '.join(result.estimated_critical_path)}")
+
+    assert result.outcomes["3:Raydium:solana:provide_liquidity"].status == "skipped"
+    assert result.estimated_critical_path[0] == "bridge:ethereum->solana"
+
+    print("\n✅ All tests passed!")
+
+
+if __name__ == "__main__":
+    test_execution_planner()
@@ -0,0 +1,141 @@
+"""
+YieldSwarm AI - Efficient Frontier Cache
+Precomputes optimal weights per (risk level, chain set) for each opportunity snapshot
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import List, Dict, Any, Callable, Iterable, Optional, Tuple
+import logging
+
+from utils.result_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+RISK_LEVELS = ("conservative", "moderate", "aggressive")
+
+DEFAULT_MAX_SNAPSHOTS = 2
+DEFAULT_MAX_COMBINATIONS = 32
+DEFAULT_TTL_SECONDS = 900.0
+
+# (chains, optimizer) - every risk level is precomputed for each combination
+Combination = Tuple[Tuple[str, ...], str]
+FrontierKey = Tuple[str, str, Tuple[str, ...], str]
+
+# compute(snapshot, risk_level, chains, optimizer) -> cached value
+ComputeFn = Callable[[Any, str, Tuple[str, ...], str], Any]
+
+
+def chain_key(chains: Iterable[Any]) -> Tuple[str, ...]:
+    """Order-independent key for a chain set"""
+    return tuple(sorted({str(getattr(chain, "value", chain)).lower() for chain in chains}))
+
+
+class FrontierCache:
+    """
+    Cache of optimal allocations keyed by snapshot version, risk level,
+    chain set and optimizer
+
+    Requests record the snapshot they saw and the (chain set, optimizer)
+    combination they asked for. A background stage calls precompute() to fill
+    every risk level for those combinations on the newest snapshots, so
+    later requests are answered by lookup().
+    """
+
+    def __init__(
+        self,
+        compute: ComputeFn,
+        risk_levels: Iterable[str] = RISK_LEVELS,
+        default_combinations: Iterable[Combination] = (),
+        max_snapshots: int = DEFAULT_MAX_SNAPSHOTS,
+        max_combinations: int = DEFAULT_MAX_COMBINATIONS,
+        ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS
+    ):
+        """
+        Args:
+            compute: Solves one (snapshot, risk_level, chains, optimizer) entry
+            risk_levels: Risk levels precomputed for every combination
+            default_combinations: Combinations precomputed before any request asks
+            max_snapshots: Newest snapshot versions kept for precomputation
+            max_combinations: Most requested combinations precomputed per snapshot
+            ttl_seconds: Entry lifetime (bounds staleness if snapshots stop arriving)
+        """
+        self.compute = compute
+        self.risk_levels = tuple(risk_levels)
+        self.max_snapshots = max_snapshots
+        self.max_combinations = max_combinations
+
+        self._snapshots: "OrderedDict[str, Any]" = OrderedDict()
+        self._demand: Counter = Counter({
+            (chain_key(chains), optimizer): 0 for chains, optimizer in default_combinations
+        })
+        self._lock = threading.Lock()
+        self.entries = TTLCache(
+            maxsize=max_snapshots * max_combinations * len(self.risk_levels),
+            ttl_seconds=ttl_seconds
+        )
+        self.precomputed = 0
+
+    def observe(self, version: str, snapshot: Any, chains: Iterable[Any], optimizer: str):
+        """Record a request's snapshot and the combination it asked for"""
+        with self._lock:
+            if version in self._snapshots:
+                self._snapshots.move_to_end(version)
+            else:
+                self._snapshots[version] = snapshot
+                while len(self._snapshots) > self.max_snapshots:
+                    self._snapshots.popitem(last=False)
+            self._demand[(chain_key(chains), optimizer)] += 1
+
+    def lookup(self, version: str, risk_level: str, chains: Iterable[Any], optimizer: str) -> Optional[Any]:
+        """Return the precomputed value, or None if not (yet) available"""
+        return self.entries.get((version, risk_level, chain_key(chains), optimizer))
+
+    def pending(self) -> List[Tuple[FrontierKey, Any]]:
+        """Missing entries, newest snapshot and most requested combinations first"""
+        with self._lock:
+            snapshots = list(reversed(self._snapshots.items()))
+            combinations = [combo for combo, _ in self._demand.most_common(self.max_combinations)]
+
+        missing = []
+        for version, snapshot in snapshots:
+            for chains, optimizer in combinations:
+                for risk_level in self.risk_levels:
+                    key = (version, risk_level, chains, optimizer)
+                    if key not in self.entries:
+                        missing.append((key, snapshot))
+        return missing
+
+    def precompute(self, budget_seconds: float) -> int:
+        """
+        Fill missing entries until done or the time budget is spent
+
+        Args:
+            budget_seconds: Wall-time budget for this pass
+
+        Returns:
+            Number of entries computed
+        """
+        deadline = time.perf_counter() + budget_seconds
+        computed = 0
+        for key, snapshot in self.pending():
+            if time.perf_counter() >= deadline:
+                break
+            version, risk_level, chains, optimizer = key
+            try:
+                self.entries.set(key, self.compute(snapshot, risk_level, chains, optimizer))
+                computed += 1
+            except Exception as e:
+                logger.warning(f"⚠️  Frontier precompute failed for {risk_level}/{'+'.join(chains)}/{optimizer}: {e}")
+        self.precomputed += computed
+        return computed
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache metrics for logging"""
+        stats = self.entries.stats()
+        with self._lock:
+            stats["snapshots"] = len(self._snapshots)
+            stats["combinations"] = min(len(self._demand), self.max_combinations)
+        stats["precomputed"] = self.precomputed
+        return stats
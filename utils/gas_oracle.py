@@ -0,0 +1,433 @@
+"""
+YieldSwarm AI - Gas Price Oracle
+Background EIP-1559 fee estimation per chain, served from cache
+"""
+import asyncio
+import json
+import random
+import time
+import urllib.request
+from typing import List, Dict, Any, Iterable, Optional, Sequence
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_REFRESH_SECONDS = 12.0
+DEFAULT_MAX_AGE_SECONDS = 60.0
+DEFAULT_FALLBACK_COST = 0.01
+FEE_HISTORY_BLOCKS = 20
+
+# Priority fee percentiles requested from eth_feeHistory, one per speed
+PRIORITY_PERCENTILES = (10, 50, 90)
+SPEEDS = ("slow", "standard", "fast")
+
+# Gas units of a typical protocol interaction and the native token price in
+# ETH, used to turn fees (in 1e-9 native units: gwei, or lamports on
+# Solana) into ETH-equivalent costs
+CHAIN_FEE_PROFILES = {
+    "ethereum": {"gas_units": 150_000, "native_in_eth": 1.0},
+    "arbitrum": {"gas_units": 1_000_000, "native_in_eth": 1.0},  # includes L1 data gas
+    "polygon": {"gas_units": 150_000, "native_in_eth": 0.00015},
+    "bsc": {"gas_units": 150_000, "native_in_eth": 0.2},
+    "solana": {"gas_units": 1, "native_in_eth": 0.05}  # fees are per transaction
+}
+
+# Solana has no base fee market: 5000 lamports per signature plus a
+# priority fee in micro-lamports per compute unit
+SOLANA_SIGNATURE_FEE = 5000
+SOLANA_COMPUTE_UNITS = 200_000
+
+# (base fee, median priority fee) for the local stub, in 1e-9 native units
+STUB_FEES = {
+    "ethereum": (20.0, 1.5),
+    "arbitrum": (0.01, 0.0),
+    "polygon": (30.0, 30.0),
+    "bsc": (1.0, 0.0),
+    "solana": (SOLANA_SIGNATURE_FEE, 2000.0)
+}
+
+
+# ===== FEE SOURCES =====
+# A source implements:
+#   async fee_history(block_count, reward_percentiles) -> {
+#       "oldestBlock": int,
+#       "baseFeePerGas": [block_count + 1 floats, the last is the next block's],
+#       "gasUsedRatio": [block_count floats],
+#       "reward": [block_count lists, one value per percentile]
+#   }
+# with fees in 1e-9 native units (the shape of eth_feeHistory).
+
+class StubFeeSource:
+    """Local fee market for tests and simulation (EIP-1559 base fee updates)"""
+
+    def __init__(
+        self,
+        base_fee: float,
+        priority_fee: float,
+        eip1559: bool = True,
+        congestion: float = 0.5,
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            base_fee: Starting base fee
+            priority_fee: Median priority fee
+            eip1559: Whether the base fee follows block utilization
+            congestion: Mean block utilization (0.5 keeps the base fee flat)
+            seed: Random seed
+        """
+        self.base_fee = base_fee
+        self.priority_fee = priority_fee
+        self.eip1559 = eip1559
+        self.congestion = congestion
+        self._rng = random.Random(seed)
+        self._block = 0
+        self.calls = 0
+
+    def _mine(self) -> Dict[str, Any]:
+        self._block += 1
+        ratio = min(1.0, max(0.0, self._rng.gauss(self.congestion, 0.15)))
+        tips = sorted(self.priority_fee * self._rng.lognormvariate(0.0, 0.6) for _ in range(50))
+        block = {"base_fee": self.base_fee, "ratio": ratio, "tips": tips}
+        if self.eip1559:
+            # Base fee moves up to 12.5% per block towards 50% utilization
+            self.base_fee *= 1 + 0.125 * (ratio - 0.5) / 0.5
+        return block
+
+    async def fee_history(self, block_count: int, reward_percentiles: Sequence[float]) -> Dict[str, Any]:
+        self.calls += 1
+        blocks = [self._mine() for _ in range(block_count)]
+        return {
+            "oldestBlock": self._block - block_count + 1,
+            "baseFeePerGas": [block["base_fee"] for block in blocks] + [self.base_fee],
+            "gasUsedRatio": [block["ratio"] for block in blocks],
+            "reward": [
+                [block["tips"][min(len(block["tips"]) - 1, int(p / 100 * len(block["tips"])))] for p in reward_percentiles]
+                for block in blocks
+            ]
+        }
+
+
+def _rpc_call(url: str, method: str, params: List[Any], timeout: float) -> Any:
+    payload = json.dumps({"jsonrpc": "2.0", "id": 1, "method": method, "params": params}).encode()
+    request = urllib.request.Request(url, data=payload, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        body = json.loads(response.read())
+    if "error" in body:
+        raise RuntimeError(f"{method}: {body['error']}")
+    return body["result"]
+
+
+class JsonRpcFeeSource:
+    """eth_feeHistory over JSON-RPC (EVM chains)"""
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+
+    async def fee_history(self, block_count: int, reward_percentiles: Sequence[float]) -> Dict[str, Any]:
+        result = await asyncio.to_thread(
+            _rpc_call, self.url, "eth_feeHistory", [hex(block_count), "latest", list(reward_percentiles)], self.timeout
+        )
+        gwei = lambda value: int(value, 16) / 1e9
+        return {
+            "oldestBlock": int(result["oldestBlock"], 16),
+            "baseFeePerGas": [gwei(fee) for fee in result["baseFeePerGas"]],
+            "gasUsedRatio": result["gasUsedRatio"],
+            "reward": [[gwei(fee) for fee in block] for block in result.get("reward", [])]
+        }
+
+
+class SolanaFeeSource:
+    """getRecentPrioritizationFees mapped onto the fee history shape (lamports per transaction)"""
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+
+    async def fee_history(self, block_count: int, reward_percentiles: Sequence[float]) -> Dict[str, Any]:
+        result = await asyncio.to_thread(_rpc_call, self.url, "getRecentPrioritizationFees", [], self.timeout)
+        recent = sorted(result, key=lambda entry: entry["slot"])[-block_count:]
+        fees = sorted(entry["prioritizationFee"] * SOLANA_COMPUTE_UNITS / 1e6 for entry in recent) or [0.0]
+        reward = [fees[min(len(fees) - 1, int(p / 100 * len(fees)))] for p in reward_percentiles]
+        return {
+            "oldestBlock": recent[0]["slot"] if recent else 0,
+            "baseFeePerGas": [float(SOLANA_SIGNATURE_FEE)] * (len(recent) + 1),
+            "gasUsedRatio": [0.5] * len(recent),
+            "reward": [reward] * len(recent)
+        }
+
+
+# ===== ORACLE =====
+
+class FeeEstimate:
+    """Fee estimate for one chain at one refresh"""
+
+    def __init__(
+        self,
+        chain: str,
+        base_fee: float,
+        priority_fees: Dict[str, float],
+        block: int,
+        gas_units: int,
+        native_in_eth: float
+    ):
+        self.chain = chain
+        self.base_fee = base_fee
+        self.priority_fees = priority_fees
+        self.block = block
+        self.gas_units = gas_units
+        self.native_in_eth = native_in_eth
+        self.updated_at = time.monotonic()
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.updated_at
+
+    def max_fee(self, speed: str = "standard") -> float:
+        """maxFeePerGas that survives two full blocks of base fee increases"""
+        return 2 * self.base_fee + self.priority_fees[speed]
+
+    def cost(self, speed: str = "standard", gas_units: Optional[int] = None) -> float:
+        """Expected transaction cost in ETH equivalent"""
+        units = self.gas_units if gas_units is None else gas_units
+        return units * (self.base_fee + self.priority_fees[speed]) * 1e-9 * self.native_in_eth
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "chain": self.chain,
+            "base_fee": self.base_fee,
+            "priority_fees": dict(self.priority_fees),
+            "block": self.block,
+            "cost": self.cost(),
+            "age": self.age
+        }
+
+
+def _median(values: List[float]) -> float:
+    values = sorted(values)
+    mid = len(values) // 2
+    return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+
+
+class GasOracle:
+    """
+    Per-chain fee estimates refreshed in the background
+
+    refresh() pulls fee history from every source concurrently and replaces
+    each chain's estimate; reads (estimate, gas_cost) are dictionary lookups.
+    Estimates older than max_age_seconds are not served: gas_cost() falls
+    back to the static cost for that chain instead.
+    """
+
+    def __init__(
+        self,
+        sources: Dict[str, Any],
+        fallback_costs: Optional[Dict[str, float]] = None,
+        refresh_seconds: float = DEFAULT_REFRESH_SECONDS,
+        max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS,
+        history_blocks: int = FEE_HISTORY_BLOCKS,
+        profiles: Optional[Dict[str, Dict[str, float]]] = None
+    ):
+        """
+        Args:
+            sources: Chain name -> fee source
+            fallback_costs: Chain -> ETH cost served when no fresh estimate exists
+            refresh_seconds: Interval of the run() loop
+            max_age_seconds: Oldest estimate still served
+            history_blocks: Blocks of fee history per refresh
+            profiles: Chain -> gas_units and native_in_eth (defaults to CHAIN_FEE_PROFILES)
+        """
+        self.sources = sources
+        self.fallback_costs = {_chain_name(chain): cost for chain, cost in (fallback_costs or {}).items()}
+        self.refresh_seconds = refresh_seconds
+        self.max_age_seconds = max_age_seconds
+        self.history_blocks = history_blocks
+        self.profiles = profiles or CHAIN_FEE_PROFILES
+
+        self._estimates: Dict[str, FeeEstimate] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.failures = 0
+        self.fallbacks = 0
+
+    # ===== READS =====
+
+    def estimate(self, chain: Any) -> Optional[FeeEstimate]:
+        """Latest estimate for a chain, or None if missing or stale"""
+        estimate = self._estimates.get(_chain_name(chain))
+        if estimate is None or estimate.age > self.max_age_seconds:
+            return None
+        return estimate
+
+    def gas_cost(self, chain: Any, speed: str = "standard") -> float:
+        """Transaction cost in ETH equivalent (static fallback when stale)"""
+        estimate = self.estimate(chain)
+        if estimate is not None:
+            return estimate.cost(speed)
+        self.fallbacks += 1
+        return self.fallback_costs.get(_chain_name(chain), DEFAULT_FALLBACK_COST)
+
+    def fee_params(self, chain: Any, speed: str = "standard") -> Dict[str, float]:
+        """EIP-1559 transaction fee fields in gwei (empty when stale)"""
+        estimate = self.estimate(chain)
+        if estimate is None:
+            return {}
+        return {"maxFeePerGas": estimate.max_fee(speed), "maxPriorityFeePerGas": estimate.priority_fees[speed]}
+
+    # ===== REFRESH =====
+
+    async def refresh(self, chains: Optional[Iterable[str]] = None) -> int:
+        """
+        Refresh estimates from the sources
+
+        Args:
+            chains: Chains to refresh (default: all)
+
+        Returns:
+            Number of chains refreshed; failed chains keep their last estimate
+        """
+        chains = list(chains) if chains is not None else list(self.sources)
+        results = await asyncio.gather(*(self._refresh_chain(chain) for chain in chains), return_exceptions=True)
+        refreshed = 0
+        for chain, result in zip(chains, results):
+            if isinstance(result, Exception):
+                self.failures += 1
+                logger.warning(f"⚠️  Gas oracle refresh failed for {chain}: {result}")
+            else:
+                refreshed += 1
+        self.refreshes += 1
+        return refreshed
+
+    async def _refresh_chain(self, chain: str):
+        history = await self.sources[chain].fee_history(self.history_blocks, PRIORITY_PERCENTILES)
+        rewards = [block for block in history["reward"] if block]
+        if rewards:
+            priority_fees = {
+                speed: _median([block[i] for block in rewards])
+                for i, speed in enumerate(SPEEDS)
+            }
+        else:
+            priority_fees = {speed: 0.0 for speed in SPEEDS}
+
+        profile = self.profiles.get(chain, {"gas_units": 150_000, "native_in_eth": 1.0})
+        self._estimates[chain] = FeeEstimate(
+            chain=chain,
+            base_fee=history["baseFeePerGas"][-1],
+            priority_fees=priority_fees,
+            block=history["oldestBlock"] + len(history["gasUsedRatio"]),
+            gas_units=profile["gas_units"],
+            native_in_eth=profile["native_in_eth"]
+        )
+
+    async def run(self):
+        """Refresh forever (run as a background task)"""
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self) -> asyncio.Task:
+        """Start the background refresh loop on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Oracle metrics for logging"""
+        return {
+            "fresh": sum(1 for chain in self._estimates if self.estimate(chain) is not None),
+            "chains": len(self.sources),
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "fallbacks": self.fallbacks
+        }
+
+
+def _chain_name(chain: Any) -> str:
+    return str(getattr(chain, "value", chain)).lower()
+
+
+def create_stub_sources(seed: Optional[int] = None, **kwargs: Any) -> Dict[str, StubFeeSource]:
+    """One StubFeeSource per chain with typical fee levels"""
+    return {
+        chain: StubFeeSource(base, priority, eip1559=chain != "solana", seed=None if seed is None else seed + i, **kwargs)
+        for i, (chain, (base, priority)) in enumerate(STUB_FEES.items())
+    }
+
+
+def create_rpc_sources(endpoints: Dict[str, str], timeout: float = 5.0) -> Dict[str, Any]:
+    """
+    Live fee sources from per-chain RPC endpoints
+
+    Args:
+        endpoints: Chain name -> RPC URL; chains with an empty URL are skipped
+        timeout: Per-request timeout in seconds
+
+    Returns:
+        SolanaFeeSource for "solana", JsonRpcFeeSource for every other chain
+    """
+    sources: Dict[str, Any] = {}
+    for chain, url in endpoints.items():
+        name = _chain_name(chain)
+        if not url:
+            logger.warning(f"No RPC endpoint for {name}; gas costs there use the fallback")
+            continue
+        source_class = SolanaFeeSource if name == "solana" else JsonRpcFeeSource
+        sources[name] = source_class(url, timeout=timeout)
+    return sources
+
+
+def test_gas_oracle():
+    """Smoke test: stub refresh, congestion, constant-time reads and staleness fallback"""
+    fallback = {"ethereum": 0.015, "polygon": 0.0001, "arbitrum": 0.0008, "bsc": 0.0002, "solana": 0.00001}
+
+    async def run():
+        sources = create_stub_sources(seed=5)
+        oracle = GasOracle(sources, fallback_costs=fallback, max_age_seconds=0.2)
+        await oracle.refresh()
+        calm = oracle.gas_cost("ethereum")
+
+        sources["ethereum"].congestion = 1.0
+        await oracle.refresh(["ethereum"])
+        congested = oracle.gas_cost("ethereum")
+
+        start = time.perf_counter()
+        for _ in range(100000):
+            oracle.gas_cost("ethereum")
+        read_us = (time.perf_counter() - start) / 100000 * 1e6
+
+        await asyncio.sleep(0.25)
+        stale = oracle.gas_cost("ethereum")
+        return oracle, calm, congested, read_us, stale
+
+    print("=" * 60)
+    print("⛽ Testing Gas Oracle")
+    print("=" * 60)
+
+    oracle, calm, congested, read_us, stale = asyncio.run(run())
+    for chain in ("polygon", "arbitrum", "bsc", "solana"):
+        estimate = oracle._estimates[chain]
+        print(f"   {chain:9s} base {estimate.base_fee:10.3f}  tip p50 {estimate.priority_fees['standard']:8.3f}  "
+              f"cost {estimate.cost():.8f} ETH")
+    print(f"   Ethereum: {calm:.5f} ETH calm, {congested:.5f} ETH congested, {stale:.5f} ETH stale fallback")
+    print(f"   Read: {read_us:.2f} µs per estimate")
+
+    assert congested > calm
+    assert stale == fallback["ethereum"]
+    assert oracle.fee_params("ethereum") == {}
+
+    print("\n✅ All tests passed!")
+
+
+if __name__ == "__main__":
+    test_gas_oracle()
@@ -3,10 +3,15 @@ YieldSwarm AI - MeTTa Knowledge Engine
 Wrapper for hyperon MeTTa with DeFi-specific queries
 """
 import os
+import sys
 from typing import List, Dict, Any, Optional
 from hyperon import MeTTa
 import logging
 
+# Repository root on the path so `python utils/metta_engine.py` can import utils/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.protocol_registry import get_registry
+
 logger = logging.getLogger(__name__)
 
 
@@ -28,6 +33,9 @@ class DeFiMeTTaEngine:
         self.kb_path = kb_path
         self.loaded = False
 
+        # Indexed protocol facts, memory-mapped and shared with the MeTTa agent
+        self.registry = get_registry(kb_path)
+
         # Load knowledge base
         self._load_knowledge_base()
 
@@ -106,177 +114,8 @@ class DeFiMeTTaEngine:
         Returns:
             List of all protocol details
         """
-        # Known protocols from the knowledge base
-        protocol_defs = {
-            "Aave-V3": {
-                "chains": ["Ethereum", "Polygon", "Arbitrum"],
-                "type": "Lending",
-                "risk_score": 2.5,
-                "historical_apy": 4.2,
-                "tvl": 5000000000,
-                "security_rating": "High"
-            },
-            "Uniswap-V3": {
-                "chains": ["Ethereum", "Polygon", "Arbitrum"],
-                "type": "DEX",
-                "risk_score": 3.5,
-                "historical_apy": 12.5,
-                "tvl": 3200000000,
-                "security_rating": "High"
-            },
-            "Curve": {
-                "chains": ["Ethereum", "Polygon"],
-                "type": "DEX-Stablecoin",
-                "risk_score": 2.1,
-                "historical_apy": 6.8,
-                "tvl": 2800000000,
-                "security_rating": "High"
-            },
-            "Compound-V3": {
-                "chains": ["Ethereum", "Polygon", "Arbitrum"],
-                "type": "Lending",
-                "risk_score": 2.8,
-                "historical_apy": 3.9,
-                "tvl": 2100000000,
-                "security_rating": "High"
-            },
-            "Raydium": {
-                "chains": ["Solana"],
-                "type": "DEX",
-                "risk_score": 6.0,
-                "historical_apy": 18.5,
-                "tvl": 450000000,
-                "security_rating": "Medium"
-            },
-            "Solend": {
-                "chains": ["Solana"],
-                "type": "Lending",
-                "risk_score": 5.5,
-                "historical_apy": 8.2,
-                "tvl": 280000000,
-                "security_rating": "Medium"
-            },
-            "PancakeSwap": {
-                "chains": ["BSC"],
-                "type": "DEX",
-                "risk_score": 5.0,
-                "historical_apy": 15.2,
-                "tvl": 1200000000,
-                "security_rating": "Medium"
-            },
-            "Venus": {
-                "chains": ["BSC"],
-                "type": "Lending",
-                "risk_score": 4.8,
-                "historical_apy": 6.5,
-                "tvl": 680000000,
-                "security_rating": "Medium"
-            },
-            "GMX": {
-                "chains": ["Arbitrum"],
-                "type": "Perpetuals",
-                "risk_score": 5.5,
-                "historical_apy": 16.0,
-                "tvl": 420000000,
-                "security_rating": "Medium"
-            },
-            "Balancer": {
-                "chains": ["Ethereum", "Polygon", "Arbitrum"],
-                "type": "DEX-Weighted",
-                "risk_score": 3.8,
-                "historical_apy": 9.5,
-                "tvl": 980000000,
-                "security_rating": "High"
-            },
-            "QuickSwap": {
-                "chains": ["Polygon"],
-                "type": "DEX",
-                "risk_score": 4.0,
-                "historical_apy": 9.75,
-                "tvl": 350000000,
-                "security_rating": "Medium"
-            },
-            "Yearn-Finance": {
-                "chains": ["Ethereum", "Polygon", "Arbitrum"],
-                "type": "Yield-Aggregator",
-                "risk_score": 3.2,
-                "historical_apy": 7.8,
-                "tvl": 1500000000,
-                "security_rating": "High"
-            },
-            "Convex": {
-                "chains": ["Ethereum"],
-                "type": "Yield-Booster",
-                "risk_score": 3.5,
-                "historical_apy": 8.5,
-                "tvl": 2300000000,
-                "security_rating": "High"
-            },
-            "MakerDAO": {
-                "chains": ["Ethereum"],
-                "type": "Lending-Stablecoin",
-                "risk_score": 2.0,
-                "historical_apy": 3.5,
-                "tvl": 6800000000,
-                "security_rating": "High"
-            },
-            "Lido": {
-                "chains": ["Ethereum", "Polygon", "Solana"],
-                "type": "Liquid-Staking",
-                "risk_score": 2.3,
-                "historical_apy": 4.5,
-                "tvl": 14000000000,
-                "security_rating": "High"
-            },
-            "Rocket-Pool": {
-                "chains": ["Ethereum"],
-                "type": "Liquid-Staking",
-                "risk_score": 2.6,
-                "historical_apy": 4.2,
-                "tvl": 2100000000,
-                "security_rating": "High"
-            },
-            "Stargate": {
-                "chains": ["Ethereum", "Polygon", "Arbitrum", "BSC"],
-                "type": "Bridge-Liquidity",
-                "risk_score": 4.5,
-                "historical_apy": 11.5,
-                "tvl": 680000000,
-                "security_rating": "Medium"
-            },
-            "Frax": {
-                "chains": ["Ethereum", "Polygon", "Arbitrum"],
-                "type": "Stablecoin-Lending",
-                "risk_score": 3.0,
-                "historical_apy": 5.5,
-                "tvl": 1100000000,
-                "security_rating": "High"
-            },
-            "Trader-Joe": {
-                "chains": ["Arbitrum"],
-                "type": "DEX",
-                "risk_score": 4.8,
-                "historical_apy": 13.5,
-                "tvl": 420000000,
-                "security_rating": "Medium"
-            },
-            "Synapse": {
-                "chains": ["Ethereum", "Polygon", "Arbitrum", "BSC"],
-                "type": "Bridge-Yield",
-                "risk_score": 5.2,
-                "historical_apy": 14.0,
-                "tvl": 380000000,
-                "security_rating": "Medium"
-            },
-            "Beefy": {
-                "chains": ["Polygon", "BSC", "Arbitrum"],
-                "type": "Yield-Optimizer",
-                "risk_score": 4.2,
-                "historical_apy": 10.5,
-                "tvl": 550000000,
-                "security_rating": "Medium"
-            }
-        }
+        # Protocol definitions come from the compiled registry of the same .metta file
+        protocol_defs = self.registry.as_dict()
 
         protocols = []
         for name, data in protocol_defs.items():
@@ -567,7 +406,7 @@ class DeFiMeTTaEngine:
         return {
             "loaded": self.loaded,
             "kb_path": self.kb_path,
-            "protocols_defined": 22,  # Updated count (11 original + 11 new)
+            "protocols_defined": len(self.registry.as_dict()),
             "chains_supported": 5,
             "query_types": [
                 "best_protocols",
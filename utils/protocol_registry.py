@@ -0,0 +1,285 @@
+"""
+YieldSwarm AI - Compiled Protocol Registry
+Precompiles metta_kb/defi_protocols.metta into memory-mappable arrays
+"""
+import os
+import re
+import tempfile
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_KB_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "metta_kb",
+    "defi_protocols.metta"
+)
+
+# Canonical chain order (matches the Chain enum); bit i of a protocol's
+# chain mask is set when the protocol is deployed on CHAINS[i]
+CHAINS = ("ethereum", "solana", "bsc", "polygon", "arbitrum")
+CHAIN_INDEX = {chain: i for i, chain in enumerate(CHAINS)}
+
+GAS_ACTIONS = ("deposit", "swap", "withdraw")
+
+PROTOCOL_DTYPE = np.dtype([
+    ("name", "U32"),
+    ("type", "U32"),
+    ("chain_mask", "u1"),
+    ("risk_score", "f8"),
+    ("historical_apy", "f8"),
+    ("tvl", "f8"),
+    ("audited", "?"),
+    ("security_rating", "U16"),
+    ("impermanent_loss", "U16"),
+])
+
+CHAIN_DTYPE = np.dtype([
+    ("name", "U16"),
+    ("display_name", "U16"),
+    ("chain_risk", "f8"),
+    ("gas_deposit", "f8"),
+    ("gas_swap", "f8"),
+    ("gas_withdraw", "f8"),
+])
+
+_PROTOCOL_BLOCK = re.compile(r"\(=\s*\(Protocol\s+([\w-]+)\)(.*?)\)\s*\n\s*\n", re.S)
+_ATTRIBUTE = re.compile(r"\(([\w-]+)\s+([^()]*?)\)")
+_CHAIN_RISK = re.compile(r"\(=\s*\(Chain-Risk\s+(\w+)\)\s+([\d.]+)\)")
+_GAS_COST = re.compile(r"\(=\s*\((\w+)-Gas\s+\$Protocol\s+(\w+)\)\s+([\d.]+)\)")
+
+
+def parse_metta_kb(text: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parse protocol, chain-risk and gas facts out of a .metta knowledge base
+
+    Args:
+        text: Contents of the .metta file
+
+    Returns:
+        (protocols, chains) structured arrays using PROTOCOL_DTYPE / CHAIN_DTYPE
+    """
+    display_names: Dict[str, str] = {}
+    protocol_rows = []
+
+    for name, body in _PROTOCOL_BLOCK.findall(text):
+        attrs = {key: value.split() for key, value in _ATTRIBUTE.findall(body)}
+
+        chain_mask = 0
+        for chain in attrs.get("Chains", []):
+            key = chain.lower()
+            if key not in CHAIN_INDEX:
+                raise ValueError(f"Unknown chain '{chain}' for protocol {name}")
+            display_names[key] = chain
+            chain_mask |= 1 << CHAIN_INDEX[key]
+
+        protocol_rows.append((
+            name,
+            attrs["Type"][0],
+            chain_mask,
+            float(attrs["Risk-Score"][0]),
+            float(attrs["Historical-APY"][0]),
+            float(attrs["TVL"][0]),
+            attrs.get("Smart-Contract-Audited", ["False"])[0] == "True",
+            attrs.get("Security-Rating", ["Unknown"])[0],
+            attrs.get("Impermanent-Loss-Risk", ["Unknown"])[0],
+        ))
+
+    if not protocol_rows:
+        raise ValueError("No (Protocol ...) definitions found in knowledge base")
+
+    chain_risk = {chain.lower(): float(value) for chain, value in _CHAIN_RISK.findall(text)}
+    for chain, _ in _CHAIN_RISK.findall(text):
+        display_names.setdefault(chain.lower(), chain)
+
+    gas = {(chain.lower(), action): float(value) for chain, action, value in _GAS_COST.findall(text)}
+
+    chain_rows = [
+        (
+            chain,
+            display_names.get(chain, chain.capitalize()),
+            chain_risk.get(chain, 1.0),
+            *(gas.get((chain, action), 0.01) for action in GAS_ACTIONS),
+        )
+        for chain in CHAINS
+    ]
+
+    return np.array(protocol_rows, dtype=PROTOCOL_DTYPE), np.array(chain_rows, dtype=CHAIN_DTYPE)
+
+
+def _artifact_paths(kb_path: str) -> Tuple[str, str]:
+    """Compiled artifact paths that sit next to the .metta source"""
+    stem, _ = os.path.splitext(kb_path)
+    return f"{stem}.protocols.npy", f"{stem}.chains.npy"
+
+
+def _atomic_save(path: str, array: np.ndarray):
+    """Write an .npy file via rename so concurrent readers never see a partial file"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, array, allow_pickle=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def compile_registry(kb_path: str = DEFAULT_KB_PATH) -> Tuple[str, str]:
+    """
+    Compile a .metta knowledge base into the registry artifacts
+
+    Args:
+        kb_path: Path to .metta knowledge base file
+
+    Returns:
+        Paths of the written (protocols, chains) .npy files
+    """
+    with open(kb_path, "r") as f:
+        protocols, chains = parse_metta_kb(f.read())
+
+    protocols_path, chains_path = _artifact_paths(kb_path)
+    _atomic_save(protocols_path, protocols)
+    _atomic_save(chains_path, chains)
+
+    logger.info(f"✅ Compiled protocol registry: {len(protocols)} protocols from {kb_path}")
+    return protocols_path, chains_path
+
+
+def _is_stale(kb_path: str) -> bool:
+    source_mtime = os.path.getmtime(kb_path)
+    for path in _artifact_paths(kb_path):
+        if not os.path.exists(path) or os.path.getmtime(path) < source_mtime:
+            return True
+    return False
+
+
+class ProtocolRegistry:
+    """
+    Read-only, indexed view over the compiled protocol knowledge base
+
+    The backing arrays are memory-mapped, so every worker process on a host
+    shares the same physical pages through the OS page cache.
+    """
+
+    def __init__(self, protocols: np.ndarray, chains: np.ndarray):
+        """
+        Args:
+            protocols: Structured array with PROTOCOL_DTYPE
+            chains: Structured array with CHAIN_DTYPE, in CHAINS order
+        """
+        self.protocols = protocols
+        self.chains = chains
+        self.index: Dict[str, int] = {str(name): i for i, name in enumerate(protocols["name"])}
+
+    def __len__(self) -> int:
+        return len(self.protocols)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.index
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.index)
+
+    @property
+    def chain_risk_vector(self) -> np.ndarray:
+        """Chain-Risk multipliers aligned with CHAINS"""
+        return self.chains["chain_risk"]
+
+    def protocol_chains(self, name: str) -> List[str]:
+        """Display names of the chains a protocol is deployed on"""
+        mask = int(self.protocols["chain_mask"][self.index[name]])
+        return [
+            str(self.chains["display_name"][i])
+            for i in range(len(CHAINS))
+            if mask & (1 << i)
+        ]
+
+    def supports(self, name: str, chain: str) -> bool:
+        """Check whether a protocol is deployed on a chain"""
+        row = self.index.get(name)
+        if row is None or chain.lower() not in CHAIN_INDEX:
+            return False
+        return bool(int(self.protocols["chain_mask"][row]) & (1 << CHAIN_INDEX[chain.lower()]))
+
+    def chain_risk(self, chain: str) -> float:
+        """Chain-Risk multiplier from the knowledge base (1.0 if unknown)"""
+        i = CHAIN_INDEX.get(chain.lower())
+        return float(self.chains["chain_risk"][i]) if i is not None else 1.0
+
+    def gas_cost(self, chain: str, action: str = "deposit") -> float:
+        """Gas cost in ETH equivalent for an action on a chain"""
+        i = CHAIN_INDEX.get(chain.lower())
+        if i is None or action not in GAS_ACTIONS:
+            return 0.01
+        return float(self.chains[f"gas_{action}"][i])
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a protocol in the PROTOCOL_KNOWLEDGE_BASE dict shape
+
+        Args:
+            name: Protocol name (e.g., Aave-V3)
+
+        Returns:
+            Protocol details or None if unknown
+        """
+        row = self.index.get(name)
+        if row is None:
+            return None
+
+        record = self.protocols[row]
+        return {
+            "chains": self.protocol_chains(name),
+            "type": str(record["type"]),
+            "risk_score": float(record["risk_score"]),
+            "historical_apy": float(record["historical_apy"]),
+            "tvl": float(record["tvl"]),
+            "security_rating": str(record["security_rating"]),
+            "impermanent_loss": str(record["impermanent_loss"])
+        }
+
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        """All protocols keyed by name"""
+        return {name: self.get(name) for name in self.index}
+
+
+def load_registry(kb_path: str = DEFAULT_KB_PATH) -> ProtocolRegistry:
+    """
+    Load the compiled registry, recompiling first if the .metta file changed
+
+    Args:
+        kb_path: Path to .metta knowledge base file
+
+    Returns:
+        ProtocolRegistry backed by read-only memory maps
+    """
+    if _is_stale(kb_path):
+        compile_registry(kb_path)
+
+    protocols_path, chains_path = _artifact_paths(kb_path)
+    return ProtocolRegistry(
+        np.load(protocols_path, mmap_mode="r", allow_pickle=False),
+        np.load(chains_path, mmap_mode="r", allow_pickle=False)
+    )
+
+
+@lru_cache(maxsize=None)
+def get_registry(kb_path: str = DEFAULT_KB_PATH) -> ProtocolRegistry:
+    """Process-wide registry instance (loaded once per kb_path)"""
+    return load_registry(kb_path)
+
+
+if __name__ == "__main__":
+    protocols_path, chains_path = compile_registry()
+    registry = load_registry()
+    print(f"✅ Compiled {len(registry)} protocols")
+    print(f"   {protocols_path}")
+    print(f"   {chains_path}")
@@ -0,0 +1,339 @@
+"""
+YieldSwarm AI - Incremental Rebalancer
+Minimal gas-aware moves from current holdings to a target allocation
+"""
+from typing import List, Dict, Any, Callable, Optional, Sequence, Tuple
+import logging
+
+from utils.protocol_registry import get_registry
+from utils.result_cache import TTLCache, stable_hash
+
+logger = logging.getLogger(__name__)
+
+
+# ===== DEFAULTS =====
+
+DRIFT_THRESHOLD = 0.05    # no moves until holdings drift 5% from target
+MIN_TRADE_SIZE = 0.01     # in portfolio currency
+MAX_GAS_FRACTION = 0.01   # skip a move whose gas exceeds 1% of its size
+
+REBALANCE_CACHE_SIZE = 4096
+REBALANCE_CACHE_TTL_SECONDS = 3600.0
+
+# Inputs are rounded before hashing so float noise does not defeat the cache
+_HASH_PRECISION = 9
+
+PositionKey = Tuple[str, str]
+
+
+def _chain_name(chain: Any) -> str:
+    return str(getattr(chain, "value", chain)).lower()
+
+
+def _registry_gas_cost(chain: str, action: str) -> float:
+    return get_registry().gas_cost(chain, action)
+
+
+class RebalanceMove:
+    """A single withdraw or deposit leg"""
+
+    def __init__(self, action: str, protocol: str, chain: str, amount: float, gas_cost: float):
+        self.action = action
+        self.protocol = protocol
+        self.chain = chain
+        self.amount = amount
+        self.gas_cost = gas_cost
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "action": self.action,
+            "protocol": self.protocol,
+            "chain": self.chain,
+            "amount": self.amount,
+            "gas_cost": self.gas_cost
+        }
+
+
+class RebalancePlan:
+    """Moves for one portfolio plus drift and cost statistics"""
+
+    def __init__(
+        self,
+        moves: List[RebalanceMove],
+        total_value: float,
+        drift_before: float,
+        drift_after: float,
+        skipped: int,
+        input_hash: str,
+        gas_checks: Optional[List[Tuple[str, str, float, bool]]] = None
+    ):
+        self.moves = moves
+        self.total_value = total_value
+        self.drift_before = drift_before
+        self.drift_after = drift_after
+        self.skipped = skipped
+        self.input_hash = input_hash
+        # (chain, action, largest acceptable gas, passed) per leg the gas check decided
+        self.gas_checks = gas_checks or []
+
+    @property
+    def gas_cost(self) -> float:
+        return sum(move.gas_cost for move in self.moves)
+
+    @property
+    def turnover(self) -> float:
+        """Amount deposited as a fraction of portfolio value"""
+        deposited = sum(move.amount for move in self.moves if move.action == "deposit")
+        return deposited / self.total_value if self.total_value > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "moves": [move.to_dict() for move in self.moves],
+            "total_value": self.total_value,
+            "drift_before": self.drift_before,
+            "drift_after": self.drift_after,
+            "turnover": self.turnover,
+            "gas_cost": self.gas_cost,
+            "skipped": self.skipped
+        }
+
+
+def _drift(current: Dict[PositionKey, float], target: Dict[PositionKey, float], total: float) -> float:
+    """Half the L1 distance between holdings and target, as a fraction of total"""
+    if total <= 0:
+        return 0.0
+    keys = set(current) | set(target)
+    return sum(abs(target.get(k, 0.0) - current.get(k, 0.0)) for k in keys) / 2 / total
+
+
+class Rebalancer:
+    """
+    Computes the smallest set of moves that brings holdings back within a
+    drift band of the target, skipping moves too small to be worth their gas
+
+    Plans are cached per portfolio and only recomputed when an input that
+    affects them (position values, target weights, cash, settings) changes,
+    or when live gas costs move far enough to flip a leg's gas check. Smaller
+    gas moves reuse the plan with its moves repriced at current gas.
+    """
+
+    def __init__(
+        self,
+        drift_threshold: float = DRIFT_THRESHOLD,
+        min_trade_size: float = MIN_TRADE_SIZE,
+        max_gas_fraction: float = MAX_GAS_FRACTION,
+        gas_cost: Callable[[str, str], float] = _registry_gas_cost,
+        cache_size: int = REBALANCE_CACHE_SIZE,
+        cache_ttl: Optional[float] = REBALANCE_CACHE_TTL_SECONDS
+    ):
+        """
+        Args:
+            drift_threshold: Rebalance only when drift exceeds this fraction;
+                moves are then added until drift is at most half of it
+            min_trade_size: Smallest move worth making (portfolio currency)
+            max_gas_fraction: Largest acceptable gas cost relative to move size
+            gas_cost: (chain, action) -> gas cost in portfolio currency
+            cache_size: Portfolios kept in the plan cache
+            cache_ttl: Plan lifetime in seconds
+        """
+        self.drift_threshold = drift_threshold
+        self.min_trade_size = min_trade_size
+        self.max_gas_fraction = max_gas_fraction
+        self.gas_cost = gas_cost
+        self.cache = TTLCache(maxsize=cache_size, ttl_seconds=cache_ttl)
+
+    def _input_hash(
+        self,
+        current: Dict[PositionKey, float],
+        target_weights: Dict[PositionKey, float],
+        cash: float
+    ) -> str:
+        # Live gas is left out: every fee tick would change the key.
+        # Cached plans are checked against current gas instead (_gas_decisions_hold)
+        return stable_hash({
+            "current": sorted((k, round(v, _HASH_PRECISION)) for k, v in current.items()),
+            "target": sorted((k, round(v, _HASH_PRECISION)) for k, v in target_weights.items()),
+            "cash": round(cash, _HASH_PRECISION),
+            "settings": [self.drift_threshold, self.min_trade_size, self.max_gas_fraction]
+        })
+
+    def rebalance(
+        self,
+        portfolio_id: str,
+        holdings: Sequence[Any],
+        targets: Sequence[Any],
+        cash: float = 0.0
+    ) -> Tuple[RebalancePlan, bool]:
+        """
+        Plan moves from holdings to targets, reusing the cached plan if unchanged
+
+        Args:
+            portfolio_id: Cache key (e.g., user_id)
+            holdings: Objects with protocol, chain and current_value (PositionDetail shape)
+            targets: Objects with protocol, chain and percentage (AllocationItem shape)
+            cash: Uninvested funds available for deposits
+
+        Returns:
+            (plan, cached) where cached is True if the plan came from the cache
+        """
+        current: Dict[PositionKey, float] = {}
+        for position in holdings:
+            key = (position.protocol, _chain_name(position.chain))
+            current[key] = current.get(key, 0.0) + position.current_value
+
+        target_weights: Dict[PositionKey, float] = {}
+        for allocation in targets:
+            key = (allocation.protocol, _chain_name(allocation.chain))
+            target_weights[key] = target_weights.get(key, 0.0) + allocation.percentage / 100
+
+        input_hash = self._input_hash(current, target_weights, cash)
+        cached = self.cache.get(portfolio_id)
+        if cached is not None and cached.input_hash == input_hash and self._gas_decisions_hold(cached):
+            return self._repriced(cached), True
+
+        plan = self._plan(current, target_weights, cash, input_hash)
+        self.cache.set(portfolio_id, plan)
+        return plan, False
+
+    def _gas_decisions_hold(self, plan: RebalancePlan) -> bool:
+        """Whether every leg's gas check would decide the same at current gas"""
+        return all(
+            (self.gas_cost(chain, action) <= limit) == passed
+            for chain, action, limit, passed in plan.gas_checks
+        )
+
+    def _repriced(self, plan: RebalancePlan) -> RebalancePlan:
+        """A cached plan with its moves' gas at current costs"""
+        moves = [
+            RebalanceMove(move.action, move.protocol, move.chain, move.amount, self.gas_cost(move.chain, move.action))
+            for move in plan.moves
+        ]
+        return RebalancePlan(
+            moves, plan.total_value, plan.drift_before, plan.drift_after, plan.skipped,
+            plan.input_hash, plan.gas_checks
+        )
+
+    def _plan(
+        self,
+        current: Dict[PositionKey, float],
+        target_weights: Dict[PositionKey, float],
+        cash: float,
+        input_hash: str
+    ) -> RebalancePlan:
+        total = sum(current.values()) + cash
+        target = {k: w * total for k, w in target_weights.items()}
+        drift_before = _drift(current, target, total)
+
+        if drift_before <= self.drift_threshold:
+            return RebalancePlan([], total, drift_before, drift_before, 0, input_hash)
+
+        # One leg per position that is off target, largest gap first
+        legs = []
+        gas_checks = []
+        skipped = 0
+        for key in set(current) | set(target):
+            delta = target.get(key, 0.0) - current.get(key, 0.0)
+            action = "deposit" if delta > 0 else "withdraw"
+            if abs(delta) < self.min_trade_size:
+                skipped += bool(delta)
+                continue
+            gas = self.gas_cost(key[1], action)
+            limit = self.max_gas_fraction * abs(delta)
+            gas_checks.append((key[1], action, limit, gas <= limit))
+            if gas > limit:
+                skipped += 1
+                continue
+            legs.append((abs(delta), key, action, gas))
+        legs.sort(key=lambda leg: (-leg[0], leg[1]))
+
+        # Add legs until the remaining gap is within half the drift band
+        band = self.drift_threshold / 2 * total
+        remaining = sum(abs(target.get(k, 0.0) - current.get(k, 0.0)) for k in set(current) | set(target)) / 2
+        chosen = []
+        for leg in legs:
+            if remaining <= band:
+                skipped += 1
+                continue
+            chosen.append(leg)
+            remaining -= leg[0] / 2
+
+        # Deposits can only use withdrawn funds plus cash
+        available = cash + sum(size for size, _, action, _ in chosen if action == "withdraw")
+        requested = sum(size for size, _, action, _ in chosen if action == "deposit")
+        scale = min(available / requested, 1.0) if requested > 0 else 0.0
+
+        moves = []
+        after = dict(current)
+        for size, key, action, gas in sorted(chosen, key=lambda leg: (leg[2] != "withdraw", -leg[0], leg[1])):
+            amount = size if action == "withdraw" else size * scale
+            if action == "deposit" and amount < self.min_trade_size:
+                skipped += 1
+                continue
+            moves.append(RebalanceMove(action, key[0], key[1], amount, gas))
+            after[key] = after.get(key, 0.0) + (amount if action == "deposit" else -amount)
+
+        return RebalancePlan(moves, total, drift_before, _drift(after, target, total), skipped, input_hash, gas_checks)
+
+    def invalidate(self, portfolio_id: str) -> bool:
+        """Drop a portfolio's cached plan (e.g., after its moves executed)"""
+        return self.cache.invalidate(portfolio_id)
+
+
+def test_rebalancer():
+    """Smoke test: rebalance a drifted portfolio and hit the cache"""
+    class Item:
+        def __init__(self, protocol, chain, current_value=0.0, percentage=0.0):
+            self.protocol = protocol
+            self.chain = chain
+            self.current_value = current_value
+            self.percentage = percentage
+
+    holdings = [
+        Item("Aave-V3", "ethereum", current_value=5.0),
+        Item("Curve", "polygon", current_value=3.0),
+        Item("Raydium", "solana", current_value=2.0),
+        Item("Lido", "ethereum", current_value=0.004),
+    ]
+    targets = [
+        Item("Aave-V3", "ethereum", percentage=35),
+        Item("Curve", "polygon", percentage=30),
+        Item("Raydium", "solana", percentage=20),
+        Item("Uniswap-V3", "arbitrum", percentage=15),
+    ]
+
+    print("=" * 60)
+    print("⚖️  Testing Rebalancer")
+    print("=" * 60)
+
+    rebalancer = Rebalancer()
+    plan, cached = rebalancer.rebalance("user-1", holdings, targets)
+    for move in plan.moves:
+        print(f"   {move.action:8s} {move.amount:7.3f} {move.protocol} ({move.chain})  gas {move.gas_cost}")
+    print(f"   Drift {plan.drift_before:.1%} -> {plan.drift_after:.1%}, skipped {plan.skipped}")
+    assert not cached and plan.drift_after <= rebalancer.drift_threshold
+
+    _, cached = rebalancer.rebalance("user-1", holdings, targets)
+    assert cached, "Unchanged inputs should hit the cache"
+
+    holdings[0].current_value = 4.0
+    _, cached = rebalancer.rebalance("user-1", holdings, targets)
+    assert not cached, "Changed holdings should recompute"
+
+    gas = {"arbitrum": 0.001}
+    repriced = Rebalancer(gas_cost=lambda chain, action: gas.get(chain, 0.001))
+    plan, _ = repriced.rebalance("user-1", holdings, targets)
+    assert any(move.chain == "arbitrum" for move in plan.moves)
+    gas["arbitrum"] = 0.002
+    plan, cached = repriced.rebalance("user-1", holdings, targets)
+    assert cached, "A fee tick that flips no gas check should reuse the plan"
+    assert [move.gas_cost for move in plan.moves if move.chain == "arbitrum"] == [0.002]
+    gas["arbitrum"] = 1.0
+    plan, cached = repriced.rebalance("user-1", holdings, targets)
+    assert not cached and not any(move.chain == "arbitrum" for move in plan.moves), \
+        "Gas that flips a leg's decision should recompute"
+
+    print("\n✅ All tests passed!")
+
+
+if __name__ == "__main__":
+    test_rebalancer()
@@ -0,0 +1,256 @@
+"""
+YieldSwarm AI - Result Cache
+Bounded LRU caches (TTL or event-invalidated), content hashing and hit-rate metrics
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+
+# Default for lookups that must tell a cached None from a miss
+_MISSING = object()
+
+
+def stable_hash(payload: Any) -> str:
+    """
+    Hash a JSON-serializable payload independently of dict ordering
+
+    Args:
+        payload: Normalized inputs (dicts, lists, strings, numbers)
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after a TTL
+
+    Least recently used entries are evicted once maxsize is reached.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl_seconds: Optional[float] = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+        on_evict: Optional[Callable[[Hashable], None]] = None
+    ):
+        """
+        Args:
+            maxsize: Maximum number of entries kept
+            ttl_seconds: Entry lifetime in seconds (None disables expiry)
+            clock: Monotonic time source (injectable for tests)
+            on_evict: Called with the key of each entry evicted for space
+                (from inside set(), with the cache's lock held)
+        """
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.on_evict = on_evict
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _fresh(self, stored_at: float) -> bool:
+        return self.ttl_seconds is None or self.clock() - stored_at < self.ttl_seconds
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Whether key holds an unexpired entry (does not touch LRU order or metrics)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and self._fresh(entry[0])
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value, or default on a miss or expired entry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if self._fresh(stored_at):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any):
+        """Insert or refresh an entry, evicting the least recently used if full"""
+        with self._lock:
+            self._entries[key] = (self.clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                evicted, _ = self._entries.popitem(last=False)
+                self.evictions += 1
+                if self.on_evict is not None:
+                    self.on_evict(evicted)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached value (None included) or compute, store and return it"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Hashable) -> bool:
+        """Drop a single entry; returns True if it was present"""
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache metrics for logging"""
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+
+class VersionedCache:
+    """
+    LRU cache invalidated by events on a scope (e.g. a user), not by time
+
+    invalidate(scope) deletes the scope's entries through a per-scope key
+    index, so nothing is kept for a scope once its entries are gone.
+    Callers read version() before computing a value and pass it to set(),
+    which refuses the value if its scope was invalidated meanwhile. Only
+    the last max_invalidations invalidations are remembered; older versions
+    are refused for every scope (a missed store, never a stale hit).
+    Staleness is tracked as the age of the entries served: with event
+    invalidation that is how long the data had gone unchanged, not how out
+    of date it is.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+        max_invalidations: Optional[int] = None
+    ):
+        """
+        Args:
+            maxsize: Maximum number of entries kept (across all scopes)
+            clock: Monotonic time source (injectable for tests)
+            max_invalidations: Recent invalidations remembered for set()
+                (default: maxsize)
+        """
+        self.clock = clock
+        self.max_invalidations = max_invalidations or maxsize
+        self._cache = TTLCache(maxsize=maxsize, ttl_seconds=None, clock=clock, on_evict=self._forget)
+        # scope -> keys it has cached
+        self._keys: Dict[Hashable, Set[Hashable]] = {}
+        # scope -> version at its last invalidation, oldest first
+        self._invalidated: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._version = 0
+        # Assumed last invalidation of scopes no longer in _invalidated
+        self._floor = 0
+        self._lock = threading.Lock()
+
+        self.invalidations = 0
+        self.refused_sets = 0
+        self.served_age_total = 0.0
+        self.served_age_max = 0.0
+
+    def version(self) -> int:
+        """Version to pass to set() for a value computed from data read after this call"""
+        return self._version
+
+    def get(self, scope: Hashable, key: Hashable, default: Any = None) -> Any:
+        """Return the value cached for key in the scope, or default"""
+        entry = self._cache.get((scope, key))
+        if entry is None:
+            return default
+        built_at, value = entry
+        age = self.clock() - built_at
+        with self._lock:
+            self.served_age_total += age
+            self.served_age_max = max(self.served_age_max, age)
+        return value
+
+    def set(self, scope: Hashable, key: Hashable, value: Any, version: Optional[int] = None) -> bool:
+        """
+        Store a value unless its scope was invalidated after version was read
+
+        Args:
+            scope: Invalidation scope
+            key: Entry key within the scope
+            value: Value to cache
+            version: version() read before the value was computed (default: now)
+
+        Returns:
+            Whether the value was stored
+        """
+        with self._lock:
+            if version is not None and self._invalidated.get(scope, self._floor) > version:
+                self.refused_sets += 1
+                return False
+            self._cache.set((scope, key), (self.clock(), value))
+            self._keys.setdefault(scope, set()).add(key)
+            return True
+
+    def invalidate(self, scope: Hashable):
+        """Drop every entry of a scope (its data changed)"""
+        with self._lock:
+            self._version += 1
+            self._invalidated[scope] = self._version
+            self._invalidated.move_to_end(scope)
+            while len(self._invalidated) > self.max_invalidations:
+                _, version = self._invalidated.popitem(last=False)
+                self._floor = max(self._floor, version)
+            for key in self._keys.pop(scope, ()):
+                self._cache.invalidate((scope, key))
+            self.invalidations += 1
+
+    def _forget(self, entry_key: Tuple[Hashable, Hashable]):
+        # Called by the LRU while set() holds self._lock
+        scope, key = entry_key
+        keys = self._keys.get(scope)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys[scope]
+
+    @property
+    def hit_rate(self) -> float:
+        return self._cache.hit_rate
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache metrics for logging, including the age of served entries"""
+        stats = self._cache.stats()
+        stats.update({
+            "scopes": len(self._keys),
+            "invalidations": self.invalidations,
+            "refused_sets": self.refused_sets,
+            "mean_served_age_seconds": self.served_age_total / stats["hits"] if stats["hits"] else 0.0,
+            "max_served_age_seconds": self.served_age_max
+        })
+        return stats
@@ -0,0 +1,213 @@
+"""
+YieldSwarm AI - Vectorized Opportunity Scoring
+Declarative scoring policies evaluated as NumPy array expressions
+"""
+from typing import List, Dict, Any, Callable, Optional, Sequence
+import logging
+
+import numpy as np
+
+from utils.protocol_registry import CHAIN_INDEX, get_registry
+
+logger = logging.getLogger(__name__)
+
+
+class OpportunityArrays:
+    """
+    Column-oriented view of a list of opportunities
+
+    Built once per request so every scoring policy runs on flat float arrays
+    instead of iterating pydantic objects.
+    """
+
+    def __init__(
+        self,
+        protocols: List[str],
+        apy: np.ndarray,
+        risk: np.ndarray,
+        tvl: np.ndarray,
+        chain_idx: np.ndarray
+    ):
+        self.protocols = protocols
+        self.apy = apy
+        self.risk = risk
+        self.tvl = tvl
+        self.chain_idx = chain_idx
+
+    def __len__(self) -> int:
+        return len(self.protocols)
+
+    @classmethod
+    def from_opportunities(cls, opportunities: Sequence[Any]) -> "OpportunityArrays":
+        """
+        Args:
+            opportunities: Objects with protocol, chain, apy, tvl and risk_score attributes
+
+        Returns:
+            OpportunityArrays with one row per opportunity
+
+        Raises:
+            ValueError: An opportunity is on a chain outside CHAINS
+        """
+        n = len(opportunities)
+        chains = [getattr(opp.chain, "value", opp.chain) for opp in opportunities]
+        unknown = sorted({str(chain) for chain in chains if chain not in CHAIN_INDEX})
+        if unknown:
+            raise ValueError(f"Unknown chain(s) {', '.join(unknown)}; expected one of {', '.join(CHAIN_INDEX)}")
+        return cls(
+            protocols=[opp.protocol for opp in opportunities],
+            apy=np.fromiter((opp.apy for opp in opportunities), dtype=np.float64, count=n),
+            risk=np.fromiter((opp.risk_score for opp in opportunities), dtype=np.float64, count=n),
+            tvl=np.fromiter((opp.tvl for opp in opportunities), dtype=np.float64, count=n),
+            chain_idx=np.fromiter((CHAIN_INDEX[chain] for chain in chains), dtype=np.int8, count=n)
+        )
+
+
+# ===== FEATURE EXPRESSIONS =====
+# Each feature maps (arrays, chain_risk, policy) -> one score column.
+# chain_risk is the per-row Chain-Risk multiplier (all ones if disabled).
+
+FeatureFn = Callable[[OpportunityArrays, np.ndarray, Dict[str, Any]], np.ndarray]
+
+
+def _effective_risk(arrays: OpportunityArrays, chain_risk: np.ndarray, policy: Dict[str, Any]) -> np.ndarray:
+    return np.maximum(arrays.risk * chain_risk, policy.get("risk_floor", 1.0))
+
+
+FEATURES: Dict[str, FeatureFn] = {
+    # Raw yield
+    "apy": lambda a, cr, p: a.apy,
+    # Yield per unit of (chain-adjusted) risk
+    "risk_adjusted_apy": lambda a, cr, p: a.apy / _effective_risk(a, cr, p),
+    # TVL depth on a log scale: $1M -> 0.0, $10B -> 1.0
+    "tvl_safety": lambda a, cr, p: np.clip((np.log10(np.maximum(a.tvl, 1.0)) - 6.0) / 4.0, 0.0, 1.0),
+    # Penalty that grows with chain-adjusted risk
+    "risk_penalty": lambda a, cr, p: -(a.risk * cr),
+}
+
+
+def register_feature(name: str, fn: FeatureFn):
+    """Register a custom feature expression for use in scoring policies"""
+    FEATURES[name] = fn
+
+
+# ===== SCORING POLICIES =====
+# max_risk mirrors the Good-For-Risk rules in defi_protocols.metta;
+# use_chain_risk applies the KB's Chain-Risk multipliers to risk scores, for
+# both the features and the max_risk cap.
+
+SCORING_POLICIES: Dict[str, Dict[str, Any]] = {
+    "conservative": {
+        "max_risk": 3.0,
+        "risk_floor": 0.5,
+        "use_chain_risk": True,
+        "weights": {"risk_adjusted_apy": 1.0, "tvl_safety": 1.0}
+    },
+    "moderate": {
+        "max_risk": 5.0,
+        "risk_floor": 1.0,
+        "use_chain_risk": True,
+        "weights": {"risk_adjusted_apy": 1.0, "tvl_safety": 0.5}
+    },
+    "aggressive": {
+        "max_risk": 8.0,
+        "risk_floor": 1.0,
+        "use_chain_risk": False,
+        "weights": {"apy": 1.0}
+    }
+}
+
+
+class ScoringEngine:
+    """
+    Evaluates scoring policies over OpportunityArrays and selects the top-K
+    """
+
+    def __init__(
+        self,
+        policies: Optional[Dict[str, Dict[str, Any]]] = None,
+        chain_risk: Optional[np.ndarray] = None,
+        default_policy: str = "moderate"
+    ):
+        """
+        Args:
+            policies: Policy definitions keyed by risk level (defaults to SCORING_POLICIES)
+            chain_risk: Chain-Risk multipliers aligned with CHAINS (defaults to the registry)
+            default_policy: Policy used for unknown risk levels
+        """
+        self.policies = policies if policies is not None else SCORING_POLICIES
+        self.chain_risk = (
+            np.asarray(chain_risk, dtype=np.float64) if chain_risk is not None
+            else np.array(get_registry().chain_risk_vector, dtype=np.float64)
+        )
+        self.default_policy = default_policy
+
+    def policy(self, risk_level: str) -> Dict[str, Any]:
+        return self.policies.get(risk_level, self.policies[self.default_policy])
+
+    def _row_chain_risk(self, arrays: OpportunityArrays, policy: Dict[str, Any]) -> np.ndarray:
+        """Per-row Chain-Risk multiplier under a policy (all ones if the policy disables it)"""
+        if policy.get("use_chain_risk", False):
+            return self.chain_risk[arrays.chain_idx]
+        return np.ones(len(arrays))
+
+    def adjusted_risk(self, arrays: OpportunityArrays, risk_level: str) -> np.ndarray:
+        """Risk as the policy sees it: chain-adjusted when the policy uses Chain-Risk"""
+        return arrays.risk * self._row_chain_risk(arrays, self.policy(risk_level))
+
+    def score(self, arrays: OpportunityArrays, risk_level: str) -> np.ndarray:
+        """
+        Score every opportunity under a policy (ignores the risk cap)
+
+        Returns:
+            Float array of scores, one per opportunity
+        """
+        policy = self.policy(risk_level)
+        chain_risk = self._row_chain_risk(arrays, policy)
+
+        scores = np.zeros(len(arrays))
+        for feature, weight in policy["weights"].items():
+            if weight:
+                scores += weight * FEATURES[feature](arrays, chain_risk, policy)
+        return scores
+
+    def eligible(self, arrays: OpportunityArrays, risk_level: str) -> np.ndarray:
+        """Boolean mask of opportunities whose adjusted risk is within the policy's risk cap"""
+        return self.adjusted_risk(arrays, risk_level) <= self.policy(risk_level).get("max_risk", np.inf)
+
+    def select(
+        self,
+        arrays: OpportunityArrays,
+        risk_level: str,
+        k: int = 4,
+        min_candidates: int = 2
+    ) -> np.ndarray:
+        """
+        Select the indices of the top-K opportunities, best first
+
+        Args:
+            arrays: Opportunities to rank
+            risk_level: conservative, moderate, or aggressive
+            k: Number of opportunities to select
+            min_candidates: If fewer than this pass the risk cap, rank all opportunities
+
+        Returns:
+            Integer index array of length min(k, candidates)
+        """
+        if k <= 0 or len(arrays) == 0:
+            return np.empty(0, dtype=np.intp)
+
+        scores = self.score(arrays, risk_level)
+        mask = self.eligible(arrays, risk_level)
+        if mask.sum() < min_candidates:
+            mask = np.ones(len(arrays), dtype=bool)
+
+        candidates = np.flatnonzero(mask)
+        if len(candidates) > k:
+            part = np.argpartition(-scores[candidates], k - 1)[:k]
+            candidates = candidates[part]
+
+        # Highest score first, lower (adjusted) risk breaks ties
+        risk = self.adjusted_risk(arrays, risk_level)
+        order = np.lexsort((risk[candidates], -scores[candidates]))
+        return candidates[order]
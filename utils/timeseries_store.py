@@ -0,0 +1,358 @@
+"""
+YieldSwarm AI - Time Series Store
+Columnar value history in memory-mapped segment files with minute/hour/day rollups
+"""
+import json
+import os
+import re
+import shutil
+import time
+from typing import List, Dict, Any, Optional, Tuple
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+# Rows per segment file (512 KB per float64 column)
+SEGMENT_ROWS = 65536
+
+# Resolution name -> bucket seconds, finest first ("raw" keeps every tick)
+ROLLUPS = (("minute", 60), ("hour", 3600), ("day", 86400))
+RAW_COLUMNS = ("ts", "value")
+ROLLUP_COLUMNS = ("ts", "min", "max", "last", "sum", "count")
+
+DEFAULT_MAX_POINTS = 500
+
+
+class _Level:
+    """One resolution of one series: column segments plus an append buffer"""
+
+    def __init__(self, directory: str, name: str, columns: Tuple[str, ...], rows: int):
+        self.directory = directory
+        self.name = name
+        self.columns = columns
+        self.rows = rows
+        self.buffer: Dict[str, List[float]] = {column: [] for column in columns}
+        # First timestamp of every segment (segment lookups without opening files)
+        self.segment_starts: List[float] = []
+
+    def _path(self, segment: int, column: str) -> str:
+        return os.path.join(self.directory, f"{self.name}.{segment:05d}.{column}.f8")
+
+    def _open(self, segment: int, column: str, mode: str) -> np.memmap:
+        path = self._path(segment, column)
+        if mode == "r+" and not os.path.exists(path):
+            with open(path, "wb") as f:
+                f.truncate(SEGMENT_ROWS * 8)
+        return np.memmap(path, dtype=np.float64, mode=mode, shape=(SEGMENT_ROWS,))
+
+    def load_index(self):
+        segments = (self.rows + SEGMENT_ROWS - 1) // SEGMENT_ROWS
+        self.segment_starts = [float(self._open(s, "ts", "r")[0]) for s in range(segments)]
+
+    def append(self, row: Dict[str, float]):
+        for column in self.columns:
+            self.buffer[column].append(row[column])
+
+    def flush(self) -> int:
+        pending = len(self.buffer["ts"])
+        written = 0
+        while written < pending:
+            segment, offset = divmod(self.rows, SEGMENT_ROWS)
+            count = min(pending - written, SEGMENT_ROWS - offset)
+            for column in self.columns:
+                mapped = self._open(segment, column, "r+")
+                mapped[offset:offset + count] = self.buffer[column][written:written + count]
+                mapped.flush()
+            if offset == 0:
+                self.segment_starts.append(self.buffer["ts"][written])
+            self.rows += count
+            written += count
+        for column in self.columns:
+            self.buffer[column].clear()
+        return pending
+
+    def read(self, start: float, end: float, columns: Tuple[str, ...]) -> Tuple[Dict[str, np.ndarray], int]:
+        """
+        Rows with start <= ts <= end, flushed and buffered
+
+        Returns:
+            (column -> array, bytes read from segment files)
+        """
+        parts: Dict[str, List[np.ndarray]] = {column: [] for column in columns}
+        bytes_read = 0
+        first = max(0, int(np.searchsorted(self.segment_starts, start, side="right")) - 1)
+        last = int(np.searchsorted(self.segment_starts, end, side="right"))
+        for segment in range(first, last):
+            used = min(SEGMENT_ROWS, self.rows - segment * SEGMENT_ROWS)
+            ts = self._open(segment, "ts", "r")[:used]
+            lo = int(np.searchsorted(ts, start, side="left"))
+            hi = int(np.searchsorted(ts, end, side="right"))
+            # Binary search touches about log2(rows) timestamps, then the range itself
+            bytes_read += 8 * (2 * int(np.log2(max(used, 2))) + (hi - lo) * len(columns))
+            for column in columns:
+                data = ts if column == "ts" else self._open(segment, column, "r")[:used]
+                parts[column].append(np.array(data[lo:hi]))
+
+        buffered = np.array(self.buffer["ts"], dtype=np.float64)
+        mask = (buffered >= start) & (buffered <= end)
+        for column in columns:
+            parts[column].append(np.array(self.buffer[column], dtype=np.float64)[mask])
+        return {column: np.concatenate(parts[column]) for column in columns}, bytes_read
+
+
+class _Series:
+    """Raw ticks and rollups of one series"""
+
+    def __init__(self, directory: str, meta: Dict[str, Any]):
+        self.directory = directory
+        self.last_ts: Optional[float] = meta.get("last_ts")
+        rows = meta.get("rows", {})
+        self.levels: Dict[str, _Level] = {"raw": _Level(directory, "raw", RAW_COLUMNS, rows.get("raw", 0))}
+        for name, _ in ROLLUPS:
+            self.levels[name] = _Level(directory, name, ROLLUP_COLUMNS, rows.get(name, 0))
+        for level in self.levels.values():
+            level.load_index()
+        # Rollup bucket still accumulating, per resolution
+        self.open_buckets: Dict[str, Dict[str, float]] = meta.get("open_buckets", {})
+
+    def append(self, ts: float, value: float):
+        self.levels["raw"].append({"ts": ts, "value": value})
+        for name, seconds in ROLLUPS:
+            bucket_ts = ts - ts % seconds
+            bucket = self.open_buckets.get(name)
+            if bucket is not None and bucket["ts"] != bucket_ts:
+                self.levels[name].append(bucket)
+                bucket = None
+            if bucket is None:
+                self.open_buckets[name] = {"ts": bucket_ts, "min": value, "max": value, "last": value, "sum": value, "count": 1.0}
+            else:
+                bucket["min"] = min(bucket["min"], value)
+                bucket["max"] = max(bucket["max"], value)
+                bucket["last"] = value
+                bucket["sum"] += value
+                bucket["count"] += 1
+        self.last_ts = ts
+
+    def meta(self) -> Dict[str, Any]:
+        return {
+            "last_ts": self.last_ts,
+            "rows": {name: level.rows for name, level in self.levels.items()},
+            "open_buckets": self.open_buckets
+        }
+
+
+class TimeSeriesStore:
+    """
+    Value history of positions and portfolios
+
+    Every series (e.g. "portfolio/<user_id>", "position/<id>") is a
+    directory of column files: float64 segments of SEGMENT_ROWS rows that
+    are memory-mapped for reading and writing. Appends go to an in-memory
+    buffer and are written on flush(). Alongside the raw ticks each series
+    keeps minute, hour and day rollups (min, max, last, sum and count per
+    bucket), updated as ticks arrive.
+
+    history() reads the finest resolution that yields at most max_points
+    over the range, locating rows by binary search over segment start
+    times and timestamps, so a year at daily resolution reads a few
+    kilobytes however many raw ticks were recorded.
+    """
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root: Directory holding one subdirectory per series
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._series: Dict[str, _Series] = {}
+        self._dirty: set = set()
+        self.bytes_read = 0
+
+    def _directory(self, key: str) -> str:
+        return os.path.join(self.root, re.sub(r"[^A-Za-z0-9_.-]", "_", key))
+
+    def _get(self, key: str, create: bool = False) -> Optional[_Series]:
+        series = self._series.get(key)
+        if series is not None:
+            return series
+        directory = self._directory(key)
+        meta_path = os.path.join(directory, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+        elif create:
+            os.makedirs(directory, exist_ok=True)
+            meta = {}
+        else:
+            return None
+        series = self._series[key] = _Series(directory, meta)
+        return series
+
+    def append(self, key: str, value: float, ts: Optional[float] = None):
+        """
+        Record a value
+
+        Args:
+            key: Series name
+            value: Value at ts
+            ts: Unix timestamp (defaults to now); must not precede the series' last tick
+
+        Raises:
+            ValueError: ts is older than the last tick of the series
+        """
+        ts = time.time() if ts is None else ts
+        series = self._get(key, create=True)
+        if series.last_ts is not None and ts < series.last_ts:
+            raise ValueError(f"{key}: tick at {ts} precedes last tick at {series.last_ts}")
+        series.append(ts, value)
+        self._dirty.add(key)
+
+    def delete(self, key: str):
+        """Drop a series and its files (no-op if it does not exist)"""
+        self._series.pop(key, None)
+        self._dirty.discard(key)
+        shutil.rmtree(self._directory(key), ignore_errors=True)
+
+    def flush(self) -> int:
+        """
+        Write buffered ticks and closed rollup buckets to the segment files
+
+        Returns:
+            Rows written
+        """
+        written = 0
+        for key in self._dirty:
+            series = self._series[key]
+            for level in series.levels.values():
+                written += level.flush()
+            tmp_path = os.path.join(series.directory, "meta.json.tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(series.meta(), f)
+            os.replace(tmp_path, os.path.join(series.directory, "meta.json"))
+        self._dirty.clear()
+        return written
+
+    def history(
+        self,
+        key: str,
+        start: float,
+        end: Optional[float] = None,
+        max_points: int = DEFAULT_MAX_POINTS,
+        resolution: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Values of a series over a time range
+
+        Args:
+            key: Series name
+            start: Range start (unix seconds)
+            end: Range end (defaults to now)
+            max_points: Most points wanted; picks the resolution
+            resolution: Force raw, minute, hour or day
+
+        Returns:
+            resolution, and equal-length lists ts, value (last in bucket),
+            min and max; empty lists for an unknown series
+        """
+        end = time.time() if end is None else end
+        if resolution is None:
+            resolution = "raw"
+            span = max(end - start, 0.0)
+            for name, seconds in ROLLUPS:
+                if span / seconds <= max_points:
+                    resolution = name
+                    break
+            else:
+                resolution = ROLLUPS[-1][0]
+            if resolution == "minute" and self._raw_count(key, start, end) <= max_points:
+                resolution = "raw"
+
+        series = self._get(key)
+        if series is None:
+            return {"resolution": resolution, "ts": [], "value": [], "min": [], "max": []}
+
+        level = series.levels[resolution]
+        if resolution == "raw":
+            columns, bytes_read = level.read(start, end, RAW_COLUMNS)
+            values = columns["value"]
+            result = {"ts": columns["ts"], "value": values, "min": values, "max": values}
+        else:
+            columns, bytes_read = level.read(start, end, ("ts", "min", "max", "last"))
+            result = {"ts": columns["ts"], "value": columns["last"], "min": columns["min"], "max": columns["max"]}
+            bucket = series.open_buckets.get(resolution)
+            if bucket is not None and start <= bucket["ts"] <= end:
+                for column, source in (("ts", "ts"), ("value", "last"), ("min", "min"), ("max", "max")):
+                    result[column] = np.append(result[column], bucket[source])
+        self.bytes_read += bytes_read
+        return {"resolution": resolution, "bytes_read": bytes_read, **{k: v.tolist() for k, v in result.items()}}
+
+    def _raw_count(self, key: str, start: float, end: float) -> int:
+        """Raw ticks in a range, from the minute rollup's counts"""
+        series = self._get(key)
+        if series is None:
+            return 0
+        columns, bytes_read = series.levels["minute"].read(start, end, ("count",))
+        self.bytes_read += bytes_read
+        bucket = series.open_buckets.get("minute")
+        pending = bucket["count"] if bucket is not None and start <= bucket["ts"] <= end else 0
+        return int(columns["count"].sum() + pending)
+
+    def stats(self) -> Dict[str, Any]:
+        """Store metrics for logging"""
+        return {
+            "series": len(self._series),
+            "raw_rows": sum(series.levels["raw"].rows for series in self._series.values()),
+            "bytes_read": self.bytes_read
+        }
+
+
+def test_timeseries_store():
+    """Smoke test: a year of one-minute ticks, then history queries at each resolution"""
+    import tempfile
+
+    root = tempfile.mkdtemp()
+    year = 365 * 86400
+    start_ts = 1_700_000_000.0 - 1_700_000_000.0 % 86400
+    ts = start_ts + np.arange(0, year, 60.0)
+    values = 10_000 * np.exp(np.cumsum(np.random.default_rng(4).normal(0, 0.0005, len(ts))))
+
+    print("=" * 60)
+    print("📈 Testing Time Series Store")
+    print("=" * 60)
+
+    store = TimeSeriesStore(root)
+    begin = time.perf_counter()
+    for t, v in zip(ts.tolist(), values.tolist()):
+        store.append("portfolio/user-1", v, t)
+    store.flush()
+    print(f"   Appended {len(ts):,} ticks in {time.perf_counter() - begin:.1f}s")
+
+    reopened = TimeSeriesStore(root)
+    end_ts = float(ts[-1])
+    for label, span in (("Year", year), ("Week", 7 * 86400), ("Hour", 3600)):
+        begin = time.perf_counter()
+        history = reopened.history("portfolio/user-1", end_ts - span, end_ts)
+        elapsed = time.perf_counter() - begin
+        print(f"   {label}: {len(history['ts'])} {history['resolution']} points, "
+              f"{history['bytes_read'] / 1024:.1f} KB read, {elapsed * 1000:.1f} ms")
+
+    yearly = reopened.history("portfolio/user-1", start_ts, end_ts)
+    assert yearly["resolution"] == "day" and len(yearly["ts"]) == 365
+    assert yearly["bytes_read"] < 16 * 1024
+    assert abs(yearly["value"][-1] - values[-1]) < 1e-9
+    day = (ts >= start_ts) & (ts < start_ts + 86400)
+    assert abs(yearly["max"][0] - values[day].max()) < 1e-9
+    assert reopened.history("portfolio/user-1", end_ts - 3600, end_ts)["resolution"] == "raw"
+    assert reopened.history("portfolio/missing", start_ts, end_ts)["ts"] == []
+    reopened.delete("portfolio/user-1")
+    assert TimeSeriesStore(root).history("portfolio/user-1", start_ts, end_ts)["ts"] == []
+
+    print("\n✅ All tests passed!")
+
+
+if __name__ == "__main__":
+    test_timeseries_store()
@@ -0,0 +1,450 @@
+"""
+YieldSwarm AI - Tracker Shards
+Users hashed across tracker worker processes behind an asyncio router
+"""
+import asyncio
+import hashlib
+import itertools
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+from typing import List, Dict, Any, AsyncIterator, Callable, Iterable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_REQUEST_TIMEOUT = 30.0
+DEFAULT_MAINTENANCE_INTERVAL = 1.0
+# Restart delay after a shard dies, doubled for each crash in a row
+RESTART_BACKOFF_SECONDS = 0.2
+MAX_RESTART_BACKOFF_SECONDS = 30.0
+# A worker that ran this long before dying restarts without backoff
+STABLE_UPTIME_SECONDS = 60.0
+STOP_TIMEOUT_SECONDS = 5.0
+
+
+class ShardUnavailable(Exception):
+    """The shard owning a user is down, restarting or not answering"""
+
+
+class ShardError(Exception):
+    """The shard's handler raised while serving a request"""
+
+
+def shard_for(user_id: str, shards: int) -> int:
+    """
+    Shard that owns a user
+
+    A stable digest rather than hash(), which is salted per process, so every
+    router and restart agrees on the placement.
+    """
+    digest = hashlib.blake2b(user_id.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shards
+
+
+# ===== WORKER PROCESS =====
+
+def _serve(
+    shard: int,
+    conn: Any,
+    handler: Callable[[int, Dict[str, Any]], Iterable[Any]],
+    initializer: Optional[Callable[[int], None]],
+    maintenance: Optional[Callable[[int], None]],
+    maintenance_interval: float
+):
+    """
+    Worker main loop: one request at a time, maintenance between requests
+
+    Every item the handler yields is sent as soon as it is produced, then a
+    done (or error) marker, so long responses stream without being built in
+    memory.
+    """
+    if initializer is not None:
+        initializer(shard)
+    next_maintenance = time.monotonic() + maintenance_interval
+
+    def run_maintenance():
+        try:
+            maintenance(shard)
+        except Exception as e:
+            logger.error(f"❌ Shard {shard} maintenance failed: {e}")
+
+    try:
+        while True:
+            timeout = max(0.0, next_maintenance - time.monotonic()) if maintenance is not None else None
+            if conn.poll(timeout):
+                message = conn.recv()
+                if message is None:
+                    break
+                request_id, payload = message
+                try:
+                    for item in handler(shard, payload):
+                        conn.send((request_id, "item", item))
+                    conn.send((request_id, "done", None))
+                except Exception as e:
+                    conn.send((request_id, "error", f"{type(e).__name__}: {e}"))
+            if maintenance is not None and time.monotonic() >= next_maintenance:
+                run_maintenance()
+                next_maintenance = time.monotonic() + maintenance_interval
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        if maintenance is not None:
+            run_maintenance()
+        conn.close()
+
+
+def _default_start_method(*callables: Optional[Callable]) -> Optional[str]:
+    """"spawn" if a fresh interpreter can import every callable, else "fork" where available"""
+    try:
+        for fn in callables:
+            if fn is not None:
+                pickle.dumps(fn)
+        return "spawn"
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return "fork" if "fork" in multiprocessing.get_all_start_methods() else None
+
+
+# ===== ROUTER =====
+
+class _Shard:
+    def __init__(self, index: int):
+        self.index = index
+        self.process: Optional[multiprocessing.process.BaseProcess] = None
+        self.conn: Optional[Any] = None
+        self.generation = 0
+        self.started_at = 0.0
+        self.crashes = 0
+        self.restarts = 0
+        self.requests = 0
+        self.inflight: Dict[int, asyncio.Queue] = {}
+
+
+class ShardRouter:
+    """
+    Routes per-user requests to worker processes that each own a slice of users
+
+    A user always maps to the same shard (shard_for), so each worker keeps
+    its users' state (store, caches, in-memory engines) to itself and
+    workers share nothing. A worker serves its requests one at a time;
+    throughput grows with the number of shards up to the number of cores.
+
+    Each shard has its own pipe and reader thread. When a worker dies, only
+    that shard's in-flight requests fail (ShardUnavailable) and only that
+    worker is restarted, after a backoff that grows while it keeps
+    crashing; the other shards carry on.
+
+    Workers are started with "spawn" so they never inherit the router's
+    threads or locks. "fork" is used only when the callables cannot be
+    re-imported by a fresh interpreter (e.g. an agent script loaded by file
+    path): a forked worker goes straight into _serve, touches none of the
+    parent's threads, event loop or open connections, and the logging
+    locks it shares are reset by CPython at fork.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[int, Dict[str, Any]], Iterable[Any]],
+        shards: int,
+        initializer: Optional[Callable[[int], None]] = None,
+        maintenance: Optional[Callable[[int], None]] = None,
+        maintenance_interval: float = DEFAULT_MAINTENANCE_INTERVAL,
+        request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+        start_method: Optional[str] = None
+    ):
+        """
+        Args:
+            handler: (shard, payload) -> items to send back; runs in the worker
+            shards: Worker processes
+            initializer: Called with the shard index when a worker starts
+            maintenance: Called with the shard index every maintenance_interval
+                seconds between requests, and on shutdown (flushes, ticks)
+            maintenance_interval: Seconds between maintenance calls
+            request_timeout: Seconds to wait for each item of a response
+            start_method: multiprocessing start method (default: "spawn" when
+                the callables pickle by reference, else "fork" where available)
+        """
+        if shards < 1:
+            raise ValueError("shards must be at least 1")
+        self.handler = handler
+        self.initializer = initializer
+        self.maintenance = maintenance
+        self.maintenance_interval = maintenance_interval
+        self.request_timeout = request_timeout
+        if start_method is None:
+            start_method = _default_start_method(handler, initializer, maintenance)
+        self._context = multiprocessing.get_context(start_method)
+        self.start_method = self._context.get_start_method()
+        self._shards = [_Shard(index) for index in range(shards)]
+        self._request_ids = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping = False
+
+    def __len__(self) -> int:
+        return len(self._shards)
+
+    async def start(self):
+        """Start every worker (call from the event loop that will send requests)"""
+        self._loop = asyncio.get_running_loop()
+        self._stopping = False
+        for shard in self._shards:
+            self._spawn(shard)
+
+    def _spawn(self, shard: _Shard):
+        parent, child = self._context.Pipe()
+        process = self._context.Process(
+            target=_serve,
+            args=(shard.index, child, self.handler, self.initializer, self.maintenance, self.maintenance_interval),
+            name=f"tracker-shard-{shard.index}",
+            daemon=True
+        )
+        process.start()
+        child.close()
+        shard.process, shard.conn = process, parent
+        shard.generation += 1
+        shard.started_at = time.monotonic()
+        threading.Thread(
+            target=self._read, args=(shard, parent, shard.generation),
+            name=f"tracker-shard-{shard.index}-reader", daemon=True
+        ).start()
+
+    def _read(self, shard: _Shard, conn: Any, generation: int):
+        """Reader thread: hand every reply to the event loop until the pipe closes"""
+        try:
+            while True:
+                request_id, kind, item = conn.recv()
+                self._loop.call_soon_threadsafe(self._deliver, shard, request_id, kind, item)
+        except (EOFError, OSError):
+            pass
+        try:
+            self._loop.call_soon_threadsafe(self._lost, shard, generation)
+        except RuntimeError:
+            # Event loop already closed
+            pass
+
+    def _deliver(self, shard: _Shard, request_id: int, kind: str, item: Any):
+        queue = shard.inflight.get(request_id)
+        if queue is not None:
+            queue.put_nowait((kind, item))
+
+    def _lost(self, shard: _Shard, generation: int):
+        """A worker's pipe closed: fail its requests and schedule a restart"""
+        if generation != shard.generation or shard.conn is None:
+            return
+        shard.conn.close()
+        shard.conn = None
+        exitcode = None
+        if shard.process is not None:
+            # The pipe closes as the process exits; reap it for the exit code
+            shard.process.join(timeout=0.05)
+            exitcode = shard.process.exitcode
+        for queue in shard.inflight.values():
+            queue.put_nowait(("lost", f"shard {shard.index} worker exited ({exitcode})"))
+        if self._stopping:
+            return
+
+        uptime = time.monotonic() - shard.started_at
+        shard.crashes = 0 if uptime >= STABLE_UPTIME_SECONDS else shard.crashes + 1
+        delay = min(MAX_RESTART_BACKOFF_SECONDS, RESTART_BACKOFF_SECONDS * 2 ** max(shard.crashes - 1, 0))
+        logger.warning(f"⚠️  Shard {shard.index} worker exited ({exitcode}), restarting in {delay:.1f}s")
+        self._loop.call_later(delay, self._restart, shard)
+
+    def _restart(self, shard: _Shard):
+        if self._stopping or shard.conn is not None:
+            return
+        shard.restarts += 1
+        self._spawn(shard)
+
+    async def request(self, user_id: str, payload: Dict[str, Any]) -> AsyncIterator[Any]:
+        """
+        Send a request to the user's shard and stream back what it yields
+
+        Args:
+            user_id: Routing key
+            payload: Picklable request (passed to the handler)
+
+        Yields:
+            Items yielded by the handler, in order
+
+        Raises:
+            ShardUnavailable: The shard is down, died mid-request or timed out
+            ShardError: The handler raised
+        """
+        shard = self._shards[shard_for(user_id, len(self._shards))]
+        async for item in self._request(shard, payload):
+            yield item
+
+    async def broadcast(self, payload: Dict[str, Any]) -> List[Optional[List[Any]]]:
+        """
+        Send the same request to every shard at once
+
+        Returns:
+            Per shard, the items its handler yielded (None if the shard was
+            unavailable or its handler raised; the error is logged)
+        """
+        async def collect(shard: _Shard) -> Optional[List[Any]]:
+            try:
+                return [item async for item in self._request(shard, payload)]
+            except (ShardUnavailable, ShardError) as e:
+                logger.warning(f"⚠️  Broadcast to shard {shard.index} failed: {e}")
+                return None
+
+        return list(await asyncio.gather(*(collect(shard) for shard in self._shards)))
+
+    async def _request(self, shard: _Shard, payload: Dict[str, Any]) -> AsyncIterator[Any]:
+        if shard.conn is None:
+            raise ShardUnavailable(f"shard {shard.index} is restarting")
+
+        request_id = next(self._request_ids)
+        queue: asyncio.Queue = asyncio.Queue()
+        shard.inflight[request_id] = queue
+        shard.requests += 1
+        try:
+            try:
+                shard.conn.send((request_id, payload))
+            except (OSError, ValueError) as e:
+                raise ShardUnavailable(f"shard {shard.index}: {e}")
+            while True:
+                try:
+                    kind, item = await asyncio.wait_for(queue.get(), self.request_timeout)
+                except asyncio.TimeoutError:
+                    raise ShardUnavailable(f"shard {shard.index} did not answer within {self.request_timeout:.0f}s")
+                if kind == "item":
+                    yield item
+                elif kind == "done":
+                    return
+                elif kind == "lost":
+                    raise ShardUnavailable(item)
+                else:
+                    raise ShardError(item)
+        finally:
+            shard.inflight.pop(request_id, None)
+
+    async def stop(self):
+        """Ask every worker to finish (running its last maintenance), then reap it"""
+        self._stopping = True
+        for shard in self._shards:
+            if shard.conn is not None:
+                try:
+                    shard.conn.send(None)
+                except OSError:
+                    pass
+        loop = asyncio.get_running_loop()
+        for shard in self._shards:
+            if shard.process is None:
+                continue
+            await loop.run_in_executor(None, shard.process.join, STOP_TIMEOUT_SECONDS)
+            if shard.process.is_alive():
+                shard.process.terminate()
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-shard metrics for logging"""
+        return {
+            "shards": [
+                {
+                    "shard": shard.index,
+                    "pid": shard.process.pid if shard.process is not None else None,
+                    "up": shard.conn is not None,
+                    "requests": shard.requests,
+                    "inflight": len(shard.inflight),
+                    "restarts": shard.restarts
+                }
+                for shard in self._shards
+            ],
+            "start_method": self.start_method
+        }
+
+
+def _test_handler(shard: int, payload: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+    """CPU-bound stand-in for report generation, streamed in parts"""
+    total = 0
+    for i in range(payload["work"]):
+        total += i * i
+    for part in range(payload.get("parts", 1)):
+        yield {"shard": shard, "pid": os.getpid(), "user_id": payload["user_id"], "part": part, "total": total}
+    if payload.get("fail"):
+        raise RuntimeError("handler failure")
+
+
+def test_tracker_shards():
+    """Smoke test: stable routing, streaming, throughput by shard count and a shard crash"""
+    import signal
+
+    n_users, work = 400, 20000
+    users = [f"user-{i}" for i in range(n_users)]
+    cores = os.cpu_count() or 1
+
+    async def throughput(shards: int) -> float:
+        router = ShardRouter(_test_handler, shards)
+        await router.start()
+
+        async def query(user_id: str) -> List[Dict[str, Any]]:
+            return [item async for item in router.request(user_id, {"user_id": user_id, "work": work})]
+
+        await asyncio.gather(*(query(user_id) for user_id in users[:len(router)]))
+        start = time.perf_counter()
+        results = await asyncio.gather(*(query(user_id) for user_id in users))
+        elapsed = time.perf_counter() - start
+        await router.stop()
+        assert all(result[0]["shard"] == shard_for(result[0]["user_id"], shards) for result in results)
+        return n_users / elapsed
+
+    async def crash():
+        router = ShardRouter(_test_handler, 4)
+        await router.start()
+        victim = shard_for(users[0], 4)
+        survivor = next(user_id for user_id in users if shard_for(user_id, 4) != victim)
+        streamed = [item async for item in router.request(users[0], {"user_id": users[0], "work": 10, "parts": 3})]
+        assert [item["part"] for item in streamed] == [0, 1, 2]
+        try:
+            [item async for item in router.request(users[0], {"user_id": users[0], "work": 10, "fail": True})]
+            raise AssertionError("handler error not raised")
+        except ShardError:
+            pass
+        replies = await router.broadcast({"user_id": "*", "work": 10})
+        assert sorted(reply[0]["shard"] for reply in replies) == [0, 1, 2, 3]
+        assert router.stats()["start_method"] == "spawn"
+
+        pid = router.stats()["shards"][victim]["pid"]
+        os.kill(pid, signal.SIGKILL)
+        await asyncio.sleep(0.05)
+        failed = False
+        try:
+            [item async for item in router.request(users[0], {"user_id": users[0], "work": 10})]
+        except ShardUnavailable:
+            failed = True
+        # Other shards are untouched while the victim restarts
+        other = [item async for item in router.request(survivor, {"user_id": survivor, "work": 10})]
+        await asyncio.sleep(RESTART_BACKOFF_SECONDS + 0.3)
+        back = [item async for item in router.request(users[0], {"user_id": users[0], "work": 10})]
+        stats = router.stats()
+        await router.stop()
+        return failed, other, back, pid, stats
+
+    print("=" * 60)
+    print("🗂️  Testing Tracker Shards")
+    print("=" * 60)
+
+    counts = [1, 2, 4]
+    rates = {shards: asyncio.run(throughput(shards)) for shards in counts}
+    for shards, rate in rates.items():
+        print(f"   {shards} shard(s): {rate:,.0f} requests/s ({rate / rates[1]:.2f}x)")
+    if cores >= 4:
+        assert rates[4] > 2.5 * rates[1]
+    else:
+        print(f"   ({cores} core(s): scaling not asserted)")
+
+    failed, other, back, pid, stats = asyncio.run(crash())
+    print(f"   Killed shard worker {pid}: request failed fast: {failed}, other shard served: {bool(other)}, "
+          f"restarted as {back[0]['pid']}")
+    assert failed and other and back[0]["pid"] != pid
+    assert sum(shard["restarts"] for shard in stats["shards"]) == 1
+
+    print("\n✅ All tests passed!")
+
+
+if __name__ == "__main__":
+    test_tracker_shards()
@@ -0,0 +1,531 @@
+"""
+YieldSwarm AI - Tracker Store
+SQLite (WAL) persistence for positions, tax lots, disposals and valuations
+"""
+import heapq
+import itertools
+import os
+import sqlite3
+import time
+from typing import List, Dict, Any, Iterator, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_BATCH_SIZE = 1000
+# Statements kept prepared per connection (sqlite3 caches by SQL text)
+STATEMENT_CACHE_SIZE = 64
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    # With WAL, NORMAL only risks the last transactions on power loss, never corruption
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA foreign_keys=OFF",
+)
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS positions (
+        id INTEGER PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        protocol TEXT NOT NULL,
+        chain TEXT NOT NULL,
+        amount REAL NOT NULL,
+        entry_value REAL NOT NULL,
+        current_value REAL NOT NULL,
+        current_apy REAL NOT NULL,
+        opened_at REAL NOT NULL,
+        closed_at REAL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_positions_open_user ON positions (user_id) WHERE closed_at IS NULL",
+    "CREATE INDEX IF NOT EXISTS idx_positions_market ON positions (protocol, chain) WHERE closed_at IS NULL",
+    """CREATE TABLE IF NOT EXISTS lots (
+        id INTEGER PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        position_id INTEGER NOT NULL,
+        protocol TEXT NOT NULL,
+        chain TEXT NOT NULL,
+        quantity REAL NOT NULL,
+        cost_basis REAL NOT NULL,
+        acquired_at REAL NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_lots_user ON lots (user_id, protocol, chain, acquired_at)",
+    "CREATE INDEX IF NOT EXISTS idx_lots_time ON lots (user_id, acquired_at, id)",
+    """CREATE TABLE IF NOT EXISTS disposals (
+        id INTEGER PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        position_id INTEGER NOT NULL,
+        protocol TEXT NOT NULL,
+        chain TEXT NOT NULL,
+        quantity REAL NOT NULL,
+        proceeds REAL NOT NULL,
+        disposed_at REAL NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_disposals_time ON disposals (user_id, disposed_at, id)",
+    """CREATE TABLE IF NOT EXISTS valuations (
+        position_id INTEGER NOT NULL,
+        ts REAL NOT NULL,
+        value REAL NOT NULL,
+        apy REAL NOT NULL,
+        PRIMARY KEY (position_id, ts)
+    ) WITHOUT ROWID""",
+    # Running totals over each user's open positions (apy_value is the
+    # sum of value * apy, so the value-weighted APY is apy_value / current_value)
+    """CREATE TABLE IF NOT EXISTS user_aggregates (
+        user_id TEXT PRIMARY KEY,
+        positions INTEGER NOT NULL,
+        entry_value REAL NOT NULL,
+        current_value REAL NOT NULL,
+        apy_value REAL NOT NULL
+    ) WITHOUT ROWID""",
+    # The triggers apply each position change as a delta: one primary key
+    # update per write, whoever writes
+    """CREATE TRIGGER IF NOT EXISTS aggregate_open AFTER INSERT ON positions WHEN NEW.closed_at IS NULL
+    BEGIN
+        INSERT INTO user_aggregates (user_id, positions, entry_value, current_value, apy_value)
+        VALUES (NEW.user_id, 1, NEW.entry_value, NEW.current_value, NEW.current_value * NEW.current_apy)
+        ON CONFLICT (user_id) DO UPDATE SET
+            positions = positions + 1,
+            entry_value = entry_value + excluded.entry_value,
+            current_value = current_value + excluded.current_value,
+            apy_value = apy_value + excluded.apy_value;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS aggregate_update
+    AFTER UPDATE OF entry_value, current_value, current_apy ON positions
+    WHEN OLD.closed_at IS NULL AND NEW.closed_at IS NULL
+    BEGIN
+        UPDATE user_aggregates SET
+            entry_value = entry_value + NEW.entry_value - OLD.entry_value,
+            current_value = current_value + NEW.current_value - OLD.current_value,
+            apy_value = apy_value + NEW.current_value * NEW.current_apy - OLD.current_value * OLD.current_apy
+        WHERE user_id = NEW.user_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS aggregate_close AFTER UPDATE OF closed_at ON positions
+    WHEN OLD.closed_at IS NULL AND NEW.closed_at IS NOT NULL
+    BEGIN
+        UPDATE user_aggregates SET
+            positions = positions - 1,
+            entry_value = entry_value - OLD.entry_value,
+            current_value = current_value - OLD.current_value,
+            apy_value = apy_value - OLD.current_value * OLD.current_apy
+        WHERE user_id = OLD.user_id;
+    END""",
+)
+
+POSITION_COLUMNS = "id, user_id, protocol, chain, amount, entry_value, current_value, current_apy, opened_at, closed_at"
+
+INSERT_POSITION = f"INSERT INTO positions ({POSITION_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+UPDATE_AMOUNT = "UPDATE positions SET amount = ?, entry_value = ? WHERE id = ?"
+UPDATE_VALUE = "UPDATE positions SET current_value = ?, current_apy = ? WHERE id = ?"
+CLOSE_POSITION = "UPDATE positions SET closed_at = ? WHERE id = ?"
+INSERT_LOT = "INSERT INTO lots (user_id, position_id, protocol, chain, quantity, cost_basis, acquired_at) VALUES (?, ?, ?, ?, ?, ?, ?)"
+INSERT_DISPOSAL = "INSERT INTO disposals (user_id, position_id, protocol, chain, quantity, proceeds, disposed_at) VALUES (?, ?, ?, ?, ?, ?, ?)"
+INSERT_VALUATION = "INSERT OR REPLACE INTO valuations (position_id, ts, value, apy) VALUES (?, ?, ?, ?)"
+
+SELECT_OPEN_POSITIONS = f"SELECT {POSITION_COLUMNS} FROM positions WHERE user_id = ? AND closed_at IS NULL ORDER BY id"
+SELECT_POSITION = f"SELECT {POSITION_COLUMNS} FROM positions WHERE id = ?"
+SELECT_ALL_OPEN_POSITIONS = f"SELECT {POSITION_COLUMNS} FROM positions WHERE closed_at IS NULL ORDER BY id"
+SELECT_MARKET_POSITIONS = f"SELECT {POSITION_COLUMNS} FROM positions WHERE protocol = ? AND chain = ? AND closed_at IS NULL"
+SELECT_LOTS = "SELECT id, user_id, position_id, protocol, chain, quantity, cost_basis, acquired_at FROM lots WHERE user_id = ? ORDER BY acquired_at, id"
+SELECT_VALUATIONS = "SELECT ts, value, apy FROM valuations WHERE position_id = ? AND ts >= ? AND ts <= ? ORDER BY ts"
+STREAM_ACQUISITIONS = "SELECT acquired_at, id, protocol, chain, quantity, cost_basis FROM lots WHERE user_id = ? ORDER BY acquired_at, id"
+STREAM_DISPOSALS = "SELECT disposed_at, id, protocol, chain, quantity, proceeds FROM disposals WHERE user_id = ? ORDER BY disposed_at, id"
+SELECT_AGGREGATE = "SELECT positions, entry_value, current_value, apy_value FROM user_aggregates WHERE user_id = ?"
+
+REBUILD_AGGREGATES = (
+    "DELETE FROM user_aggregates",
+    """INSERT INTO user_aggregates (user_id, positions, entry_value, current_value, apy_value)
+    SELECT user_id, COUNT(*), SUM(entry_value), SUM(current_value), SUM(current_value * current_apy)
+    FROM positions WHERE closed_at IS NULL GROUP BY user_id""",
+)
+
+# Buffered writes are applied in this order so rows exist before they are updated
+WRITE_ORDER = (INSERT_POSITION, UPDATE_AMOUNT, UPDATE_VALUE, CLOSE_POSITION, INSERT_LOT, INSERT_DISPOSAL, INSERT_VALUATION)
+SELECT_USER_POSITION_IDS = "SELECT id FROM positions WHERE user_id = ?"
+DELETE_USER = (
+    "DELETE FROM valuations WHERE position_id IN (SELECT id FROM positions WHERE user_id = ?)",
+    "DELETE FROM positions WHERE user_id = ?",
+    "DELETE FROM lots WHERE user_id = ?",
+    "DELETE FROM disposals WHERE user_id = ?",
+    "DELETE FROM user_aggregates WHERE user_id = ?",
+)
+
+# Rows fetched per round trip when streaming
+STREAM_FETCH_ROWS = 1000
+
+
+class TrackerStore:
+    """
+    Persistent performance tracker state
+
+    One SQLite database in WAL mode, so readers never block the writer and
+    commits append to the log instead of rewriting pages. Writes are
+    buffered per statement and applied with executemany in one transaction
+    when batch_size writes are pending, on flush(), or before any read (so
+    reads always see earlier writes). Position ids are assigned here rather
+    than by SQLite so an open position can be referenced before its insert
+    is flushed. Reads use partial indexes over open positions only.
+
+    Per-user totals (value, entry value, value-weighted APY) are kept in
+    user_aggregates by triggers, so aggregate() is a primary key lookup
+    however many positions a user holds.
+    """
+
+    def __init__(self, path: str, batch_size: int = DEFAULT_BATCH_SIZE):
+        """
+        Args:
+            path: Database file (":memory:" for a throwaway store)
+            batch_size: Pending writes that trigger a flush
+        """
+        self.path = path
+        self.batch_size = batch_size
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, cached_statements=STATEMENT_CACHE_SIZE, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            self._conn.execute(pragma)
+        for statement in SCHEMA:
+            self._conn.execute(statement)
+
+        self._pending: Dict[str, List[tuple]] = {sql: [] for sql in WRITE_ORDER}
+        self._pending_count = 0
+        self._next_position_id = (self._conn.execute("SELECT MAX(id) FROM positions").fetchone()[0] or 0) + 1
+        if self._next_position_id > 1 and self._conn.execute("SELECT 1 FROM user_aggregates LIMIT 1").fetchone() is None:
+            # Database written before aggregates existed
+            self.rebuild_aggregates()
+        self.flushes = 0
+        self.rows_written = 0
+
+    # ===== WRITES (buffered) =====
+
+    def _write(self, sql: str, params: tuple):
+        self._pending[sql].append(params)
+        self._pending_count += 1
+        if self._pending_count >= self.batch_size:
+            self.flush()
+
+    def open_position(
+        self,
+        user_id: str,
+        protocol: str,
+        chain: str,
+        amount: float,
+        entry_value: float,
+        current_apy: float = 0.0,
+        opened_at: Optional[float] = None
+    ) -> int:
+        """
+        Record a new position (valued at its entry value)
+
+        Returns:
+            Position id
+        """
+        position_id = self._next_position_id
+        self._next_position_id += 1
+        self._write(INSERT_POSITION, (
+            position_id, user_id, protocol, chain, amount, entry_value, entry_value, current_apy,
+            opened_at if opened_at is not None else time.time(), None
+        ))
+        return position_id
+
+    def resize_position(self, position_id: int, amount: float, entry_value: float):
+        """Set a position's size and cost after adding to or reducing it"""
+        self._write(UPDATE_AMOUNT, (amount, entry_value, position_id))
+
+    def close_position(self, position_id: int, closed_at: Optional[float] = None):
+        self._write(CLOSE_POSITION, (closed_at if closed_at is not None else time.time(), position_id))
+
+    def add_lot(
+        self,
+        user_id: str,
+        position_id: int,
+        protocol: str,
+        chain: str,
+        quantity: float,
+        cost_basis: float,
+        acquired_at: Optional[float] = None
+    ):
+        """Record an acquisition for tax-lot matching"""
+        self._write(INSERT_LOT, (
+            user_id, position_id, protocol, chain, quantity, cost_basis,
+            acquired_at if acquired_at is not None else time.time()
+        ))
+
+    def add_disposal(
+        self,
+        user_id: str,
+        position_id: int,
+        protocol: str,
+        chain: str,
+        quantity: float,
+        proceeds: float,
+        disposed_at: Optional[float] = None
+    ):
+        """Record a sale or withdrawal for tax-lot matching"""
+        self._write(INSERT_DISPOSAL, (
+            user_id, position_id, protocol, chain, quantity, proceeds,
+            disposed_at if disposed_at is not None else time.time()
+        ))
+
+    def record_valuation(self, position_id: int, value: float, apy: float, ts: Optional[float] = None):
+        """Set a position's current value and APY and keep the point in its history"""
+        self._write(UPDATE_VALUE, (value, apy, position_id))
+        self._write(INSERT_VALUATION, (position_id, ts if ts is not None else time.time(), value, apy))
+
+    def record_valuations(self, position_ids: List[int], values: List[float], apys: List[float], ts: Optional[float] = None):
+        """record_valuation for many positions at one timestamp (one buffer extend per statement)"""
+        ts = ts if ts is not None else time.time()
+        self._pending[UPDATE_VALUE].extend(zip(values, apys, position_ids))
+        self._pending[INSERT_VALUATION].extend(zip(position_ids, itertools.repeat(ts), values, apys))
+        self._pending_count += 2 * len(position_ids)
+        if self._pending_count >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Apply every buffered write in one transaction
+
+        Returns:
+            Rows written
+        """
+        if not self._pending_count:
+            return 0
+        written = self._pending_count
+        self._conn.execute("BEGIN")
+        try:
+            for sql in WRITE_ORDER:
+                rows = self._pending[sql]
+                if rows:
+                    self._conn.executemany(sql, rows)
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        for rows in self._pending.values():
+            rows.clear()
+        self._pending_count = 0
+        self.flushes += 1
+        self.rows_written += written
+        return written
+
+    def delete_user(self, user_id: str) -> List[int]:
+        """
+        Delete every position, lot, disposal and valuation of a user (e.g. demo data being replaced)
+
+        Returns:
+            Ids of the positions deleted
+        """
+        self.flush()
+        position_ids = [row[0] for row in self._conn.execute(SELECT_USER_POSITION_IDS, (user_id,))]
+        self._conn.execute("BEGIN")
+        try:
+            for sql in DELETE_USER:
+                self._conn.execute(sql, (user_id,))
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return position_ids
+
+    # ===== READS =====
+
+    def positions(self, user_id: str) -> List[Dict[str, Any]]:
+        """Open positions of a user"""
+        self.flush()
+        return [dict(row) for row in self._conn.execute(SELECT_OPEN_POSITIONS, (user_id,))]
+
+    def position(self, position_id: int) -> Optional[Dict[str, Any]]:
+        self.flush()
+        row = self._conn.execute(SELECT_POSITION, (position_id,)).fetchone()
+        return dict(row) if row else None
+
+    def iter_open_positions(self) -> Iterator[Dict[str, Any]]:
+        """Every user's open positions in id order, fetched STREAM_FETCH_ROWS at a time"""
+        self.flush()
+        cursor = self._conn.execute(SELECT_ALL_OPEN_POSITIONS)
+        while True:
+            batch = cursor.fetchmany(STREAM_FETCH_ROWS)
+            if not batch:
+                return
+            for row in batch:
+                yield dict(row)
+
+    def market_positions(self, protocol: str, chain: str) -> List[Dict[str, Any]]:
+        """Open positions of every user in one protocol on one chain"""
+        self.flush()
+        return [dict(row) for row in self._conn.execute(SELECT_MARKET_POSITIONS, (protocol, chain))]
+
+    def lots(self, user_id: str) -> List[Dict[str, Any]]:
+        """A user's acquisition lots, oldest first"""
+        self.flush()
+        return [dict(row) for row in self._conn.execute(SELECT_LOTS, (user_id,))]
+
+    def iter_tax_events(self, user_id: str) -> Iterator[Dict[str, Any]]:
+        """
+        Stream a user's acquisitions and disposals in time order
+
+        Both tables are read through their (user_id, time) indexes
+        STREAM_FETCH_ROWS rows at a time and merged lazily, so memory does not
+        grow with the history. File databases are read on a separate
+        connection whose read transaction pins a WAL snapshot, so writes made
+        while the stream is consumed do not affect it.
+
+        Yields:
+            {"ts", "kind" ("acquire" / "dispose"), "protocol", "chain", "quantity", "value"}
+        """
+        self.flush()
+        if self.path == ":memory:":
+            conn, owned = self._conn, False
+        else:
+            conn, owned = sqlite3.connect(f"file:{os.path.abspath(self.path)}?mode=ro", uri=True, isolation_level=None), True
+            conn.execute("BEGIN")
+
+        def rows(sql: str, kind: str) -> Iterator[tuple]:
+            cursor = conn.execute(sql, (user_id,))
+            while True:
+                batch = cursor.fetchmany(STREAM_FETCH_ROWS)
+                if not batch:
+                    return
+                for ts, row_id, protocol, chain, quantity, value in batch:
+                    # Acquisitions sort before disposals at the same instant
+                    yield (ts, 0 if kind == "acquire" else 1, row_id, kind, protocol, chain, quantity, value)
+
+        try:
+            for ts, _, _, kind, protocol, chain, quantity, value in heapq.merge(
+                rows(STREAM_ACQUISITIONS, "acquire"), rows(STREAM_DISPOSALS, "dispose")
+            ):
+                yield {"ts": ts, "kind": kind, "protocol": protocol, "chain": chain, "quantity": quantity, "value": value}
+        finally:
+            if owned:
+                conn.close()
+
+    def valuations(self, position_id: int, since: float = 0.0, until: float = float("inf")) -> List[Dict[str, Any]]:
+        """Value history of a position"""
+        self.flush()
+        return [dict(row) for row in self._conn.execute(SELECT_VALUATIONS, (position_id, since, until))]
+
+    def aggregate(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Totals over a user's open positions
+
+        Returns:
+            positions, entry_value, current_value, pnl, pnl_percentage and
+            apy (value-weighted), or None if the user never had a position
+        """
+        self.flush()
+        row = self._conn.execute(SELECT_AGGREGATE, (user_id,)).fetchone()
+        if row is None:
+            return None
+        entry_value, current_value = row["entry_value"], row["current_value"]
+        pnl = current_value - entry_value
+        return {
+            "positions": row["positions"],
+            "entry_value": entry_value,
+            "current_value": current_value,
+            "pnl": pnl,
+            "pnl_percentage": (pnl / entry_value) * 100 if row["positions"] and entry_value else 0.0,
+            "apy": row["apy_value"] / current_value if row["positions"] and current_value else 0.0
+        }
+
+    def rebuild_aggregates(self):
+        """Recompute every user's totals from the positions (clears float drift)"""
+        self.flush()
+        self._conn.execute("BEGIN")
+        for sql in REBUILD_AGGREGATES:
+            self._conn.execute(sql)
+        self._conn.execute("COMMIT")
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Store metrics for logging"""
+        return {
+            "pending_writes": self._pending_count,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "next_position_id": self._next_position_id
+        }
+
+
+def test_tracker_store():
+    """Smoke test: a million positions, batched load, indexed queries, aggregates and reopen"""
+    import random
+    import tempfile
+
+    path = os.path.join(tempfile.mkdtemp(), "tracker.db")
+    markets = [("Aave-V3", "ethereum"), ("Uniswap-V3", "arbitrum"), ("Raydium", "solana"), ("Curve", "polygon")]
+    n_users, per_user = 250_000, 4
+    rng = random.Random(1)
+
+    print("=" * 60)
+    print("🗄️  Testing Tracker Store")
+    print("=" * 60)
+
+    store = TrackerStore(path, batch_size=50_000)
+    start = time.perf_counter()
+    for u in range(n_users):
+        for protocol, chain in markets[:per_user]:
+            entry = rng.uniform(100, 10_000)
+            position_id = store.open_position(f"user-{u}", protocol, chain, entry / 2000, entry, 5.0, opened_at=0.0)
+            store.add_lot(f"user-{u}", position_id, protocol, chain, entry / 2000, entry, acquired_at=0.0)
+    store.record_valuation(1, 123.0, 4.5, ts=1.0)
+    store.flush()
+    load_time = time.perf_counter() - start
+    print(f"   Loaded {n_users * per_user:,} positions + lots in {load_time:.1f}s ({store.flushes} transactions)")
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        positions = store.positions(f"user-{rng.randrange(n_users)}")
+    query_time = (time.perf_counter() - start) / 1000
+    print(f"   Open positions per user: {query_time * 1e6:.0f} µs per query")
+    assert len(positions) == per_user
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        totals = store.aggregate(f"user-{rng.randrange(n_users)}")
+    aggregate_time = (time.perf_counter() - start) / 1000
+    print(f"   Per-user totals from aggregates: {aggregate_time * 1e6:.0f} µs per query")
+    assert totals["positions"] == per_user
+
+    store.record_valuation(3, 500.0, 8.0, ts=1.0)
+    store.close_position(2)
+    assert len(store.positions("user-0")) == per_user - 1
+    incremental = store.aggregate("user-0")
+    store.rebuild_aggregates()
+    rebuilt = store.aggregate("user-0")
+    assert incremental["positions"] == rebuilt["positions"] == per_user - 1
+    for key in ("entry_value", "current_value", "apy"):
+        assert abs(incremental[key] - rebuilt[key]) < 1e-6
+    store.close()
+
+    reopened = TrackerStore(path)
+    assert reopened.position(1)["current_value"] == 123.0
+    assert reopened.valuations(1) == [{"ts": 1.0, "value": 123.0, "apy": 4.5}]
+    assert reopened.open_position("user-new", "Aave-V3", "ethereum", 1.0, 2000.0) == n_users * per_user + 1
+    assert reopened._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    reopened.add_disposal("user-new", n_users * per_user + 1, "Aave-V3", "ethereum", 0.5, 1200.0, disposed_at=5.0)
+    reopened.add_lot("user-new", n_users * per_user + 1, "Aave-V3", "ethereum", 1.0, 2000.0, acquired_at=1.0)
+    events = reopened.iter_tax_events("user-new")
+    assert next(events)["ts"] == 1.0
+    # A write mid-stream is not seen by the stream's snapshot
+    reopened.add_lot("user-new", n_users * per_user + 1, "Aave-V3", "ethereum", 1.0, 2000.0, acquired_at=3.0)
+    reopened.flush()
+    assert [(event["kind"], event["ts"]) for event in events] == [("dispose", 5.0)]
+    assert reopened.delete_user("user-new") == [n_users * per_user + 1]
+    assert reopened.aggregate("user-new") is None and reopened.lots("user-new") == []
+    assert reopened.position(1)["current_value"] == 123.0
+    reopened.close()
+    assert query_time < 0.001
+
+    print("\n✅ All tests passed!")
+
+
+if __name__ == "__main__":
+    test_tracker_store()